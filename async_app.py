@@ -0,0 +1,388 @@
+"""ASGI entry point: async /search next to the existing Flask app
+
+POST /search는 이벤트 루프 위에서 처리하고 (aiohttp로 Places/지오코딩, Vertex generate_content_async,
+asyncio.sleep 기반 페이지 토큰 대기), 나머지 경로(/, /search/stream, /search/batch, /metrics 등)는
+Flask 앱을 WSGI 어댑터로 그대로 서빙한다. 캐시/인덱스/플래너 학습 상태는 Flask 쪽 search_service와 공유한다.
+/search 중 클라이언트 연결이 끊기거나 POST /search/cancel(Flask 쪽, 같은 cancel_registry)로 취소되면 검색 task를 취소한다.
+
+    uvicorn async_app:app --port 5001
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+
+from asgiref.wsgi import WsgiToAsgi
+
+from async_maps import AsyncMapsClient
+from cancellation import CancelToken, SearchCancelled
+from flask_app import (
+    app as flask_wsgi_app, search_service, _plan_options, _page_options, _cancel_token, _release_token, cancelled_payload,
+    search_payload, UltraSearchService,
+    DEFAULT_LOCATION, DEFAULT_PORT, SEARCH_RADIUS, COALESCE_CALL_TIMEOUT, COALESCE_SEARCH_TIMEOUT, SPECULATION_GRACE
+)
+from metrics import metrics, Trace
+from query_plan import QueryPlan
+from query_planner import build_candidates
+from rate_limit import call_with_limit_async
+from result_store import encode_json, compress_body
+from speculation import SpeculativeWave
+from ultra_search import ultra_search_keywords_async
+
+logger = logging.getLogger(__name__)
+
+ASYNC_HTTP_POOL_SIZE = int(os.getenv('ASYNC_HTTP_POOL_SIZE', 100))  # 프로세스 전체가 공유하는 Maps API 연결 수
+ASYNC_HTTP_TIMEOUT = 10  # seconds, Places/지오코딩 호출 하나
+MAX_REQUEST_BODY = 1024 * 1024  # bytes
+
+
+class AsyncSearchService:
+    """Async implementation of UltraSearchService's search path
+
+    지오코딩/Places 호출은 AsyncMapsClient로, 페이지 토큰 대기는 asyncio.sleep으로, 서브 쿼리 팬아웃은
+    QueryPlanner.run_async의 task로 실행해 검색 하나가 워커 스레드를 붙잡지 않는다.
+    캐시/인덱스/SingleFlight/비용 요약은 감싼 UltraSearchService의 것을 그대로 쓴다.
+    SQLite 캐시(지오코딩/Places 응답) 읽기와 쓰기는 asyncio.to_thread로 실행해 이벤트 루프를 막지 않는다.
+    """
+
+    def __init__(self, service: UltraSearchService, client: AsyncMapsClient):
+        self.service = service
+        self.client = client
+
+    async def resolve_location(self, location_str: str, trace: Trace = None) -> tuple:
+        """Async variant of UltraSearchService.resolve_location - ((lat, lng), source)"""
+        start = time.perf_counter()
+        latlng, source = await self._resolve_location(location_str, trace)
+        elapsed = time.perf_counter() - start
+        metrics.observe('stage_seconds', elapsed, stage='geocode', source=source)
+        metrics.inc('geocode_total', source=source)
+        if trace is not None:
+            trace.record('geocode', elapsed)
+        return latlng, source
+
+    async def _resolve_location(self, location_str: str, trace: Trace = None) -> tuple:
+        try:
+            latlng, source = await asyncio.to_thread(self.service._cached_location, location_str)
+            if latlng is not None:
+                return latlng, source
+            cache_key = source
+
+            async def geocode_api():
+                geocode_start = time.time()
+                result = await call_with_limit_async(
+                    self.service.rate_limits['geocode'], lambda: self.client.geocode(location_str), trace
+                )
+                return await asyncio.to_thread(self.service._store_geocode, location_str, cache_key, result, geocode_start)
+
+            latlng, shared = await self.service.geocode_flight.do_async(cache_key, geocode_api, timeout=COALESCE_CALL_TIMEOUT)
+            return latlng, 'coalesced' if shared else 'api'
+        except Exception as e:
+            raise ValueError(f"지오코딩 에러: {e}")
+
+    async def _places_request(self, plan: QueryPlan, endpoint: str, params: dict, page: int = 1, page_token: str = None) -> dict:
+        """Async variant of UltraSearchService._places_request (요청 메모 → 영구 캐시 → in-flight 합치기 → API)"""
+        service = self.service
+        api = self.client.places_nearby if endpoint == 'nearby' else self.client.places
+
+        async def upstream():
+            cached, cache_key = await asyncio.to_thread(service._cached_places_response, plan, endpoint, params, page)
+            if cached is not None:
+                return cached
+
+            async def call_api(**extra):
+                bucket = service.rate_limits[endpoint]
+
+                async def request():
+                    with metrics.span('places_call', plan.trace, endpoint=endpoint):
+                        return await api(**extra, **params)
+
+                def hedged():
+                    return service.places_hedger.call_async(request, admit=lambda: service._admit_hedge(plan, bucket),
+                                                            on_hedge=lambda: service._record_hedged_call(plan, endpoint))
+
+                return await call_with_limit_async(bucket, hedged, plan.trace)
+
+            async def token_wait(seconds):
+                with metrics.span('page_token_wait', plan.trace):
+                    await asyncio.sleep(seconds)
+
+            if page_token:
+                response = await service.page_poller.fetch_async(lambda: call_api(page_token=page_token), sleep=token_wait)
+            else:
+                response = await call_api()
+            return await asyncio.to_thread(
+                service._record_places_call, plan, plan.key(endpoint, params, page), endpoint, cache_key, response
+            )
+
+        async def fetch():
+            response, shared = await service.places_flight.do_async(plan.key(endpoint, params, page), upstream, timeout=COALESCE_CALL_TIMEOUT)
+            if shared:
+                plan.record_coalesced()
+                metrics.inc('places_calls_avoided_total', reason='coalesced')
+            return response
+
+        return await plan.execute_async(endpoint, params, page, fetch)
+
+    async def _generate_keywords(self, korean_text: str, trace: Trace) -> tuple:
+        """(keywords_result, keyword_time) - 위치 해석과 동시에 task로 실행된다"""
+        keyword_start = time.time()
+        with metrics.span('keywords', trace):
+            keywords_result = await ultra_search_keywords_async(korean_text)
+        return keywords_result, time.time() - keyword_start
+
+    async def search_with_keywords(self, korean_text: str, location: str = DEFAULT_LOCATION, radius: int = SEARCH_RADIUS,
+                                   deadline: float = None, max_cost_usd: float = None, target_results: int = None,
+                                   progressive: bool = False, cancel: CancelToken = None):
+        """Async variant of UltraSearchService.search_with_keywords - same (keywords_result, places) shape
+
+        취소는 검색 task의 취소로 전달된다 (진행 중인 호출도 취소). cancel은 플래너가 새 호출을 멈추는 데 쓰고,
+        task가 끝나기 전에 취소됐으면 SearchCancelled를 올린다.
+        """
+        service = self.service
+        try:
+            total_search_start = time.time()
+            total_search_monotonic = time.monotonic()
+            deadline, max_cost_usd, target_results = service._plan_limits(deadline, max_cost_usd, target_results)
+            if cancel is None:
+                cancel = CancelToken(total_search_monotonic + deadline)
+            else:
+                cancel.bound(total_search_monotonic + deadline)
+            trace = Trace()
+
+            plan = QueryPlan(trace=trace, cancel=cancel)
+
+            # 키워드 생성과 위치 해석을 동시에 - 위치가 먼저 나오면 추측 Places 호출을 시작한다
+            keyword_task = asyncio.ensure_future(self._generate_keywords(korean_text, trace))
+            try:
+                geocode_start = time.time()
+                latlng, location_source = await self.resolve_location(location, trace)
+                geocode_time = time.time() - geocode_start
+            except BaseException:
+                # 위치를 못 찾으면 LLM 결과도 필요 없다
+                keyword_task.cancel()
+                raise
+
+            speculation = None
+            speculative_types = [] if progressive else service._speculative_types(max_cost_usd, location_source)
+            if speculative_types:
+                await asyncio.wait([keyword_task], timeout=SPECULATION_GRACE)
+                if not keyword_task.done():
+                    speculation = SpeculativeWave(plan, speculative_types, latlng, radius, service.place_index)
+                    speculation.start_async(self._places_request)
+
+            try:
+                keywords_result, keyword_time = await keyword_task
+            except asyncio.CancelledError:
+                if speculation is not None:
+                    speculation.resolve([])
+                raise
+            except Exception as e:
+                logger.exception("키워드 생성 실패: %s", e)
+                if speculation is not None:
+                    speculation.resolve([])
+                return {"error": f"키워드 생성 실패: {str(e)}", "speculation": service._speculation_report(speculation)}, []
+
+            if not keywords_result.get("has_location_intent"):
+                if speculation is not None:
+                    speculation.resolve([])
+                return {"error": "장소 검색 의도가 감지되지 않았습니다", "speculation": service._speculation_report(speculation)}, []
+
+            plan_start = time.time()
+            candidates = build_candidates(keywords_result, latlng, radius, rank_by_distance=progressive)
+            if speculation is not None:
+                speculation.resolve(candidates)
+            planner = service._new_planner(plan, latlng, radius, location_source, total_search_monotonic + deadline,
+                                           max_cost_usd, target_results, progressive=progressive)
+            all_results = await planner.run_async(candidates, self._places_request)
+            plan_time = time.time() - plan_start
+            cancel.check()
+
+            keywords_result, all_results = service._summarize_search(
+                keywords_result, all_results, plan, planner, candidates,
+                latlng=latlng, location_source=location_source, radius=radius, deadline=deadline, trace=trace,
+                started_at=total_search_start, keyword_time=keyword_time, geocode_time=geocode_time, plan_time=plan_time,
+                speculation=speculation
+            )
+            keywords_result['search_strategy'] += ' (async)'
+            return keywords_result, all_results
+
+        except SearchCancelled:
+            raise
+        except Exception as e:
+            logger.error("Async keywords search error: %s", e)
+            return {"error": str(e)}, []
+
+    async def search_coalesced(self, korean_text: str, location: str = DEFAULT_LOCATION, radius: int = SEARCH_RADIUS,
+                               cancel: CancelToken = None, **plan_options):
+        """Async variant of UltraSearchService.search_coalesced"""
+        service = self.service
+        key = service._search_key(korean_text, location, radius, plan_options)
+        (keywords_result, places), shared = await service.search_flight.do_async(
+            key,
+            lambda: self.search_with_keywords(korean_text, location, radius, cancel=cancel, **plan_options),
+            timeout=COALESCE_SEARCH_TIMEOUT
+        )
+        if not shared:
+            return keywords_result, places
+        return service._follower_copy(korean_text, location, keywords_result, places)
+
+
+async def _read_json(receive) -> dict:
+    body = bytearray()
+    while True:
+        message = await receive()
+        body.extend(message.get('body', b''))
+        if len(body) > MAX_REQUEST_BODY:
+            raise ValueError('request body too large')
+        if not message.get('more_body'):
+            break
+    return json.loads(body or b'{}')
+
+
+async def _wait_disconnect(receive) -> str:
+    # 본문을 다 읽은 뒤의 receive()는 클라이언트 연결이 끊길 때 http.disconnect를 돌려준다
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return 'client_disconnect'
+
+
+async def run_cancellable(coro, token: CancelToken, receive):
+    """Run coro as a task, cancelling it when the client disconnects or the token is cancelled
+
+    취소되면 token을 그 사유로 취소하고 task가 정리될 때까지 기다린 뒤 SearchCancelled를 올린다.
+    """
+    task = asyncio.ensure_future(coro)
+    watchers = [asyncio.ensure_future(_wait_disconnect(receive)), asyncio.ensure_future(token.wait_async())]
+    try:
+        done, _ = await asyncio.wait([task, *watchers], return_when=asyncio.FIRST_COMPLETED)
+        if task in done:
+            return task.result()
+        token.cancel(next(iter(done)).result())
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        raise SearchCancelled(token.reason)
+    finally:
+        for future in (task, *watchers):
+            future.cancel()
+
+
+def _accept_encoding(scope) -> str:
+    for name, value in scope.get('headers', []):
+        if name.lower() == b'accept-encoding':
+            return value.decode('latin-1')
+    return ''
+
+
+async def _send_json(send, payload: dict, status: int = 200, accept_encoding: str = ''):
+    with metrics.span('serialize', endpoint='search_async'):
+        body, encoding = compress_body(encode_json(payload), accept_encoding)
+    headers = [
+        (b'content-type', b'application/json; charset=utf-8'),
+        (b'content-length', str(len(body)).encode()),
+        (b'vary', b'Accept-Encoding'),
+    ]
+    if encoding:
+        headers.append((b'content-encoding', encoding.encode()))
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': headers,
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+class SearchASGIApp:
+    """ASGI app serving POST /search natively and delegating every other request to the Flask app"""
+
+    def __init__(self, search: AsyncSearchService, fallback):
+        self.search = search
+        self.fallback = fallback
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+        elif scope['type'] == 'http' and scope['path'] == '/search' and scope['method'] == 'POST':
+            await self._search(scope, receive, send)
+        else:
+            await self.fallback(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.search.client.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def _search(self, scope, receive, send):
+        """Same request/response contract as Flask's /search (next_cursor 페이지는 Flask의 /search/results가 내준다)"""
+        try:
+            data = await _read_json(receive)
+        except ValueError as e:
+            await _send_json(send, {'error': f'Invalid request body: {e}'}, 400)
+            return
+        korean_text = data.get('korean_text', '')
+        location = data.get('location', DEFAULT_LOCATION)
+        radius = data.get('radius', SEARCH_RADIUS)
+
+        if not korean_text:
+            await _send_json(send, {'error': 'Korean text is required'}, 400)
+            return
+        try:
+            plan_options = _plan_options(data)
+        except (TypeError, ValueError) as e:
+            await _send_json(send, {'error': f'Invalid plan option: {e}'}, 400)
+            return
+        try:
+            page_size, fields = _page_options(data)
+        except (TypeError, ValueError) as e:
+            await _send_json(send, {'error': f'Invalid page option: {e}'}, 400)
+            return
+        try:
+            request_id, token = _cancel_token(data)
+        except ValueError as e:
+            await _send_json(send, {'error': f'Invalid request_id: {e}'}, 400)
+            return
+
+        try:
+            keywords_result, places = await run_cancellable(
+                self.search.search_coalesced(korean_text, location, radius, cancel=token, **plan_options), token, receive
+            )
+        except SearchCancelled as e:
+            token.record(e.reason)
+            payload, status = cancelled_payload(e)
+            metrics.inc('requests_total', endpoint='search_async', status='cancelled' if status == 499 else 'deadline')
+            if e.reason != 'client_disconnect':
+                await _send_json(send, payload, status)
+            return
+        except Exception as e:
+            metrics.inc('requests_total', endpoint='search_async', status='exception')
+            logger.exception("async search 실행 중 에러: %s", e)
+            await _send_json(send, {
+                'error': 'Search failed',
+                'message': str(e),
+                'keywords': {},
+                'places': [],
+                'total_results': 0
+            }, 500)
+            return
+        finally:
+            _release_token(request_id, token)
+
+        metrics.inc('requests_total', endpoint='search_async', status='error' if keywords_result.get('error') else 'ok')
+        await _send_json(send, search_payload(keywords_result, places, page_size, fields), accept_encoding=_accept_encoding(scope))
+
+
+async_search_service = AsyncSearchService(
+    search_service,
+    AsyncMapsClient(os.getenv('GOOGLE_CLOUD_PROJECT'), pool_size=ASYNC_HTTP_POOL_SIZE, timeout=ASYNC_HTTP_TIMEOUT)
+)
+app = SearchASGIApp(async_search_service, WsgiToAsgi(flask_wsgi_app))
+
+if __name__ == '__main__':
+    import uvicorn
+    uvicorn.run(app, port=DEFAULT_PORT)
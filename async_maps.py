@@ -0,0 +1,88 @@
+import asyncio
+
+import aiohttp
+import googlemaps.exceptions
+
+MAPS_API_BASE = 'https://maps.googleapis.com/maps/api'
+PLACES_NEARBY_PATH = '/place/nearbysearch/json'
+PLACES_TEXT_PATH = '/place/textsearch/json'
+GEOCODE_PATH = '/geocode/json'
+
+# 응답 status 중 에러가 아닌 것 (나머지는 googlemaps.Client와 같은 ApiError로 올린다)
+OK_STATUSES = ('OK', 'ZERO_RESULTS')
+
+
+class AsyncMapsClient:
+    """aiohttp client for the Places (Nearby/Text Search) and Geocoding web services
+
+    googlemaps.Client와 같은 이름/인자(places_nearby, places, geocode)를 coroutine으로 제공한다.
+    세션 하나(TCPConnector 풀)를 프로세스 전체가 공유하므로 동시 검색 수백 개도 연결을 재사용한다.
+    에러는 googlemaps.exceptions.ApiError(status)로 올려서 PageTokenPoller의 INVALID_REQUEST 재시도가 그대로 동작한다.
+    """
+
+    def __init__(self, key: str, pool_size: int = 100, timeout: float = 10.0, base_url: str = MAPS_API_BASE):
+        if not key:
+            raise ValueError("Google Maps API key not found")
+        self.key = key
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.base_url = base_url
+        self._session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # 세션은 실행 중인 이벤트 루프에 묶이므로 첫 요청 시점에 만든다
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.pool_size, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+        return self._session
+
+    @staticmethod
+    def _query_params(params: dict) -> dict:
+        """googlemaps.Client 인자 → web service 쿼리 파라미터"""
+        query = {}
+        for name, value in params.items():
+            if value is None:
+                continue
+            if name == 'location':
+                value = f'{float(value[0])},{float(value[1])}'
+            elif name == 'page_token':
+                name = 'pagetoken'
+            elif name == 'rank_by':
+                name = 'rankby'
+            query[name] = str(value)
+        return query
+
+    async def _request(self, path: str, params: dict) -> dict:
+        query = self._query_params(params)
+        query['key'] = self.key
+        try:
+            async with self._get_session().get(self.base_url + path, params=query) as response:
+                if response.status != 200:
+                    raise googlemaps.exceptions.HTTPError(response.status)
+                body = await response.json(content_type=None)
+        except asyncio.TimeoutError:
+            raise googlemaps.exceptions.Timeout()
+        except aiohttp.ClientError as e:
+            raise googlemaps.exceptions.TransportError(e)
+
+        status = body.get('status')
+        if status not in OK_STATUSES:
+            raise googlemaps.exceptions.ApiError(status, body.get('error_message'))
+        return body
+
+    async def places_nearby(self, **params) -> dict:
+        return await self._request(PLACES_NEARBY_PATH, params)
+
+    async def places(self, **params) -> dict:
+        return await self._request(PLACES_TEXT_PATH, params)
+
+    async def geocode(self, address: str) -> list:
+        body = await self._request(GEOCODE_PATH, {'address': address})
+        return body.get('results', [])
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
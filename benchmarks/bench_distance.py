@@ -0,0 +1,68 @@
+"""거리 계산 벤치마크: 기존 스칼라 haversine 루프 vs NumPy 배치 + bounding box 사전 필터
+
+    python benchmarks/bench_distance.py
+    python benchmarks/bench_distance.py --sizes 10000 100000 --radius 1000
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from distance_utils import calculate_distance, filter_and_sort_by_distance  # noqa: E402
+
+CENTER = (35.6812, 139.7671)  # 도쿄역
+
+
+def scalar_filter_and_sort(center_lat, center_lng, lats, lngs, radius):
+    """기존 경로: 점마다 math haversine 후 Python 정렬"""
+    inside = []
+    for index, (lat, lng) in enumerate(zip(lats, lngs)):
+        distance = calculate_distance(center_lat, center_lng, lat, lng)
+        if distance <= radius:
+            inside.append((distance, index))
+    inside.sort()
+    return [index for _, index in inside]
+
+
+def best_of(fn, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--radius', type=float, default=500, help='필터 반경 (미터)')
+    parser.add_argument('--spread', type=float, default=0.05, help='중심 기준 좌표 분포 범위 (도)')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    print(f"{'points':>10} {'scalar (s)':>12} {'numpy (s)':>12} {'speedup':>9} {'inside':>8}")
+    for size in args.sizes:
+        lats = CENTER[0] + rng.uniform(-args.spread, args.spread, size)
+        lngs = CENTER[1] + rng.uniform(-args.spread, args.spread, size)
+        lat_list, lng_list = lats.tolist(), lngs.tolist()
+
+        scalar_time, scalar_order = best_of(
+            lambda: scalar_filter_and_sort(CENTER[0], CENTER[1], lat_list, lng_list, args.radius), args.repeat
+        )
+        numpy_time, (numpy_order, _) = best_of(
+            lambda: filter_and_sort_by_distance(CENTER[0], CENTER[1], lats, lngs, args.radius), args.repeat
+        )
+        assert scalar_order == numpy_order.tolist(), '스칼라/벡터 결과가 다릅니다'
+
+        print(f"{size:>10} {scalar_time:>12.4f} {numpy_time:>12.4f} {scalar_time / numpy_time:>8.1f}x {len(numpy_order):>8}")
+
+
+if __name__ == '__main__':
+    main()
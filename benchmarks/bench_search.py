@@ -0,0 +1,258 @@
+"""검색 hot path 오프라인 리플레이 벤치마크 (자격 증명/과금 없음)
+
+기록된 질의 코퍼스를 UltraSearchService.search_with_keywords에 그대로 흘려보내고
+지연 시간 p50/p95/p99, 요청당 API 호출 수, 요청당 메모리 할당(tracemalloc),
+/search 응답 바이트 수(전체 결과 json vs 첫 페이지 raw/gzip/br)를 보고한다.
+Google Maps와 Vertex AI는 benchmarks/fakes.py의 결정적 대역으로 대체된다.
+--time-scale은 가짜 백엔드 지연과 함께 페이지 토큰 폴링, hedge 지연, 호출 제한(TokenBucket) 속도/대기에도 적용된다.
+
+    python benchmarks/bench_search.py
+    python benchmarks/bench_search.py --repeat 5 --time-scale 0.05 --json bench.json
+    python benchmarks/bench_search.py --warm            # 캐시/인덱스를 요청 간 유지
+    python benchmarks/bench_search.py --max-p95 3.0     # 기준 초과 시 exit 1 (CI 회귀 검사)
+    python benchmarks/bench_search.py --progressive     # 점진적 ring 검색 모드
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+DEFAULT_CORPUS = os.path.join(BENCH_DIR, 'fixtures', 'queries.json')
+
+
+def percentile(values: list, fraction: float) -> float:
+    """선형 보간 백분위수"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def load_corpus(path: str) -> dict:
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def configure_environment(cache_dir: str, places_cache: bool):
+    """flask_app import 전에 호출 - 프리웜을 끄고 캐시를 임시 디렉터리로 격리"""
+    os.environ.setdefault('GOOGLE_CLOUD_PROJECT', 'AIzaOfflineBenchmark')  # googlemaps.Client 키 형식 검사용
+    os.environ['VERTEX_PREWARM'] = '0'
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+    os.environ['ULTRA_CACHE_DIR'] = cache_dir
+    if not places_cache:
+        os.environ['PLACES_CACHE_TTL'] = '0'
+
+
+def reset_caches(service):
+    """요청 간 캐시/인덱스를 비워 매 요청을 cache-cold로 만든다 (프로세스 상태는 유지)"""
+    import ultra_search
+    from place_index import PlaceIndex
+
+    ultra_search._keyword_memory_cache.clear()
+    ultra_search._get_keyword_disk_cache().clear()
+    ultra_search._get_keyword_index().clear()
+    service.geocode_memory_cache.clear()
+    service.geocode_store.clear()
+    if service.places_cache is not None:
+        service.places_cache.clear()
+    service.place_index = PlaceIndex(
+        precision=service.place_index.precision,
+        ttl_seconds=service.place_index.ttl_seconds,
+        max_cells=service.place_index.max_cells
+    )
+
+
+def wire_bytes(flask_app, keywords_result: dict, places: list) -> dict:
+    from result_store import wire_sizes
+
+    # 페이지/압축 도입 전 응답: jsonify 기본값(ensure_ascii)으로 전체 결과를 한 번에
+    full = json.dumps({'keywords': keywords_result, 'places': places, 'total_results': len(places)}, default=str)
+    sizes = wire_sizes(flask_app.search_payload(keywords_result, places, flask_app.SEARCH_PAGE_SIZE))
+    return {'bytes_full_json': len(full.encode('utf-8')), **{f'bytes_page_{name}': size for name, size in sizes.items()}}
+
+
+def run_request(service, gmaps, llm, query: dict, flask_app=None, progressive: bool = False) -> dict:
+    gmaps.reset_counters()
+    llm_calls_before = llm.calls
+    output = io.StringIO()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(output):
+        keywords_result, places = service.search_with_keywords(query['korean_text'], query['location'], query['radius'],
+                                                               progressive=progressive)
+    elapsed = time.perf_counter() - start
+    sample = {
+        'korean_text': query['korean_text'],
+        'latency': elapsed,
+        'results': len(places),
+        'error': keywords_result.get('error'),
+        'places_calls': gmaps.calls['nearby'] + gmaps.calls['text'],
+        'geocode_calls': gmaps.calls['geocode'],
+        'token_not_ready': gmaps.calls['token_not_ready'],
+        'llm_calls': llm.calls - llm_calls_before,
+        'rings': len((keywords_result.get('query_plan') or {}).get('rings', [])),
+    }
+    if flask_app is not None:
+        sample.update(wire_bytes(flask_app, keywords_result, places))
+    return sample
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--corpus', default=DEFAULT_CORPUS, help='질의 코퍼스 JSON')
+    parser.add_argument('--fixtures', help='RecordingGmapsClient로 기록한 Places/Geocoding 응답 JSON')
+    parser.add_argument('--repeat', type=int, default=3, help='코퍼스 반복 횟수')
+    parser.add_argument('--time-scale', type=float, default=0.1, help='가짜 백엔드 지연 배율 (1.0 = 실제와 비슷한 지연)')
+    parser.add_argument('--places-latency', type=float, default=0.15, help='Places 호출 지연 (초, 배율 적용 전)')
+    parser.add_argument('--geocode-latency', type=float, default=0.08)
+    parser.add_argument('--token-delay', type=float, default=1.6, help='next_page_token 활성화 시간 (초, 배율 적용 전)')
+    parser.add_argument('--llm-latency', type=float, default=1.2)
+    parser.add_argument('--slow-rate', type=float, default=0.0, help='Places/LLM 호출이 꼬리 지연에 걸릴 확률')
+    parser.add_argument('--slow-latency', type=float, default=8.0, help='꼬리 지연에 걸린 호출의 추가 지연 (초, 배율 적용 전)')
+    parser.add_argument('--warm', action='store_true', help='요청 간 캐시/로컬 인덱스 유지')
+    parser.add_argument('--places-cache', action='store_true', help='SQLite Places 응답 캐시 사용 (기본: 끔)')
+    parser.add_argument('--progressive', action='store_true', help='점진적 ring 검색 (radius를 최대 반경으로)')
+    parser.add_argument('--no-tracemalloc', action='store_true', help='메모리 할당 측정 생략')
+    parser.add_argument('--json', dest='json_path', help='결과를 JSON으로 저장')
+    parser.add_argument('--max-p95', type=float, help='p95 지연(초)이 이 값을 넘으면 exit 1')
+    parser.add_argument('--max-api-calls', type=float, help='요청당 평균 Places 호출 수가 이 값을 넘으면 exit 1')
+    args = parser.parse_args()
+
+    configure_environment(tempfile.mkdtemp(prefix='ultra-bench-'), args.places_cache)
+
+    import flask_app
+    import ultra_search
+    from fakes import FakeGenerativeModel, FakeGmapsClient
+
+    corpus = load_corpus(args.corpus)
+    fixtures = load_corpus(args.fixtures) if args.fixtures else None
+    geocodes = {location: tuple(latlng) for location, latlng in corpus.get('geocode', {}).items()}
+    responses = {query['korean_text']: query['keywords'] for query in corpus['queries'] if query.get('keywords')}
+    queries = corpus['queries']
+
+    scale = args.time_scale
+    gmaps = FakeGmapsClient(
+        fixtures=fixtures,
+        latency=args.places_latency * scale,
+        geocode_latency=args.geocode_latency * scale,
+        token_delay=args.token_delay * scale,
+        geocodes=geocodes,
+        slow_rate=args.slow_rate,
+        slow_latency=args.slow_latency * scale
+    )
+    llm = FakeGenerativeModel(responses, latency=args.llm_latency * scale,
+                              slow_rate=args.slow_rate, slow_latency=args.slow_latency * scale)
+    ultra_search.vertex_client.use(llm)
+    service = flask_app.UltraSearchService(gmaps_client=gmaps)
+    # 지연 배율에 맞춰 페이지 토큰 폴링 시작점도 줄인다
+    service.page_poller.initial_delay *= scale
+    service.page_poller.retry_delay *= scale
+    service.page_poller.min_delay *= scale
+    service.page_poller.max_delay *= scale
+    for hedger in (service.places_hedger, ultra_search._llm_hedger, ultra_search._llm_batch_hedger):
+        hedger.deadline *= scale
+        hedger.initial_delay *= scale
+        hedger.min_delay *= scale
+    # 호출 제한도 같은 시간축으로 - 초당 토큰은 1/scale배, 최대 대기는 scale배 (burst는 그대로).
+    # 가짜 백엔드는 OVER_QUERY_LIMIT을 돌려주지 않으므로 penalize는 재현하지 않는다
+    for bucket in service.rate_limits.values():
+        bucket.rate /= scale
+        bucket.max_wait *= scale
+
+    def replay(trace_memory: bool) -> list:
+        samples = []
+        for _ in range(args.repeat):
+            for query in queries:
+                if not args.warm:
+                    reset_caches(service)
+                if trace_memory:
+                    tracemalloc.reset_peak()
+                    before, _ = tracemalloc.get_traced_memory()
+                # 응답 크기는 지연 패스에서만 잰다 (인코딩/압축 할당이 메모리 측정에 섞이지 않게)
+                sample = run_request(service, gmaps, llm, query, flask_app=None if trace_memory else flask_app,
+                                     progressive=args.progressive)
+                if trace_memory:
+                    current, peak = tracemalloc.get_traced_memory()
+                    sample['peak_alloc_kib'] = (peak - before) / 1024
+                    sample['retained_kib'] = (current - before) / 1024
+                samples.append(sample)
+        return samples
+
+    # 1) 지연 시간 측정 (tracemalloc 오버헤드 없이), 2) 별도 패스로 메모리 측정
+    samples = replay(trace_memory=False)
+    memory_samples = []
+    if not args.no_tracemalloc:
+        tracemalloc.start()
+        try:
+            memory_samples = replay(trace_memory=True)
+        finally:
+            tracemalloc.stop()
+
+    latencies = [sample['latency'] for sample in samples]
+    report = {
+        'requests': len(samples),
+        'mode': ('warm' if args.warm else 'cold') + (' progressive' if args.progressive else ''),
+        'time_scale': scale,
+        'latency_p50': round(percentile(latencies, 0.50), 4),
+        'latency_p95': round(percentile(latencies, 0.95), 4),
+        'latency_p99': round(percentile(latencies, 0.99), 4),
+        'latency_mean': round(statistics.mean(latencies), 4),
+        'places_calls_per_request': round(statistics.mean(sample['places_calls'] for sample in samples), 2),
+        'geocode_calls_per_request': round(statistics.mean(sample['geocode_calls'] for sample in samples), 2),
+        'llm_calls_per_request': round(statistics.mean(sample['llm_calls'] for sample in samples), 2),
+        'token_not_ready_per_request': round(statistics.mean(sample['token_not_ready'] for sample in samples), 2),
+        'errors': sum(1 for sample in samples if sample['error']),
+    }
+    if args.progressive:
+        report['rings_per_request'] = round(statistics.mean(sample['rings'] for sample in samples), 2)
+    for name in ('bytes_full_json', 'bytes_page_raw', 'bytes_page_gzip', 'bytes_page_br'):
+        if name in samples[0]:
+            report[f'{name}_mean'] = round(statistics.mean(sample[name] for sample in samples))
+    for api, stats in service.get_hedge_stats().items():
+        if stats['calls']:
+            report[f'{api}_hedge_rate'] = stats['hedge_rate']
+            report[f'{api}_hedge_extra_cost_usd'] = stats['extra_cost_usd']
+            report[f'{api}_deadline_exceeded'] = stats['deadline_exceeded']
+    if memory_samples:
+        peaks = [sample['peak_alloc_kib'] for sample in memory_samples]
+        report['peak_alloc_kib_p50'] = round(percentile(peaks, 0.50), 1)
+        report['peak_alloc_kib_max'] = round(max(peaks), 1)
+        report['retained_kib_mean'] = round(statistics.mean(sample['retained_kib'] for sample in memory_samples), 1)
+
+    print(f"{'query':<24} {'latency (s)':>12} {'results':>8} {'places':>7} {'geocode':>8} {'llm':>4}")
+    for sample in samples[:len(queries)]:
+        label = sample['korean_text'] if len(sample['korean_text']) <= 12 else sample['korean_text'][:11] + '…'
+        print(f"{label:<24} {sample['latency']:>12.4f} {sample['results']:>8} {sample['places_calls']:>7} "
+              f"{sample['geocode_calls']:>8} {sample['llm_calls']:>4}")
+    print()
+    for key, value in report.items():
+        print(f"{key:<28} {value}")
+
+    if args.json_path:
+        with open(args.json_path, 'w', encoding='utf-8') as f:
+            json.dump({'summary': report, 'samples': samples, 'memory_samples': memory_samples}, f, ensure_ascii=False, indent=2)
+
+    failed = False
+    if args.max_p95 is not None and report['latency_p95'] > args.max_p95:
+        print(f"[FAIL] p95 {report['latency_p95']}s > {args.max_p95}s")
+        failed = True
+    if args.max_api_calls is not None and report['places_calls_per_request'] > args.max_api_calls:
+        print(f"[FAIL] Places 호출 {report['places_calls_per_request']}/요청 > {args.max_api_calls}")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
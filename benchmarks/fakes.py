@@ -0,0 +1,303 @@
+"""Deterministic offline stand-ins for googlemaps.Client and the Vertex AI GenerativeModel
+
+벤치마크가 자격 증명/과금 없이 검색 hot path를 그대로 돌 수 있도록 한다.
+- FakeGmapsClient: places_nearby / places / geocode. 기록된 fixture가 있으면 그대로 재생하고,
+  없으면 고정된 격자 위의 가상 장소들로 응답을 만든다 (같은 질의 → 항상 같은 응답).
+  next_page_token은 token_delay가 지나기 전에는 실제 API처럼 INVALID_REQUEST를 낸다.
+- slow_rate/slow_latency: 호출의 일부가 slow_latency만큼 더 걸리는 꼬리 지연 (hedging 측정용, 시드 고정).
+- AsyncFakeGmapsClient: 같은 fake를 AsyncMapsClient 인터페이스(coroutine)로 감싼다.
+- RecordingGmapsClient: 실제 클라이언트를 감싸 응답을 fixture 형식으로 기록한다.
+- FakeGenerativeModel: 코퍼스에 기록된 function call 인자를 generate_content(_async) 응답으로 돌려준다.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import re
+import sys
+import threading
+import time
+import zlib
+from types import SimpleNamespace
+
+import googlemaps.exceptions
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from distance_utils import calculate_distance  # noqa: E402
+from query_plan import canonical_places_key  # noqa: E402
+
+PAGE_SIZE = 20
+MAX_PAGES = 3  # Nearby/Text Search는 최대 60개
+GRID_STEP = 0.0003  # degrees (≈ 30m) - 가상 장소가 놓이는 격자 간격
+PLACE_DENSITY = 0.35  # 격자 칸에 장소가 있을 확률
+RANK_BY_DISTANCE_REACH = 1500  # meters - rank_by=distance 질의가 장소를 찾는 범위
+TYPE_MATCH_RATE = 0.3  # 장소가 임의의 type/keyword 검색에 걸릴 확률
+DEFAULT_GEOCODE = (35.6812, 139.7671)  # 도쿄역
+
+
+def _unit(*parts) -> float:
+    """문자열 조합 → [0, 1) 결정적 해시값"""
+    return zlib.crc32('|'.join(str(part) for part in parts).encode('utf-8')) / 2 ** 32
+
+
+def fixture_key(endpoint: str, params: dict, page: int) -> str:
+    """fixture 파일의 응답 키 - QueryPlan과 같은 정규화 규칙을 쓴다"""
+    return json.dumps(canonical_places_key(endpoint, params, page), ensure_ascii=False)
+
+
+class FakeGmapsClient:
+    """Offline googlemaps.Client replacement with recorded/synthetic responses and API-like latency"""
+
+    def __init__(self, fixtures: dict = None, latency: float = 0.1, geocode_latency: float = 0.05,
+                 token_delay: float = 1.5, geocodes: dict = None, slow_rate: float = 0.0, slow_latency: float = 0.0):
+        self.fixtures = (fixtures or {}).get('places', {})
+        self.geocodes = dict((fixtures or {}).get('geocode', {}))
+        self.geocodes.update(geocodes or {})
+        self.latency = latency
+        self.geocode_latency = geocode_latency
+        self.token_delay = token_delay
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self._rng = random.Random(0)
+
+        self._tokens = {}  # next_page_token -> (endpoint, params, page, ready_at)
+        self._lock = threading.Lock()
+        self.calls = {'nearby': 0, 'text': 0, 'geocode': 0, 'token_not_ready': 0}
+
+    def search_latency(self) -> float:
+        with self._lock:
+            slow = self._rng.random() < self.slow_rate
+        return self.latency + (self.slow_latency if slow else 0.0)
+
+    def reset_counters(self):
+        with self._lock:
+            for key in self.calls:
+                self.calls[key] = 0
+
+    def _count(self, name: str):
+        with self._lock:
+            self.calls[name] += 1
+
+    def _synthetic_results(self, endpoint: str, params: dict) -> list:
+        """질의 중심 주변 격자에서 조건에 맞는 가상 장소를 prominence 순(rank_by=distance면 거리순)으로 고른다"""
+        lat, lng = params['location']
+        by_distance = params.get('rank_by') == 'distance'
+        radius = float(params.get('radius') or 1000)
+        term = params.get('type') or params.get('keyword') or params.get('query') or ''
+        # 실제 API처럼 반경을 약간 넘는 결과도 섞인다
+        reach = RANK_BY_DISTANCE_REACH if by_distance else radius * 1.1
+        lat_steps = int(reach / 111_320 / GRID_STEP) + 1
+        lng_steps = int(reach / (111_320 * math.cos(math.radians(lat))) / GRID_STEP) + 1
+        base_row, base_col = round(lat / GRID_STEP), round(lng / GRID_STEP)
+
+        candidates = []
+        for row in range(base_row - lat_steps, base_row + lat_steps + 1):
+            for col in range(base_col - lng_steps, base_col + lng_steps + 1):
+                if _unit(row, col) >= PLACE_DENSITY or _unit(row, col, term) >= TYPE_MATCH_RATE:
+                    continue
+                place_lat = (row + _unit(row, col, 'lat') - 0.5) * GRID_STEP
+                place_lng = (col + _unit(row, col, 'lng') - 0.5) * GRID_STEP
+                distance = calculate_distance(lat, lng, place_lat, place_lng)
+                if distance > reach:
+                    continue
+                place_id = f'fake_{row}_{col}'
+                candidates.append((_unit(place_id, 'prominence'), distance, place_id, place_lat, place_lng))
+
+        if by_distance:
+            candidates.sort(key=lambda candidate: candidate[1])
+        else:
+            candidates.sort(reverse=True)
+        results = []
+        for prominence, _, place_id, place_lat, place_lng in candidates[:PAGE_SIZE * MAX_PAGES]:
+            results.append({
+                'place_id': place_id,
+                'name': f'Place {place_id[5:]}',
+                'geometry': {'location': {'lat': place_lat, 'lng': place_lng}},
+                'rating': round(3 + 2 * prominence, 1),
+                'types': [params['type']] if params.get('type') else ['point_of_interest'],
+                'vicinity': f'{place_id[5:]} Fake-dori',
+                'price_level': int(prominence * 4) + 1,
+            })
+        return results
+
+    def _page_response(self, endpoint: str, params: dict, page: int) -> dict:
+        recorded = self.fixtures.get(fixture_key(endpoint, params, page))
+        if recorded is not None:
+            response = dict(recorded)
+            has_next = 'next_page_token' in recorded
+        else:
+            results = self._synthetic_results(endpoint, params)
+            start = (page - 1) * PAGE_SIZE
+            response = {'status': 'OK', 'results': results[start:start + PAGE_SIZE]}
+            has_next = len(results) > start + PAGE_SIZE
+
+        response.pop('next_page_token', None)
+        if has_next:
+            token = hashlib.sha1(f'{endpoint}{params}{page}{time.monotonic()}'.encode('utf-8')).hexdigest()
+            with self._lock:
+                self._tokens[token] = (endpoint, params, page + 1, time.monotonic() + self.token_delay)
+            response['next_page_token'] = token
+        return response
+
+    def _search(self, endpoint: str, page_token: str = None, **params) -> dict:
+        time.sleep(self.search_latency())
+        return self._respond(endpoint, page_token, params)
+
+    def _respond(self, endpoint: str, page_token: str, params: dict) -> dict:
+        if page_token is None:
+            self._count(endpoint)
+            return self._page_response(endpoint, params, 1)
+
+        with self._lock:
+            token = self._tokens.get(page_token)
+        if token is None:
+            raise googlemaps.exceptions.ApiError('INVALID_REQUEST', 'unknown page token')
+        token_endpoint, token_params, page, ready_at = token
+        if time.monotonic() < ready_at:
+            self._count('token_not_ready')
+            raise googlemaps.exceptions.ApiError('INVALID_REQUEST')
+        self._count(endpoint)
+        return self._page_response(token_endpoint, token_params, page)
+
+    def places_nearby(self, **params) -> dict:
+        return self._search('nearby', **params)
+
+    def places(self, **params) -> dict:
+        return self._search('text', **params)
+
+    def geocode(self, address: str) -> list:
+        time.sleep(self.geocode_latency)
+        return self._geocode(address)
+
+    def _geocode(self, address: str) -> list:
+        self._count('geocode')
+        lat, lng = self.geocodes.get(address, DEFAULT_GEOCODE)
+        return [{'geometry': {'location': {'lat': lat, 'lng': lng}}}]
+
+
+class AsyncFakeGmapsClient:
+    """AsyncMapsClient stand-in sharing a FakeGmapsClient's fixtures, tokens and counters (asyncio.sleep latency)"""
+
+    def __init__(self, client: FakeGmapsClient):
+        self.client = client
+
+    async def places_nearby(self, page_token: str = None, **params) -> dict:
+        await asyncio.sleep(self.client.search_latency())
+        return self.client._respond('nearby', page_token, params)
+
+    async def places(self, page_token: str = None, **params) -> dict:
+        await asyncio.sleep(self.client.search_latency())
+        return self.client._respond('text', page_token, params)
+
+    async def geocode(self, address: str) -> list:
+        await asyncio.sleep(self.client.geocode_latency)
+        return self.client._geocode(address)
+
+    async def close(self):
+        pass
+
+
+class RecordingGmapsClient:
+    """Wrap a real googlemaps.Client and record its responses in FakeGmapsClient fixture format"""
+
+    def __init__(self, client):
+        self.client = client
+        self.fixtures = {'places': {}, 'geocode': {}}
+        self._pending = {}  # next_page_token -> (endpoint, params, page)
+        self._lock = threading.Lock()
+
+    def _record(self, endpoint: str, call, page_token: str = None, **params) -> dict:
+        if page_token is None:
+            page = 1
+        else:
+            with self._lock:
+                endpoint, params, page = self._pending[page_token]
+        response = call(page_token=page_token, **params) if page_token else call(**params)
+        with self._lock:
+            self.fixtures['places'][fixture_key(endpoint, params, page)] = response
+            if response.get('next_page_token'):
+                self._pending[response['next_page_token']] = (endpoint, params, page + 1)
+        return response
+
+    def places_nearby(self, **params) -> dict:
+        return self._record('nearby', self.client.places_nearby, **params)
+
+    def places(self, **params) -> dict:
+        return self._record('text', self.client.places, **params)
+
+    def geocode(self, address: str) -> list:
+        response = self.client.geocode(address)
+        if response:
+            location = response[0]['geometry']['location']
+            with self._lock:
+                self.fixtures['geocode'][address] = [location['lat'], location['lng']]
+        return response
+
+    def save(self, path: str):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.fixtures, f, ensure_ascii=False, indent=1)
+
+
+def _function_call_response(name: str, args: dict):
+    """Vertex AI 응답 객체와 같은 모양 (candidates[0].content.parts[0].function_call)"""
+    function_call = SimpleNamespace(name=name, args=args)
+    part = SimpleNamespace(function_call=function_call)
+    candidate = SimpleNamespace(content=SimpleNamespace(parts=[part]))
+    return SimpleNamespace(candidates=[candidate])
+
+
+class FakeGenerativeModel:
+    """GenerativeModel stand-in answering generate_content with recorded function-call arguments
+
+    responses: 한국어 입력 → generate_keywords 인자 dict. 프롬프트의 "사용자 입력" 줄(배치는 번호 붙은 줄)에서
+    입력을 꺼내 찾으며, 코퍼스에 없는 입력은 장소 검색 의도가 없는 응답(function call 없음)이 된다.
+    """
+
+    _SINGLE_INPUT = re.compile(r'^사용자 입력 : (.*)$', re.MULTILINE)
+    _NUMBERED_INPUT = re.compile(r'^\[(\d+)\] (.*)$', re.MULTILINE)
+
+    def __init__(self, responses: dict, latency: float = 0.8, slow_rate: float = 0.0, slow_latency: float = 0.0):
+        self.responses = responses
+        self.latency = latency
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.calls = 0
+        self._rng = random.Random(1)
+        self._lock = threading.Lock()
+
+    def _latency(self) -> float:
+        with self._lock:
+            slow = self._rng.random() < self.slow_rate
+        return self.latency + (self.slow_latency if slow else 0.0)
+
+    def _match(self, text: str):
+        return self.responses.get(text.strip())
+
+    def generate_content(self, prompt, tools=None):
+        time.sleep(self._latency())
+        return self._respond(prompt)
+
+    async def generate_content_async(self, prompt, tools=None):
+        await asyncio.sleep(self._latency())
+        return self._respond(prompt)
+
+    def _respond(self, prompt):
+        with self._lock:
+            self.calls += 1
+
+        if 'generate_keywords_batch' in prompt:
+            results = []
+            for index, text in self._NUMBERED_INPUT.findall(prompt):
+                args = self._match(text)
+                if args is not None:
+                    results.append({'index': int(index), **args})
+            return _function_call_response('generate_keywords_batch', {'results': results})
+
+        found = self._SINGLE_INPUT.search(prompt)
+        args = self._match(found.group(1)) if found else None
+        if args is None:
+            return SimpleNamespace(candidates=[])
+        return _function_call_response('generate_keywords', args)
@@ -0,0 +1,186 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def default_cache_dir() -> str:
+    """Directory for on-disk caches (ULTRA_CACHE_DIR 환경변수로 변경 가능)"""
+    return os.getenv('ULTRA_CACHE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache'))
+
+
+class LRUCache:
+    """Bounded in-process LRU cache with optional TTL
+
+    프로세스 안에서만 쓰는 1차 캐시. 조회 시 최근 사용 순서를 갱신하고
+    max_entries를 넘으면 가장 오래 사용되지 않은 항목부터 버린다.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._data = OrderedDict()  # key -> (value, stored_at)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Return the cached value or None"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, stored_at = entry
+            if self.ttl_seconds is not None and time.time() - stored_at > self.ttl_seconds:
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.time())
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'evictions': self.evictions,
+                'entries': len(self._data),
+                'max_entries': self.max_entries,
+            }
+
+
+class SQLiteCache:
+    """Disk-backed key/value cache with TTL and LRU (size-bounded) eviction
+
+    값은 JSON으로 직렬화해서 저장한다. 여러 스레드에서 공유해도 되도록 하나의 connection을
+    lock으로 보호하고, 여러 프로세스가 같은 파일을 써도 되도록 WAL 모드를 사용한다.
+    ttl_seconds가 None이면 만료 없이 LRU 제한만 적용된다.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = None, max_entries: int = 10000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS entries ('
+            ' key TEXT PRIMARY KEY,'
+            ' value TEXT NOT NULL,'
+            ' created_at REAL NOT NULL,'
+            ' accessed_at REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed_at)')
+        self._conn.commit()
+        self._size = self._conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0]
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds is not None and now - created_at > self.ttl_seconds
+
+    def get(self, key: str):
+        """Return the cached value or None (만료된 항목은 삭제 후 miss 처리)"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, created_at FROM entries WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            value, created_at = row
+            if self._is_expired(created_at, now):
+                self._conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+                self._conn.commit()
+                self._size -= 1
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._conn.execute('UPDATE entries SET accessed_at = ? WHERE key = ?', (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(value)
+
+    def set(self, key: str, value):
+        """Store a JSON-serializable value, evicting least recently used entries over max_entries"""
+        payload = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            existed = self._conn.execute('SELECT 1 FROM entries WHERE key = ?', (key,)).fetchone()
+            self._conn.execute(
+                'INSERT OR REPLACE INTO entries (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)',
+                (key, payload, now, now)
+            )
+            if not existed:
+                self._size += 1
+            if self.max_entries and self._size > self.max_entries:
+                excess = self._size - self.max_entries
+                self._conn.execute(
+                    'DELETE FROM entries WHERE key IN '
+                    '(SELECT key FROM entries ORDER BY accessed_at ASC LIMIT ?)', (excess,)
+                )
+                self._size -= excess
+                self.evictions += excess
+            self._conn.commit()
+
+    def items(self):
+        """Iterate over (key, value) pairs that have not expired"""
+        now = time.time()
+        with self._lock:
+            rows = self._conn.execute('SELECT key, value, created_at FROM entries').fetchall()
+        for key, value, created_at in rows:
+            if not self._is_expired(created_at, now):
+                yield key, json.loads(value)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM entries')
+            self._conn.commit()
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'expired': self.expired,
+                'evictions': self.evictions,
+                'entries': self._size,
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+            }
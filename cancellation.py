@@ -0,0 +1,167 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, FIRST_COMPLETED, wait
+
+from metrics import metrics
+
+CANCEL_REASONS = ('client_cancel', 'superseded')  # POST /search/cancel로 받을 수 있는 사유
+MAX_REQUEST_ID_LENGTH = 64
+
+metrics.counter('search_cancelled_total', 'Searches stopped early, by reason (client_disconnect / client_cancel / superseded / deadline)')
+metrics.counter('cancelled_calls_total', 'Upstream calls never sent because their search was cancelled, by api (places / llm / geocode)')
+metrics.counter('cancelled_worker_seconds_total', 'Worker-seconds released by cancelled searches (time left until their deadline when they stopped)')
+
+
+class SearchCancelled(Exception):
+    """The search was cancelled, or a wait would have outlived the search deadline"""
+
+    def __init__(self, reason: str):
+        super().__init__(f'search cancelled ({reason})')
+        self.reason = reason
+
+
+class CancelToken:
+    """Per-request cancellation signal and deadline shared by every stage of one search
+
+    cancel(reason)은 어느 스레드에서나 부를 수 있고 처음 한 번만 효과가 있다.
+    - check(api)는 취소됐으면 SearchCancelled (api를 주면 보내지 않은 호출로 센다)
+    - sleep(seconds)는 취소되면 바로 깨어나고, 깨어나 봐야 deadline이 지나 있을 대기는 아예 하지 않는다
+    - wait(future)는 future의 결과와 취소(또는 deadline) 중 먼저 오는 쪽
+    - signal은 취소 시 완료되는 Future로, concurrent.futures.wait 집합에 같이 넣어 대기를 깨운다
+    deadline_at(time.monotonic 기준)은 대기 시간의 상한일 뿐 그 자체로 토큰을 취소하지는 않는다 -
+    마감에 걸린 플랜은 지금처럼 부분 결과로 끝난다.
+    """
+
+    def __init__(self, deadline_at: float = None):
+        self.deadline_at = deadline_at
+        self.reason = None
+        self.saved_calls = {}  # api -> 취소 때문에 보내지 않은 호출 수
+        self.signal = Future()
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self._recorded = None
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = 'client_cancel') -> bool:
+        with self._lock:
+            if self.reason is not None:
+                return False
+            self.reason = reason
+            callbacks, self._callbacks = self._callbacks, []
+        self._event.set()
+        self.signal.set_result(reason)
+        for callback in callbacks:
+            callback(reason)
+        return True
+
+    def add_callback(self, callback):
+        """callback(reason) - 이미 취소됐으면 바로 부른다"""
+        with self._lock:
+            if self.reason is None:
+                self._callbacks.append(callback)
+                return
+        callback(self.reason)
+
+    def bound(self, deadline_at: float):
+        """deadline을 더 이르게만 당긴다"""
+        self.deadline_at = deadline_at if self.deadline_at is None else min(self.deadline_at, deadline_at)
+
+    def remaining(self):
+        if self.deadline_at is None:
+            return None
+        return max(0.0, self.deadline_at - time.monotonic())
+
+    def check(self, api: str = None):
+        if self.cancelled:
+            if api is not None:
+                self.skip(api)
+            raise SearchCancelled(self.reason)
+
+    def sleep(self, seconds: float):
+        remaining = self.remaining()
+        if remaining is not None and seconds >= remaining:
+            raise SearchCancelled('deadline')
+        if self._event.wait(seconds):
+            raise SearchCancelled(self.reason)
+
+    def wait(self, future):
+        """Return future.result(), or raise SearchCancelled if the token fires or the deadline passes first"""
+        wait([future, self.signal], timeout=self.remaining(), return_when=FIRST_COMPLETED)
+        if future.done():
+            return future.result()
+        self.check()
+        raise SearchCancelled('deadline')
+
+    async def wait_async(self) -> str:
+        """취소될 때까지 기다린다 (다른 스레드에서 cancel()해도 이벤트 루프에서 깨어난다)"""
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+
+        def wake(reason):
+            loop.call_soon_threadsafe(lambda: waiter.done() or waiter.set_result(reason))
+
+        self.add_callback(wake)
+        return await waiter
+
+    def skip(self, api: str, count: int = 1):
+        """취소 때문에 보내지 않은 upstream 호출을 센다"""
+        if count <= 0:
+            return
+        with self._lock:
+            self.saved_calls[api] = self.saved_calls.get(api, 0) + count
+        metrics.inc('cancelled_calls_total', count, api=api)
+
+    def record(self, reason: str = None) -> dict:
+        """취소로 끝난 검색 하나를 한 번만 센다 - 절약한 호출 수와 deadline까지 남아 있던 worker 시간"""
+        with self._lock:
+            if self._recorded is None:
+                self._recorded = {
+                    'reason': self.reason or reason or 'deadline',
+                    'saved_calls': dict(self.saved_calls),
+                    'freed_worker_seconds': round(self.remaining() or 0.0, 3),
+                }
+                metrics.inc('search_cancelled_total', reason=self._recorded['reason'])
+                metrics.inc('cancelled_worker_seconds_total', self._recorded['freed_worker_seconds'])
+            return self._recorded
+
+
+class CancelRegistry:
+    """Tokens of in-progress searches addressed by a client-chosen request_id (POST /search/cancel)
+
+    같은 request_id로 다시 등록하면 이전 검색은 superseded로 취소된다.
+    """
+
+    def __init__(self):
+        self._tokens = {}  # request_id -> CancelToken
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def valid_id(request_id) -> bool:
+        return isinstance(request_id, str) and 0 < len(request_id) <= MAX_REQUEST_ID_LENGTH
+
+    def register(self, request_id: str) -> CancelToken:
+        token = CancelToken()
+        with self._lock:
+            previous = self._tokens.get(request_id)
+            self._tokens[request_id] = token
+        if previous is not None:
+            previous.cancel('superseded')
+        return token
+
+    def release(self, request_id: str, token: CancelToken):
+        with self._lock:
+            if self._tokens.get(request_id) is token:
+                del self._tokens[request_id]
+
+    def cancel(self, request_id: str, reason: str = 'client_cancel') -> bool:
+        with self._lock:
+            token = self._tokens.get(request_id)
+        return token is not None and token.cancel(reason)
+
+    def __len__(self):
+        return len(self._tokens)
@@ -1,8 +1,11 @@
 import math
+import numpy as np
+
+EARTH_RADIUS_METERS = 6371000
 
 def calculate_distance(lat1, lng1, lat2, lng2):
     """두 좌표 간의 거리를 미터 단위로 계산 (Haversine formula)"""
-    R = 6371000  # 지구 반지름 (미터)
+    R = EARTH_RADIUS_METERS  # 지구 반지름 (미터)
     
     lat1_rad = math.radians(lat1)
     lat2_rad = math.radians(lat2)
@@ -15,22 +18,101 @@ def calculate_distance(lat1, lng1, lat2, lng2):
     
     return R * c
 
-def filter_by_distance(results, center_lat, center_lng, max_distance_meters):
-    """결과를 거리 기준으로 필터링"""
-    filtered_results = []
-    for result in results:
-        try:
-            place_lat = result['geometry']['location']['lat']
-            place_lng = result['geometry']['location']['lng']
-            distance = calculate_distance(center_lat, center_lng, place_lat, place_lng)
-            
-            if distance <= max_distance_meters:
-                result['distance_meters'] = int(distance)  # 거리 정보 추가
-                filtered_results.append(result)
+def haversine_batch(center_lat, center_lng, lats, lngs, max_distance_meters=None):
+    """중심점에서 여러 좌표까지의 거리를 한 번에 계산 (미터, NumPy 벡터 연산)
+    
+    max_distance_meters가 주어지면 위경도 bounding box 밖의 점은 정밀 계산 없이 inf로 처리한다.
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lngs = np.asarray(lngs, dtype=np.float64)
+    distances = np.full(lats.shape, np.inf)
+    
+    delta_lng_deg = (lngs - center_lng + 180.0) % 360.0 - 180.0  # 날짜변경선 보정
+    if max_distance_meters is not None:
+        # bounding box 사전 필터 - 경계 점이 잘리지 않도록 약간 여유를 둠
+        lat_margin = math.degrees(max_distance_meters / EARTH_RADIUS_METERS) * 1.001
+        cos_center = max(math.cos(math.radians(center_lat)), 1e-6)
+        lng_margin = min(180.0, lat_margin / cos_center)
+        candidates = np.flatnonzero(
+            (np.abs(lats - center_lat) <= lat_margin) & (np.abs(delta_lng_deg) <= lng_margin)
+        )
+    else:
+        candidates = np.flatnonzero(np.isfinite(lats) & np.isfinite(lngs))
+    
+    if candidates.size:
+        lat1 = math.radians(center_lat)
+        lat2 = np.radians(lats[candidates])
+        delta_lat = lat2 - lat1
+        delta_lng = np.radians(delta_lng_deg[candidates])
+        a = np.sin(delta_lat / 2) ** 2 + math.cos(lat1) * np.cos(lat2) * np.sin(delta_lng / 2) ** 2
+        distances[candidates] = 2 * EARTH_RADIUS_METERS * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    
+    return distances
+
+def filter_and_sort_by_distance(center_lat, center_lng, lats, lngs, max_distance_meters=None):
+    """반경 필터링과 거리순 정렬을 한 번의 거리 계산으로 처리
+    
+    Returns (order, distances): 반경 안에 있는 점의 인덱스(가까운 순, 같은 거리는 원래 순서 유지)와
+    전체 거리 배열(미터, 반경 밖은 inf)
+    """
+    distances = haversine_batch(center_lat, center_lng, lats, lngs, max_distance_meters)
+    if max_distance_meters is not None:
+        inside = np.flatnonzero(distances <= max_distance_meters)
+    else:
+        inside = np.flatnonzero(np.isfinite(distances))
+    order = inside[np.argsort(distances[inside], kind='stable')]
+    return order, distances
+
+_GEOHASH_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+def geohash_encode(lat, lng, precision=7):
+    """좌표를 geohash 문자열로 변환 (precision 7 ≈ 153m × 153m 셀)"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True  # geohash는 경도 비트부터 시작
+    
+    while len(chars) < precision:
+        value_range, value = (lng_range, lng) if even else (lat_range, lat)
+        mid = (value_range[0] + value_range[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            value_range[0] = mid
+        else:
+            bits = bits << 1
+            value_range[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    
+    return ''.join(chars)
+
+
+def geohash_decode(geohash):
+    """geohash 셀의 중심 좌표와 반 셀 크기 → (lat, lng, lat_error, lng_error)"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    even = True
+    
+    for char in geohash:
+        bits = _GEOHASH_BASE32.index(char)
+        for shift in range(4, -1, -1):
+            value_range = lng_range if even else lat_range
+            mid = (value_range[0] + value_range[1]) / 2
+            if (bits >> shift) & 1:
+                value_range[0] = mid
             else:
-                print(f"[FILTER] 제외: {result.get('name', 'Unknown')} - 거리: {int(distance)}m")
-        except (KeyError, TypeError):
-            # 좌표 정보가 없는 결과는 제외
-            continue
+                value_range[1] = mid
+            even = not even
     
-    return filtered_results 
\ No newline at end of file
+    return (
+        (lat_range[0] + lat_range[1]) / 2,
+        (lng_range[0] + lng_range[1]) / 2,
+        (lat_range[1] - lat_range[0]) / 2,
+        (lng_range[1] - lng_range[0]) / 2,
+    )
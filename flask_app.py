@@ -1,16 +1,40 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request, jsonify, Response, stream_with_context
 import googlemaps
-from ultra_search import ultra_search_keywords
-from distance_utils import filter_by_distance
+import requests
+from requests.adapters import HTTPAdapter
+from ultra_search import ultra_search_keywords, ultra_search_keywords_batch, get_keyword_cache_stats, get_llm_hedge_stats, prewarm_vertex, normalize_query
+from distance_utils import filter_and_sort_by_distance, haversine_batch, geohash_encode
+from cache_utils import LRUCache, SQLiteCache, default_cache_dir
+from query_plan import QueryPlan
+from pagination import PageTokenPoller
+from place_index import PlaceIndex
+from query_planner import QueryPlanner, RingPlanner, YieldModel, build_candidates
+from singleflight import SingleFlight
+from metrics import metrics, Trace
+from rate_limit import TokenBucket, call_with_limit
+from hedging import Hedger
+from result_store import ResultStore, parse_fields, select_fields, encode_json, compress_body
+from speculation import SpeculativeWave
+from cancellation import CancelRegistry, CancelToken, SearchCancelled, CANCEL_REASONS, MAX_REQUEST_ID_LENGTH
+import logging
 import os
 from dotenv import load_dotenv
 import time
-# ThreadPoolExecutor는 현재 사용하지 않지만 향후 확장을 위해 유지
-# from concurrent.futures import ThreadPoolExecutor, as_completed
+import copy
+import json
+import queue
+import threading
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, wait
 
 # Load environment variables
 load_dotenv()
 
+# 로그 레벨 (LOG_LEVEL=DEBUG면 요청마다의 상세 디버그/타이밍 로그까지 출력)
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+logging.basicConfig(level=LOG_LEVEL, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
 
 # 🎯 검색 설정 - 여기서 한 번에 관리
@@ -19,8 +43,67 @@ SEARCH_RADIUS = 500  # meters - 여기서만 수정하면 모든 곳에 적용
 # Other Constants  
 DEFAULT_LOCATION = "Tokyo, Japan"
 DEFAULT_PORT = 5001
-GOOGLE_API_DELAY = 2  # seconds
-MAX_WORKERS = 5
+GOOGLE_API_DELAY = 2  # seconds - next_page_token 재시도 간격 상한
+PAGE_TOKEN_INITIAL_DELAY = 0.5  # seconds, 관측치가 쌓이면 자동 조정
+PAGE_TOKEN_DEADLINE = 10  # seconds, 토큰 하나가 활성화되길 기다리는 최대 시간
+MAX_WORKERS = 5  # 서브 검색 동시 실행 수 (place_type × round 팬아웃)
+
+# 쿼리 플래너 기본값 (요청 body의 deadline / max_cost_usd / target_results로 요청별 조정 가능)
+SEARCH_DEADLINE_SECONDS = float(os.getenv('SEARCH_DEADLINE_SECONDS', 12))  # 요청 시작부터 결과 반환까지
+SEARCH_MAX_COST_USD = float(os.getenv('SEARCH_MAX_COST_USD', 0.32))  # 요청당 Places + 지오코딩 비용 상한 (= Places 10회)
+SEARCH_TARGET_RESULTS = int(os.getenv('SEARCH_TARGET_RESULTS', 60))  # 반경 안 고유 장소가 이만큼 모이면 중단
+
+# LLM이 키워드를 만드는 동안 미리 호출할 place_type 1페이지 (빈 값이면 추측 호출 끔)
+SPECULATIVE_PLACE_TYPES = [t.strip() for t in os.getenv('SPECULATIVE_PLACE_TYPES', 'restaurant,cafe').split(',') if t.strip()]
+SPECULATION_GRACE = 0.05  # seconds, 위치 해석 후 이 안에 LLM이 끝나면(캐시 적중 등) 추측하지 않는다
+
+# 동시에 들어온 같은 검색/하위 호출 합치기 (follower가 leader를 기다리는 최대 시간)
+COALESCE_SEARCH_TIMEOUT = float(os.getenv('COALESCE_SEARCH_TIMEOUT', 20))  # seconds, 전체 검색
+COALESCE_CALL_TIMEOUT = 15  # seconds, Places/지오코딩 호출 하나 (페이지 토큰 대기 포함)
+COALESCE_LOCATION_PRECISION = 3  # 좌표 소수점 3자리(≈110m)가 같으면 같은 검색으로 본다
+
+# /search 응답 페이지 (나머지 결과는 cursor로 서버에 보관했다가 GET /search/results로 내준다)
+SEARCH_PAGE_SIZE = int(os.getenv('SEARCH_PAGE_SIZE', 50))  # 요청에 page_size가 없을 때의 페이지 크기
+MAX_PAGE_SIZE = 500
+RESULT_STORE_TTL = int(os.getenv('RESULT_STORE_TTL', 600))  # seconds, cursor 유효 시간
+RESULT_STORE_MAX_ENTRIES = 1000  # 보관하는 결과 목록 수
+
+# 검색 취소 (연결 끊김 / POST /search/cancel) - 스트림은 이 간격으로 빈 줄을 보내 끊긴 연결을 빨리 알아챈다
+STREAM_HEARTBEAT_SECONDS = float(os.getenv('STREAM_HEARTBEAT_SECONDS', 1.0))
+
+# 배치 검색 설정
+MAX_BATCH_QUERIES = 50  # /search/batch 요청 하나에 담을 수 있는 질의 수
+BATCH_MAX_WORKERS = 8  # 배치에서 동시에 실행하는 질의별 쿼리 플랜 수
+
+# 🗄️ Places 응답 캐시 설정 (역/번화가 주변 반복 검색 재사용)
+CACHE_DIR = default_cache_dir()
+PLACES_CACHE_TTL = int(os.getenv('PLACES_CACHE_TTL', 6 * 3600))  # seconds, 0이면 캐시 끔
+PLACES_CACHE_MAX_ENTRIES = int(os.getenv('PLACES_CACHE_MAX_ENTRIES', 50000))
+PLACES_CACHE_GEOHASH_PRECISION = 7  # ≈ 153m 셀
+PLACES_CACHE_RADIUS_STEP = 50  # meters, 반경은 50m 단위로 올림
+
+# 📍 지오코딩 캐시 설정 (정규화된 위치 문자열 → 좌표)
+GEOCODE_MEMORY_CACHE_SIZE = 1024
+GEOCODE_CACHE_TTL = int(os.getenv('GEOCODE_CACHE_TTL', 30 * 24 * 3600))  # seconds
+GEOCODE_CACHE_MAX_ENTRIES = 20000
+
+# 🗺️ 로컬 장소 인덱스 (이미 검색한 범위 안의 질의는 API 없이 응답)
+PLACE_INDEX_TTL = int(os.getenv('PLACE_INDEX_TTL', 1800))  # seconds, 이보다 오래된 범위는 다시 검색
+PLACE_INDEX_MAX_CELLS = 2000  # geohash(precision 6 ≈ 1.2km × 0.6km) 셀 수 상한
+
+# Google Maps API 호출 제한 (API별 token bucket) / 연결 풀
+# Places 기본 쿼터는 프로젝트당 분당 6,000회(=100 QPS)이지만 여러 프로세스가 나눠 쓰므로 보수적으로 잡는다
+RATE_LIMITS = {  # api -> (초당 호출 수, 버스트)
+    'nearby': (float(os.getenv('PLACES_NEARBY_QPS', 20)), int(os.getenv('PLACES_NEARBY_BURST', 20))),
+    'text': (float(os.getenv('PLACES_TEXT_QPS', 10)), int(os.getenv('PLACES_TEXT_BURST', 10))),
+    'geocode': (float(os.getenv('GEOCODE_QPS', 20)), int(os.getenv('GEOCODE_BURST', 20))),
+}
+RATE_LIMIT_MAX_WAIT = float(os.getenv('RATE_LIMIT_MAX_WAIT', 5))  # seconds, 이보다 오래 줄 서야 하면 바로 실패
+MAPS_HTTP_POOL_SIZE = int(os.getenv('MAPS_HTTP_POOL_SIZE', 32))  # keep-alive 연결 수 (동시 호출 스레드 수 이상)
+MAPS_HTTP_TIMEOUT = 10  # seconds
+PLACES_CALL_DEADLINE = float(os.getenv('PLACES_CALL_DEADLINE', 6))  # seconds, Places 호출 하나 (hedge 포함, 호출 제한 대기는 제외)
+PLACES_HEDGE_INITIAL_DELAY = 1  # seconds, 관측 지연이 쌓이기 전의 hedge 시점
+PLACES_HEDGE_MAX_PER_REQUEST = int(os.getenv('PLACES_HEDGE_MAX_PER_REQUEST', 2))  # 요청당 hedge 추가 호출 상한 (과금 호출), 0이면 끔
 
 # API Cost Constants (USD) - 2025년 최신 요금
 PLACES_API_COST = 0.032  # Nearby Search: $32 per 1,000 requests = $0.032 per request
@@ -28,463 +111,1122 @@ GEOCODING_API_COST = 0.005  # Geocoding은 기존 유지
 DETAILS_API_COST = 0.017  # Details는 기존 유지  
 USD_TO_KRW = 1380  # 2025년 1월 평균 환율
 
-class UltraSearchService:
+
+class FanoutMerger:
+    """Merge sub-search results deterministically regardless of completion order
+
+    서브 검색은 병렬로 끝나는 순서가 매번 다르므로, 같은 place_id가 여러 서브 검색에서
+    나오면 (서브 검색 순번, 결과 내 위치)가 가장 앞선 쪽의 search_type을 채택한다.
+    결과적으로 순차 실행했을 때와 동일한 dedup/태깅 결과가 나온다.
+    """
+
     def __init__(self):
-        api_key = os.getenv('GOOGLE_CLOUD_PROJECT')
-        if not api_key:
-            raise ValueError("Google Maps API key not found")
-        self.gmaps = googlemaps.Client(key=api_key)
+        self._best = {}  # place_id -> (task_index, position, tagged_result)
+
+    def add(self, task_index: int, search_type: str, results: list, offset: int = 0) -> list:
+        """Merge one finished sub-search (or one page of it, starting at `offset`), returning places seen for the first time"""
+        new_places = []
+        for position, result in enumerate(results, offset):
+            place_id = result.get('place_id')
+            if not place_id:
+                continue
+            current = self._best.get(place_id)
+            if current is None or (task_index, position) < current[:2]:
+                tagged = dict(result, search_type=search_type)
+                self._best[place_id] = (task_index, position, tagged)
+                if current is None:
+                    new_places.append(tagged)
+        return new_places
+
+    def results(self) -> list:
+        """All merged places in sequential (task_index, position) order"""
+        return [entry[2] for entry in sorted(self._best.values(), key=lambda e: e[:2])]
+
+    def __len__(self):
+        return len(self._best)
+
+
+class UltraSearchService:
+    def __init__(self, gmaps_client=None):
+        # gmaps_client: googlemaps.Client 대신 쓸 클라이언트 (오프라인 벤치마크의 fake 등)
+        if gmaps_client is None:
+            api_key = os.getenv('GOOGLE_CLOUD_PROJECT')
+            if not api_key:
+                raise ValueError("Google Maps API key not found")
+            gmaps_client = googlemaps.Client(
+                key=api_key,
+                timeout=MAPS_HTTP_TIMEOUT,
+                requests_session=self._pooled_session(),
+                # 호출 제한은 아래 token bucket이 맡는다 (클라이언트 내부 제한/재시도는 잠금 없이 전체 호출을 sleep시킴)
+                queries_per_second=int(sum(qps for qps, _ in RATE_LIMITS.values())) + 1,
+                retry_over_query_limit=False
+            )
+        self.gmaps = gmaps_client
+        
+        # API별 token bucket - 모든 요청 스레드와 async 경로가 공유
+        self.rate_limits = {
+            api: TokenBucket(api, qps, burst, max_wait=RATE_LIMIT_MAX_WAIT)
+            for api, (qps, burst) in RATE_LIMITS.items()
+        }
         
-        # API cost tracking
+        # 프로세스 누적 API 사용량 (요청별 사용량은 QueryPlan과 location_source로 따로 센다)
         self.api_calls = 0
+        self.api_usage = {api: 0 for api in RATE_LIMITS}
+        self._api_calls_lock = threading.Lock()
         self.cost_per_call = PLACES_API_COST
         self.geocoding_cost = GEOCODING_API_COST
         self.details_cost = DETAILS_API_COST
+        
+        # Places 호출 하나의 마감과 hedge (느린 호출은 관측 지연 분위수 뒤에 한 번 더 보냄)
+        self.places_hedger = Hedger(
+            'places', deadline=PLACES_CALL_DEADLINE, initial_delay=PLACES_HEDGE_INITIAL_DELAY, cost_per_call=self.cost_per_call
+        )
+        
+        # next_page_token 활성화 폴링 (모든 페이지네이션 루프가 공유)
+        self.page_poller = PageTokenPoller(
+            initial_delay=PAGE_TOKEN_INITIAL_DELAY,
+            max_delay=GOOGLE_API_DELAY,
+            deadline=PAGE_TOKEN_DEADLINE
+        )
+        
+        # 요청 간 in-flight 합치기: 전체 검색 / Places 호출 / 지오코딩
+        self.search_flight = SingleFlight('search')
+        self.places_flight = SingleFlight('places')
+        self.geocode_flight = SingleFlight('geocode')
+        
+        # 서브 쿼리 종류/페이지별 기대 수확 (쿼리 플래너가 요청 간 학습)
+        self.yield_model = YieldModel()
+        
+        # 이전 검색 결과의 공간 인덱스 (프로세스 메모리)
+        self.place_index = PlaceIndex(ttl_seconds=PLACE_INDEX_TTL, max_cells=PLACE_INDEX_MAX_CELLS)
+        
+        # 지오코딩 캐시: 1차 메모리 LRU → 2차 SQLite
+        self.geocode_memory_cache = LRUCache(GEOCODE_MEMORY_CACHE_SIZE)
+        self.geocode_store = SQLiteCache(
+            os.path.join(CACHE_DIR, 'geocode_cache.sqlite3'),
+            ttl_seconds=GEOCODE_CACHE_TTL,
+            max_entries=GEOCODE_CACHE_MAX_ENTRIES
+        )
+        
+        # 요청 간 공유되는 Places 응답 캐시 (geohash 셀 + 반경 + type/keyword + page)
+        self.places_cache = None
+        if PLACES_CACHE_TTL > 0:
+            self.places_cache = SQLiteCache(
+                os.path.join(CACHE_DIR, 'places_cache.sqlite3'),
+                ttl_seconds=PLACES_CACHE_TTL,
+                max_entries=PLACES_CACHE_MAX_ENTRIES
+            )
+    
+    @staticmethod
+    def _pooled_session() -> requests.Session:
+        """Keep-alive session whose pool blocks instead of opening throwaway connections under load"""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MAPS_HTTP_POOL_SIZE, pool_block=True)
+        session.mount('https://', adapter)
+        return session
     
-    def geocode_location(self, location_str: str) -> tuple:
-        """Convert location string to lat/lng coordinates"""
+    @staticmethod
+    def _parse_coordinates(location_str: str):
+        """Return (lat, lng) if the string is a "lat,lng" pair, otherwise None"""
+        parts = location_str.split(',')
+        if len(parts) != 2:
+            return None
         try:
-            geocode_start = time.time()
-            
-            # GPS 좌표가 이미 있으면 바로 사용
-            if ',' in location_str and len(location_str.split(',')) == 2:
-                try:
-                    parts = location_str.split(',')
-                    lat_str = parts[0].strip()
-                    lng_str = parts[1].strip()
-                    lat, lng = float(lat_str), float(lng_str)
-                    geocode_time = time.time() - geocode_start
-                    print(f"[TIMING] GPS 좌표 사용: {geocode_time:.3f}초")
-                    return (lat, lng)
-                except ValueError:
-                    # GPS 좌표가 아니면 에러
-                    raise ValueError(f"잘못된 GPS 좌표 형식: {location_str}")
-            
-            result = self.gmaps.geocode(location_str)
-            self.api_calls += 1  # Track geocoding call
+            return (float(parts[0].strip()), float(parts[1].strip()))
+        except ValueError:
+            # "Tokyo, Japan" 같은 주소 문자열
+            return None
+    
+    @staticmethod
+    def _normalize_location(location_str: str) -> str:
+        """Normalize a textual location for cache lookup (NFKC, 소문자, 공백 정리)"""
+        normalized = unicodedata.normalize('NFKC', location_str).lower()
+        return ' '.join(normalized.replace(' ,', ',').split())
+    
+    def resolve_location(self, location_str: str, trace: Trace = None, cancel: CancelToken = None) -> tuple:
+        """Resolve a location string once, returning ((lat, lng), source)
+        
+        source는 'coordinates' (GPS 좌표 그대로), 'memory', 'disk', 'api' 중 하나.
+        실제 지오코딩 API 호출은 'api'인 경우뿐이며, cancel이 취소됐으면 API를 부르지 않고 SearchCancelled.
+        """
+        start = time.perf_counter()
+        latlng, source = self._resolve_location(location_str, trace, cancel)
+        elapsed = time.perf_counter() - start
+        metrics.observe('stage_seconds', elapsed, stage='geocode', source=source)
+        metrics.inc('geocode_total', source=source)
+        if trace is not None:
+            trace.record('geocode', elapsed)
+        return latlng, source
+    
+    def _cached_location(self, location_str: str) -> tuple:
+        """Resolve without the geocoding API: ((lat, lng), source), or (None, cache_key) on a miss"""
+        geocode_start = time.time()
+        
+        # GPS 좌표가 이미 있으면 바로 사용
+        coordinates = self._parse_coordinates(location_str)
+        if coordinates is not None:
             geocode_time = time.time() - geocode_start
-            print(f"[TIMING] 지오코딩 API 호출: {geocode_time:.3f}초")
+            logger.debug("[TIMING] GPS 좌표 사용: %.3f초", geocode_time)
+            return coordinates, 'coordinates'
+        
+        cache_key = self._normalize_location(location_str)
+        cached = self.geocode_memory_cache.get(cache_key)
+        if cached is not None:
+            return cached, 'memory'
+        
+        stored = self.geocode_store.get(cache_key)
+        if stored is not None:
+            latlng = (stored[0], stored[1])
+            self.geocode_memory_cache.set(cache_key, latlng)
+            logger.debug("[TIMING] 지오코딩 디스크 캐시 사용: %.3f초", time.time() - geocode_start)
+            return latlng, 'disk'
+        return None, cache_key
+    
+    def _store_geocode(self, location_str: str, cache_key: str, result: list, geocode_start: float) -> tuple:
+        """Count one geocoding API call, parse its result and store it in both caches"""
+        self._count_api_call('geocode')  # Track geocoding call
+        metrics.inc('api_calls_total', api='geocoding')
+        metrics.inc('api_cost_usd_total', self.geocoding_cost, api='geocoding')
+        geocode_time = time.time() - geocode_start
+        logger.debug("[TIMING] 지오코딩 API 호출: %.3f초", geocode_time)
+        
+        if not result or len(result) == 0:
+            raise ValueError(f"지오코딩 실패: {location_str}")
+        
+        try:
+            loc = result[0]['geometry']['location']
+            latlng = (loc['lat'], loc['lng'])
+        except (KeyError, IndexError) as e:
+            raise ValueError(f"지오코딩 결과 파싱 실패: {e}")
+        
+        self.geocode_memory_cache.set(cache_key, latlng)
+        self.geocode_store.set(cache_key, list(latlng))
+        return latlng
+    
+    def _resolve_location(self, location_str: str, trace: Trace = None, cancel: CancelToken = None) -> tuple:
+        try:
+            latlng, source = self._cached_location(location_str)
+            if latlng is not None:
+                return latlng, source
+            cache_key = source
+            if cancel is not None:
+                cancel.check('geocode')
             
-            if not result or len(result) == 0:
-                raise ValueError(f"지오코딩 실패: {location_str}")
+            def geocode_api():
+                geocode_start = time.time()
+                result = call_with_limit(self.rate_limits['geocode'], lambda: self.gmaps.geocode(location_str), trace,
+                                         cancel=cancel)
+                return self._store_geocode(location_str, cache_key, result, geocode_start)
             
-            try:
-                loc = result[0]['geometry']['location']
-                return (loc['lat'], loc['lng'])
-            except (KeyError, IndexError) as e:
-                raise ValueError(f"지오코딩 결과 파싱 실패: {e}")
+            # 같은 위치를 동시에 지오코딩하는 요청은 API 호출 하나를 공유
+            latlng, shared = self.geocode_flight.do(cache_key, geocode_api, timeout=COALESCE_CALL_TIMEOUT, cancel=cancel)
+            return latlng, 'coalesced' if shared else 'api'
+        except SearchCancelled:
+            raise
         except Exception as e:
             raise ValueError(f"지오코딩 에러: {e}")
     
+    def get_geocode_cache_stats(self) -> dict:
+        """Geocoding cache statistics (memory LRU + persistent store)"""
+        return {
+            'memory': self.geocode_memory_cache.stats(),
+            'disk': self.geocode_store.stats()
+        }
+    
+    def _count_api_call(self, api: str, count: int = 1):
+        """Thread-safe increment of the process-wide API call counters"""
+        with self._api_calls_lock:
+            self.api_calls += count
+            self.api_usage[api] += count
+    
+    def get_rate_limit_stats(self) -> dict:
+        return {api: bucket.stats() for api, bucket in self.rate_limits.items()}
+    
+    def get_hedge_stats(self) -> dict:
+        return {'places': self.places_hedger.stats(), **get_llm_hedge_stats()}
+    
     # Place Details API removed to minimize costs
     # def get_place_details(self, place_id: str) -> dict:
     #     """Get detailed information about a place using Place Details API"""
     #     # This function is disabled to reduce API costs
     #     return {}
     
-    def search_by_types(self, place_types: list, latlng: tuple, radius: int):
-        """Search using Google Maps API type parameter"""
-        all_results = []
-        seen_places = set()
+    @staticmethod
+    def _places_cache_key(endpoint: str, params: dict, page: int) -> str:
+        """Geo-tiled cache key: geohash cell of the center + quantized radius + type/keyword + page"""
+        lat, lng = params['location']
+        cell = geohash_encode(float(lat), float(lng), PLACES_CACHE_GEOHASH_PRECISION)
+        radius = params.get('radius')
+        if radius is not None:
+            radius = -(-int(radius) // PLACES_CACHE_RADIUS_STEP) * PLACES_CACHE_RADIUS_STEP
+        return '|'.join(str(part) for part in (
+            endpoint, cell, radius,
+            params.get('type') or '', params.get('keyword') or '', params.get('query') or '',
+            params.get('rank_by') or '', page
+        ))
+    
+    def _cached_places_response(self, plan: QueryPlan, endpoint: str, params: dict, page: int) -> tuple:
+        """Return (cached response or None, persistent cache key or None)"""
+        if self.places_cache is None:
+            return None, None
+        cache_key = self._places_cache_key(endpoint, params, page)
+        cached = self.places_cache.get(cache_key)
+        if cached is not None:
+            plan.record_cache_hit()
+            metrics.inc('places_calls_avoided_total', reason='cache')
+        return cached, cache_key
+    
+    def _record_places_call(self, plan: QueryPlan, plan_key: tuple, endpoint: str, cache_key: str, response: dict) -> dict:
+        """Count one billed Places call and store its response in the persistent cache"""
+        self._count_api_call(endpoint)
+        plan.record_issued(key=plan_key)
+        metrics.inc('api_calls_total', api='places')
+        metrics.inc('api_cost_usd_total', self.cost_per_call, api='places')
         
-        for place_type in place_types:
-            try:
-                print(f"[DEBUG] places_nearby type 검색: {place_type}")
-                places_result = self.gmaps.places_nearby(
-                    location=latlng,
-                    radius=radius,
-                    type=place_type
-                )
-                self.api_calls += 1
+        if cache_key is not None:
+            self.places_cache.set(cache_key, response)
+        return response
+    
+    @staticmethod
+    def _admit_hedge(plan: QueryPlan, bucket) -> bool:
+        """요청당 PLACES_HEDGE_MAX_PER_REQUEST개 안이고 기다리지 않고 토큰을 얻을 때만 hedge를 보낸다"""
+        return plan.admit_hedge(PLACES_HEDGE_MAX_PER_REQUEST) and bucket.try_acquire()
+    
+    def _record_hedged_call(self, plan: QueryPlan, endpoint: str):
+        """Count one hedged duplicate Places call - billed, so it goes into the plan's budget and the cost summary"""
+        self._count_api_call(endpoint)
+        plan.record_hedged()
+        metrics.inc('api_calls_total', api='places')
+        metrics.inc('api_cost_usd_total', self.cost_per_call, api='places')
+    
+    def _places_request(self, plan: QueryPlan, endpoint: str, params: dict, page: int = 1, page_token: str = None) -> dict:
+        """Issue one Places API page call through the request's query plan
+        
+        동일한 (endpoint, type/keyword, 위치, radius, page) 호출은 요청 안에서 한 번만 발행되고
+        반복 호출은 메모된 응답을 재사용한다 (다음 페이지 토큰 대기도 생략됨).
+        요청 메모에 없으면 영구 캐시를 먼저 보고, 그래도 없을 때만 실제 API를 호출한다.
+        다른 요청이 같은 호출을 이미 진행 중이면(SingleFlight) 새로 호출하지 않고 그 응답을 기다린다.
+        다음 페이지는 고정 대기 없이 PageTokenPoller가 토큰 활성화를 폴링한다.
+        실제 호출(토큰 재시도 포함)은 매번 API별 token bucket에서 토큰을 받은 뒤 places_hedger로 보낸다.
+        hedger는 HTTP 호출에만 PLACES_CALL_DEADLINE을 걸고, 느린 호출은 기다리지 않고 얻은 토큰이 있을 때만
+        요청당 PLACES_HEDGE_MAX_PER_REQUEST번까지 한 번 더 보낸다 (hedge 호출도 과금 호출로 센다).
+        plan.cancel이 취소되면 아직 보내지 않은 호출, 토큰/호출 제한 대기는 버리고 SearchCancelled를 올린다
+        (이미 나간 호출은 캐시와 다른 요청이 쓸 수 있도록 끝까지 받는다).
+        캐시에서 나온 페이지의 next_page_token은 만료됐을 수 있는데, 이 경우 다음 페이지 호출이
+        실패하고 페이지네이션은 거기서 멈춘다.
+        """
+        api = self.gmaps.places_nearby if endpoint == 'nearby' else self.gmaps.places
+        
+        cancel = plan.cancel
+        
+        def upstream():
+            cached, cache_key = self._cached_places_response(plan, endpoint, params, page)
+            if cached is not None:
+                return cached
+            
+            def call_api(**extra):
+                bucket = self.rate_limits[endpoint]
                 
-                results = places_result.get('results', [])
-                print(f"[DEBUG] {place_type} 1페이지 검색 결과: {len(results)}개")
+                def request():
+                    with metrics.span('places_call', plan.trace, endpoint=endpoint):
+                        return api(**extra, **params)
                 
-                # next_page_token 처리 - 모든 페이지 가져오기
-                next_token = places_result.get('next_page_token')
-                page_count = 1
+                def hedged():
+                    return self.places_hedger.call(request, cancel=cancel, admit=lambda: self._admit_hedge(plan, bucket),
+                                                   on_hedge=lambda: self._record_hedged_call(plan, endpoint))
                 
-                while next_token:
-                    time.sleep(GOOGLE_API_DELAY)
-                    try:
-                        next_result = self.gmaps.places_nearby(
-                            page_token=next_token,
-                            location=latlng,
-                            radius=radius,
-                            type=place_type
-                        )
-                        self.api_calls += 1
-                        next_results = next_result.get('results', [])
-                        results.extend(next_results)
-                        next_token = next_result.get('next_page_token')
-                        page_count += 1
-                        print(f"[DEBUG] {place_type} {page_count}페이지: {len(next_results)}개 추가")
-                    except Exception as e:
-                        print(f"[ERROR] {place_type} next page error: {e}")
-                        break
+                # 토큰 대기는 hedger 밖에서 - 대기 시간이 hedge 지연 추정과 호출 deadline에 들어가지 않는다
+                return call_with_limit(bucket, hedged, plan.trace, cancel=cancel)
+            
+            def token_wait(seconds):
+                with metrics.span('page_token_wait', plan.trace):
+                    if cancel is not None:
+                        cancel.sleep(seconds)
+                    else:
+                        time.sleep(seconds)
+            
+            try:
+                if cancel is not None:
+                    cancel.check()
+                if page_token:
+                    response = self.page_poller.fetch(lambda: call_api(page_token=page_token), sleep=token_wait)
+                else:
+                    response = call_api()
+            except SearchCancelled:
+                cancel.skip('places')
+                raise
+            return self._record_places_call(plan, plan.key(endpoint, params, page), endpoint, cache_key, response)
+        
+        def fetch():
+            # 다른 요청이 같은 호출을 진행 중이면 그 응답을 공유 (응답은 읽기 전용으로만 쓰인다)
+            response, shared = self.places_flight.do(plan.key(endpoint, params, page), upstream, timeout=COALESCE_CALL_TIMEOUT,
+                                                     cancel=cancel)
+            if shared:
+                plan.record_coalesced()
+                metrics.inc('places_calls_avoided_total', reason='coalesced')
+            return response
+        
+        return plan.execute(endpoint, params, page, fetch)
+    
+    def _fetch_all_pages(self, plan: QueryPlan, endpoint: str, params: dict, label: str) -> tuple:
+        """Fetch the first page and follow every next_page_token
+        
+        Returns (results, complete) - complete는 중간 에러 없이 마지막 페이지까지 받았는지 여부
+        """
+        places_result = self._places_request(plan, endpoint, params)
+        results = list(places_result.get('results', []))
+        logger.debug("%s 1페이지 검색 결과: %s개", label, len(results))
+        
+        # next_page_token 처리 - 모든 페이지 가져오기
+        next_token = places_result.get('next_page_token')
+        page_count = 1
+        
+        while next_token:
+            try:
+                next_result = self._places_request(plan, endpoint, params, page_count + 1, next_token)
+                next_results = next_result.get('results', [])
+                results.extend(next_results)
+                next_token = next_result.get('next_page_token')
+                page_count += 1
+                logger.debug("%s %s페이지: %s개 추가", label, page_count, len(next_results))
+            except SearchCancelled:
+                raise
+            except Exception as e:
+                logger.error("%s next page error: %s", label, e)
+                return results, False
+        
+        return results, True
+    
+    @staticmethod
+    def _to_place_data(result: dict, search_term: str, radius: int):
+        """Raw Places result → 응답용 place dict (place_id나 좌표가 없으면 None)"""
+        place_id = result.get('place_id', '')
+        geometry = result.get('geometry', {})
+        location_data = geometry.get('location', {})
+        lat = location_data.get('lat')
+        lng = location_data.get('lng')
+        if not place_id or not (lat and lng and lat != 0 and lng != 0):
+            return None
+        return {
+            'name': result.get('name', 'Unknown'),
+            'rating': result.get('rating', 'N/A'),
+            'address': result.get('vicinity', result.get('formatted_address', 'Unknown')),
+            'lat': lat,
+            'lng': lng,
+            'types': result.get('types', []),
+            'price_level': result.get('price_level', 'N/A'),
+            'place_id': place_id,
+            'search_term': search_term,
+            'search_radius': radius,
+            'distance_meters': result.get('distance_meters', 'N/A')
+        }
+    
+    def search_by_types(self, place_types: list, latlng: tuple, radius: int, plan: QueryPlan = None, cancel: CancelToken = None):
+        """Search using Google Maps API type parameter
+        
+        cancel(또는 plan.cancel)이 취소되면 남은 type은 검색하지 않고 SearchCancelled를 올린다.
+        """
+        all_results = []
+        seen_places = set()
+        plan = plan if plan is not None else QueryPlan(cancel=cancel)
+        
+        for position, place_type in enumerate(place_types):
+            try:
+                # 이미 같은 type으로 검색한 범위 안이면 로컬 인덱스에서 응답
+                results = self.place_index.lookup(place_type, latlng, radius)
+                if results is not None:
+                    plan.record_index_hit()
+                    logger.debug("%s 로컬 인덱스 응답: %s개", place_type, len(results))
+                else:
+                    logger.debug("places_nearby type 검색: %s", place_type)
+                    params = {'location': latlng, 'radius': radius, 'type': place_type}
+                    results, complete = self._fetch_all_pages(plan, 'nearby', params, place_type)
+                    self.place_index.add(place_type, latlng, radius, results, complete)
                 
                 for result in results:
-                    place_id = result.get('place_id', '')
-                    if place_id and place_id not in seen_places:
-                        geometry = result.get('geometry', {})
-                        location_data = geometry.get('location', {})
-                        lat = location_data.get('lat')
-                        lng = location_data.get('lng')
-                        
-                        if lat and lng and lat != 0 and lng != 0:
-                            place_data = {
-                                'name': result.get('name', 'Unknown'),
-                                'rating': result.get('rating', 'N/A'),
-                                'address': result.get('vicinity', result.get('formatted_address', 'Unknown')),
-                                'lat': lat,
-                                'lng': lng,
-                                'types': result.get('types', []),
-                                'price_level': result.get('price_level', 'N/A'),
-                                'place_id': place_id,
-                                'search_term': place_type,
-                                'search_radius': radius,
-                                'distance_meters': result.get('distance_meters', 'N/A')
-                            }
-                            all_results.append(place_data)
-                            seen_places.add(place_id)
-                            
+                    place_data = self._to_place_data(result, place_type, radius)
+                    if place_data is not None and place_data['place_id'] not in seen_places:
+                        all_results.append(place_data)
+                        seen_places.add(place_data['place_id'])
+                
+            except SearchCancelled:
+                if plan.cancel is not None:
+                    plan.cancel.skip('places', len(place_types) - position - 1)  # 남은 type의 첫 페이지
+                raise
             except Exception as e:
-                print(f"[ERROR] {place_type} 검색 실패: {e}")
+                logger.error("%s 검색 실패: %s", place_type, e)
                 continue
         
         return all_results
     
-    def search_places_batch(self, queries: list, location: str = DEFAULT_LOCATION, radius: int = SEARCH_RADIUS, place_types: list = None):
-        """Search for places using multiple keywords in optimized batches"""
-        print(f"[DEBUG] search_places_batch 호출됨 - radius: {radius}m")
-        latlng = self.geocode_location(location)
+    @staticmethod
+    def _sort_by_distance(places: list, user_latlng: tuple) -> list:
+        """Set place['distance'] (km) and return places sorted nearest first"""
+        if not places:
+            return places
+        order, distances = filter_and_sort_by_distance(
+            user_latlng[0], user_latlng[1],
+            [place['lat'] for place in places], [place['lng'] for place in places]
+        )
+        for place, distance in zip(places, distances):
+            place['distance'] = float(distance) / 1000  # km
+        return [places[index] for index in order]
+    
+    @staticmethod
+    def _annotate_distance(places: list, user_latlng: tuple):
+        """Set place['distance'] (km) from the user's coordinates"""
+        if not places:
+            return
+        distances = haversine_batch(
+            user_latlng[0], user_latlng[1],
+            [place['lat'] for place in places], [place['lng'] for place in places]
+        )
+        for place, distance in zip(places, distances):
+            place['distance'] = float(distance) / 1000
+    
+    @staticmethod
+    def _plan_limits(deadline: float = None, max_cost_usd: float = None, target_results: int = None) -> tuple:
+        """요청 옵션이 없으면 서버 기본값 - (deadline 초, max_cost_usd, target_results)"""
+        return (
+            SEARCH_DEADLINE_SECONDS if deadline is None else float(deadline),
+            SEARCH_MAX_COST_USD if max_cost_usd is None else float(max_cost_usd),
+            SEARCH_TARGET_RESULTS if target_results is None else int(target_results),
+        )
+    
+    def _new_planner(self, plan: QueryPlan, latlng: tuple, radius: int, location_source: str, deadline_at: float,
+                     max_cost_usd: float, target_results: int, on_places=None, progressive: bool = False,
+                     on_ring=None) -> QueryPlanner:
+        """progressive면 radius를 최대 반경으로 가까운 곳부터 ring 단위로 넓히는 RingPlanner"""
+        if progressive:
+            return RingPlanner(
+                self, plan, FanoutMerger(), latlng, radius,
+                deadline_at=deadline_at,
+                max_cost_usd=max_cost_usd,
+                target_results=target_results,
+                yield_model=self.yield_model,
+                spent_usd=self.geocoding_cost if location_source == 'api' else 0.0,
+                max_workers=MAX_WORKERS,
+                on_places=on_places,
+                on_ring=on_ring
+            )
+        return QueryPlanner(
+            self, plan, FanoutMerger(), latlng, radius,
+            deadline_at=deadline_at,
+            max_cost_usd=max_cost_usd,
+            target_results=target_results,
+            yield_model=self.yield_model,
+            spent_usd=self.geocoding_cost if location_source == 'api' else 0.0,
+            max_workers=MAX_WORKERS,
+            on_places=on_places
+        )
+    
+    def _summarize_search(self, keywords_result: dict, all_results: list, plan: QueryPlan, planner: QueryPlanner,
+                          candidates: list, latlng: tuple, location_source: str, radius: int, deadline: float,
+                          trace: Trace, started_at: float, keyword_time: float, geocode_time: float, plan_time: float,
+                          speculation: SpeculativeWave = None) -> tuple:
+        """Attach plan, cost, cache and timing details to keywords_result once the Places plan has run
         
-        # Use place_types if provided, otherwise use keyword search
-        if place_types:
-            print(f"[DEBUG] place_types로 검색: {place_types}")
-            return self.search_by_types(place_types, latlng, radius)
+        sync/async 검색 경로가 공유한다. Returns (keywords_result, places)
+        """
+        search_timings = {'planned_search': f"{plan_time:.3f}초"}
+        keywords_result['query_plan'] = {
+            'deadline_seconds': deadline,
+            **planner.report(candidates, plan_time)
+        }
         
-        # Combine queries into a single search to reduce API calls
-        if not queries:
-            print(f"[DEBUG] 빈 queries 리스트 - 검색 스킵")
-            return []
-        combined_query = ' OR '.join(queries[:5])  # Limit to top 5 keywords
+        # 실제 API 호출 수 출력
+        logger.debug("[API CALLS] 실제 호출 수: %s번, 중복 제거: %s번, 캐시: %s번 (geocoding 제외), 중단 사유: %s", plan.issued, plan.deduplicated, plan.cache_hits, planner.stop_reason)
         
-        all_results = []
-        seen_places = set()
+        # Sort by distance if user location is coordinates
+        if location_source == 'coordinates':
+            with metrics.span('sort', trace):
+                all_results = self._sort_by_distance(all_results, latlng)
+        
+        # 결과 수 제한 없음 - 응답 크기는 /search의 페이지(cursor)로 나눈다
+        logger.debug("[TIMING] 총 %s개의 검색 결과 표시", len(all_results))
+        
+        # Calculate costs and timing
+        issued_calls = plan.issued
+        deduplicated_calls = plan.deduplicated
+        geocoding_calls = 1 if location_source == 'api' else 0  # GPS 좌표/캐시 적중이면 지오코딩 안함
+        total_cost = (issued_calls * self.cost_per_call) + (geocoding_calls * self.geocoding_cost)
+        saved_cost = (deduplicated_calls + plan.cache_hits + plan.coalesced) * self.cost_per_call
+        total_search_time = time.time() - started_at
+        
+        logger.debug("[TIMING] 전체 검색 프로세스 완료: %.3f초", total_search_time)
+        logger.info("[API SUMMARY] 검색 API: %s번 (hedge %s번 포함, 중복 제거 %s번, 캐시 %s번), 지오코딩: %s번, 총: %s번", issued_calls, plan.hedged, deduplicated_calls, plan.cache_hits, geocoding_calls, issued_calls + geocoding_calls)
+        logger.info("[COST] 총 비용: $%s (약 %s원), 절감: $%s", round(total_cost, 4), round(total_cost * USD_TO_KRW, 0), round(saved_cost, 4))
+        logger.info("[COST] 세부: Places API %s회 × $0.032 + 지오코딩 %s회 × $0.005", issued_calls, geocoding_calls)
+        
+        # Add cost and timing information to keywords_result
+        keywords_result['api_calls'] = issued_calls
+        keywords_result['deduplicated_api_calls'] = deduplicated_calls
+        keywords_result['coalesced_api_calls'] = plan.coalesced
+        keywords_result['hedged_api_calls'] = plan.hedged  # api_calls에 포함된 hedge 중복 호출
+        keywords_result['geocoding_calls'] = geocoding_calls
+        keywords_result['total_api_calls'] = issued_calls + geocoding_calls
+        keywords_result['estimated_cost_usd'] = round(total_cost, 4)
+        keywords_result['estimated_cost_krw'] = round(total_cost * USD_TO_KRW, 0)
+        keywords_result['estimated_saved_cost_usd'] = round(saved_cost, 4)
+        keywords_result['pagination'] = self.page_poller.stats()
+        keywords_result['rate_limits'] = self.get_rate_limit_stats()
+        keywords_result['hedging'] = self.get_hedge_stats()
+        keywords_result['place_index'] = {
+            'request_hits': plan.index_hits,
+            **self.place_index.stats()
+        }
+        keywords_result['keyword_cache'] = get_keyword_cache_stats()
+        keywords_result['geocode_cache'] = {
+            'source': location_source,
+            'resolve_time': round(geocode_time, 4),
+            **self.get_geocode_cache_stats()
+        }
+        keywords_result['places_cache'] = {
+            'request_hits': plan.cache_hits,
+            'request_misses': issued_calls - plan.hedged,
+            **(self.places_cache.stats() if self.places_cache is not None else {'enabled': False})
+        }
+        keywords_result['speculation'] = self._speculation_report(speculation)
+        if isinstance(planner, RingPlanner):
+            keywords_result['search_strategy'] = f'Progressive Rings up to {radius}m (nearest first)'
+        else:
+            keywords_result['search_strategy'] = f'{radius}m Radius with Budget-aware Query Plan'
+        
+        # Add detailed timing information
+        keywords_result['search_timing'] = {
+            'total_search_time': round(total_search_time, 3),
+            'keyword_generation_time': round(keyword_time, 3),
+            'geocode_time': round(geocode_time, 4),
+            'api_search_time': round(total_search_time - keyword_time, 3),
+            'detailed_timings': search_timings,
+            'stages': trace.summary()
+        }
         
+        metrics.observe('stage_seconds', total_search_time, stage='search_total')
+        metrics.inc('places_calls_avoided_total', deduplicated_calls, reason='dedup')
+        metrics.inc('places_calls_avoided_total', plan.index_hits, reason='index')
+        
+        return keywords_result, all_results  # Return all results found
+    
+    def _speculative_types(self, max_cost_usd: float, location_source: str) -> list:
+        """추측 호출할 place_type - 지오코딩 후 남은 예산을 넘지 않게 앞에서부터 자른다"""
+        spent = self.geocoding_cost if location_source == 'api' else 0.0
+        affordable = int((max_cost_usd - spent) // self.cost_per_call)
+        return SPECULATIVE_PLACE_TYPES[:max(affordable, 0)]
+    
+    def _speculation_report(self, speculation: SpeculativeWave) -> dict:
+        if speculation is None:
+            return {'started': 0, 'wasted_cost_usd': 0.0}
+        return speculation.report(self.cost_per_call)
+    
+    def _generate_keywords(self, korean_text: str, trace: Trace, cancel: CancelToken = None) -> tuple:
+        """(keywords_result, keyword_time) - 파이프라인 스레드에서 위치 해석과 동시에 실행된다"""
+        keyword_start = time.time()
+        with metrics.span('keywords', trace):
+            keywords_result = ultra_search_keywords(korean_text, cancel=cancel)
+        keyword_time = time.time() - keyword_start
+        logger.debug("[TIMING] 키워드 생성 전체: %.3f초", keyword_time)
+        logger.debug("키워드 생성 결과: %s", keywords_result)
+        return keywords_result, keyword_time
+    
+    def search_with_keywords(self, korean_text: str, location: str = DEFAULT_LOCATION, radius: int = SEARCH_RADIUS, on_event=None,
+                             deadline: float = None, max_cost_usd: float = None, target_results: int = None,
+                             progressive: bool = False, cancel: CancelToken = None):
+        """Search using ultra_search keywords with configurable radius and individual category searches
+        
+        Places 팬아웃은 QueryPlanner가 deadline(초, 요청 시작 기준) / max_cost_usd / target_results 안에서
+        기대 수확 순으로 실행하며, 실제 플랜과 중단 사유는 keywords_result['query_plan']에 담긴다.
+        
+        progressive면 radius를 최대 반경으로 보고 가까운 곳부터 ring 단위로 넓혀 간다 (RingPlanner).
+        안쪽 ring의 장소는 다시 받지 않으며, ring별 반경/호출 수/비용/시간은 keywords_result['query_plan']['rings']에 담긴다.
+        
+        키워드 생성(LLM)과 위치 해석은 서로 의존하지 않으므로 동시에 실행하고, 위치가 먼저 나오면
+        SPECULATIVE_PLACE_TYPES의 1페이지를 같은 플랜으로 미리 호출한다. LLM 결과의 후보와 맞는 호출은
+        플래너가 그대로 재사용하고 나머지는 취소/폐기되며, 그 비용은 keywords_result['speculation']에 담긴다.
+        
+        on_event(event, payload)가 주어지면 진행 상황을 스트리밍용 이벤트로 알린다:
+        LLM 직후 'keywords', 서브 검색이 끝날 때마다 새 장소 묶음 'places', progressive면 ring이 끝날 때마다 'ring'.
+        이벤트 payload는 복사본이라 이후 결과 dict가 바뀌어도 안전하다.
+        
+        cancel(CancelToken)은 요청의 취소 신호이며 deadline이 그 마감으로 함께 걸린다. 취소되면 LLM 대기, 지오코딩,
+        아직 보내지 않은 Places 호출과 토큰/호출 제한 대기를 멈추고 SearchCancelled를 올린다. 이미 나간 호출은
+        끝나게 두어 캐시와 같은 검색을 하는 다른 요청이 쓸 수 있게 한다.
+        """
         try:
-            # 1. places_nearby 검색 (페이지네이션 포함)
-            all_api_results = []
-            
-            print(f"[DEBUG] places_nearby 호출: location={latlng}, radius={radius}, keyword='{combined_query}'")
-            places_result = self.gmaps.places_nearby(
-                location=latlng,
-                radius=radius,
-                keyword=combined_query
-            )
-            self.api_calls += 1
-            nearby_results = places_result.get('results', [])
-            all_api_results.extend(nearby_results)
-            
-            # next_page_token 처리 - 모든 페이지 가져오기
-            next_token = places_result.get('next_page_token')
-            page_count = 1
+            total_search_start = time.time()
+            total_search_monotonic = time.monotonic()
+            deadline, max_cost_usd, target_results = self._plan_limits(deadline, max_cost_usd, target_results)
+            if cancel is None:
+                cancel = CancelToken(total_search_monotonic + deadline)
+            else:
+                cancel.bound(total_search_monotonic + deadline)
+            # 요청 단위 단계별 타이밍 (응답의 search_timing.stages)
+            trace = Trace()
             
-            while next_token:
-                time.sleep(GOOGLE_API_DELAY)
+            # 요청 단위 쿼리 플랜 - 동일한 Places 호출은 한 번만 발행 (추측 호출도 같은 플랜을 쓴다)
+            plan = QueryPlan(trace=trace, cancel=cancel)
+            pipeline = ThreadPoolExecutor(max_workers=1 + len(SPECULATIVE_PLACE_TYPES), thread_name_prefix='pipeline')
+            try:
+                keyword_future = pipeline.submit(self._generate_keywords, korean_text, trace, cancel)
+                
+                # 위치는 요청당 한 번만 해석 (메모리 LRU → 디스크 → 지오코딩 API) - LLM과 동시에
+                geocode_start = time.time()
+                latlng, location_source = self.resolve_location(location, trace, cancel)
+                geocode_time = time.time() - geocode_start
+                logger.debug("[TIMING] 위치 해석 (%s): %.4f초", location_source, geocode_time)
+                
+                speculation = None
+                # 추측 호출은 radius 검색 파라미터라 progressive(rank_by=distance) 후보와 합쳐지지 않는다
+                speculative_types = [] if progressive else self._speculative_types(max_cost_usd, location_source)
+                if speculative_types and not wait([keyword_future], timeout=SPECULATION_GRACE).done:
+                    speculation = SpeculativeWave(plan, speculative_types, latlng, radius, self.place_index)
+                    speculation.start(pipeline, self._places_request)
+                
                 try:
-                    next_result = self.gmaps.places_nearby(
-                        page_token=next_token,
-                        location=latlng,
-                        radius=radius,
-                        keyword=combined_query
-                    )
-                    self.api_calls += 1
-                    next_results = next_result.get('results', [])
-                    all_api_results.extend(next_results)
-                    next_token = next_result.get('next_page_token')
-                    page_count += 1
+                    # 취소되면 LLM 응답을 기다리지 않는다 (응답은 키워드 캐시에 남는다)
+                    keywords_result, keyword_time = cancel.wait(keyword_future)
+                except SearchCancelled:
+                    if speculation is not None:
+                        speculation.resolve([])
+                    raise
                 except Exception as e:
-                    print(f"Next page error: {e}")
-                    break
-            
-            nearby_results = all_api_results
-            
-            # 2. places 텍스트 검색 (더 포괄적, 페이지네이션 포함)
-            try:
-                print(f"[DEBUG] places 텍스트 검색 호출: query='{combined_query}', location={latlng}, radius={radius}")
-                text_result = self.gmaps.places(
-                    query=combined_query,
-                    location=latlng,
-                    radius=radius
-                )
-                self.api_calls += 1
-                text_results = text_result.get('results', [])
+                    logger.exception("키워드 생성 실패: %s", e)
+                    if speculation is not None:
+                        speculation.resolve([])
+                    return {"error": f"키워드 생성 실패: {str(e)}", "speculation": self._speculation_report(speculation)}, []
                 
-                # next_page_token 처리 for text search - 모든 페이지 가져오기
-                next_token = text_result.get('next_page_token')
-                page_count = 1
+                if not keywords_result.get("has_location_intent"):
+                    logger.debug("장소 검색 의도가 감지되지 않음")
+                    if speculation is not None:
+                        speculation.resolve([])
+                    return {"error": "장소 검색 의도가 감지되지 않았습니다", "speculation": self._speculation_report(speculation)}, []
                 
-                while next_token:
-                    time.sleep(GOOGLE_API_DELAY)
-                    try:
-                        next_result = self.gmaps.places(
-                            page_token=next_token,
-                            location=latlng,
-                            radius=radius,
-                            query=combined_query
-                        )
-                        self.api_calls += 1
-                        next_page_results = next_result.get('results', [])
-                        text_results.extend(next_page_results)
-                        next_token = next_result.get('next_page_token')
-                        page_count += 1
-                    except Exception as e:
-                        print(f"Text search next page error: {e}")
-                        break
+                if on_event is not None:
+                    on_event('keywords', {'keywords': dict(keywords_result)})
                 
-                # 두 결과 합치기
-                all_api_results = nearby_results + text_results
-            except:
-                all_api_results = nearby_results
-            
-            # 🎯 거리 기준 필터링 적용
-            center_lat, center_lng = latlng
-            print(f"[FILTER] 중심 좌표: ({center_lat}, {center_lng}), 반경: {radius}m")
-            print(f"[FILTER] 필터링 전 결과: {len(all_api_results)}개")
-            
-            filtered_results = filter_by_distance(all_api_results, center_lat, center_lng, radius)
-            print(f"[FILTER] 필터링 후 결과: {len(filtered_results)}개")
-            
-            # 필터링된 결과의 거리 정보 출력
-            if filtered_results:
-                distances = [r.get('distance_meters', 'N/A') for r in filtered_results[:5]]
-                print(f"[FILTER] 처음 5개 거리: {distances}m")
-            
-            results = filtered_results
-            
-            # Filter results with valid coordinates and remove duplicates
-            for result in results:
-                place_id = result.get('place_id', '')
-                if place_id and place_id not in seen_places:
-                    geometry = result.get('geometry', {})
-                    location_data = geometry.get('location', {})
-                    lat = location_data.get('lat')
-                    lng = location_data.get('lng')
-                    
-                    if lat and lng and lat != 0 and lng != 0:
-                        place_data = {
-                            'name': result.get('name', 'Unknown'),
-                            'rating': result.get('rating', 'N/A'),
-                            'address': result.get('vicinity', result.get('formatted_address', 'Unknown')),
-                            'lat': lat,
-                            'lng': lng,
-                            'types': result.get('types', []),
-                            'price_level': result.get('price_level', 'N/A'),
-                            'place_id': place_id,
-                            'search_term': combined_query,
-                            'search_radius': radius,
-                            'distance_meters': result.get('distance_meters', 'N/A')  # 거리 정보 추가
-                        }
-                        all_results.append(place_data)
-                        seen_places.add(place_id)
-            
-            valid_results = all_results
-            
-            return valid_results
-        except Exception as e:
-            print(f"Search error: {e}")
-            return []
-
-
-
-
-    
-    def search_with_keywords(self, korean_text: str, location: str = DEFAULT_LOCATION, radius: int = SEARCH_RADIUS):
-        """Search using ultra_search keywords with configurable radius and individual category searches"""
-        try:
-            total_search_start = time.time()
-            
-            # Reset API call counter for this search
-            initial_api_calls = self.api_calls
-            self.api_calls = 0
-            
-            # Get keywords from ultra_search
-            keyword_start = time.time()
-            try:
-                keywords_result = ultra_search_keywords(korean_text)
-                keyword_time = time.time() - keyword_start
-                print(f"[TIMING] 키워드 생성 전체: {keyword_time:.3f}초")
-                print(f"[DEBUG] 키워드 생성 결과: {keywords_result}")
-            except Exception as e:
-                print(f"[ERROR] 키워드 생성 실패: {e}")
-                import traceback
-                traceback.print_exc()
-                return {"error": f"키워드 생성 실패: {str(e)}"}, []
-            
-            if not keywords_result.get("has_location_intent"):
-                print("[DEBUG] 장소 검색 의도가 감지되지 않음")
-                return {"error": "장소 검색 의도가 감지되지 않았습니다"}, []
-            
-            all_results = []
-            seen_places = set()
-            
-            # 키워드별로 분리
-            direct_keywords = keywords_result.get("direct_translation", [])
-            abstract_keywords = keywords_result.get("abstract_translation", [])
-            place_types = keywords_result.get("place_types", [])
-            
-            print(f"[DEBUG] Keywords result type: {type(keywords_result)}")
-            print(f"[DEBUG] Direct keywords: {direct_keywords} (len: {len(direct_keywords)})")
-            print(f"[DEBUG] Abstract keywords: {abstract_keywords} (len: {len(abstract_keywords)})")
-            print(f"[DEBUG] Place types: {place_types} (len: {len(place_types)})")
-            
-            # 🎯 최적화된 검색 로직: 추상키워드 3,4,5개씩 + place_type 3개 = 총 9번 호출
-            search_timings = {}
-            
-            # 추상키워드 3,4,5개씩 + place_type 3개 조합 검색
-            if place_types and abstract_keywords:
-                combo_start = time.time()
-                print(f"[SEARCH] 6개씩 2번 검색: place_type 3개 × 2회 = 총 6번 호출 (pagination 포함 최대 18번)")
+                all_results = []
                 
-                # place_types를 3개로 제한
-                limited_place_types = place_types[:3]
-                print(f"[DEBUG] 사용할 place_types: {limited_place_types}")
+                on_places = on_ring = None
+                if on_event is not None:
+                    def on_places(new_places):
+                        batch = [dict(place) for place in new_places]
+                        if location_source == 'coordinates':
+                            self._annotate_distance(batch, latlng)
+                        on_event('places', {'places': batch})
+                    
+                    def on_ring(ring):
+                        on_event('ring', {'ring': ring})
                 
-                # 6개씩 2번 나누기
-                chunk_1 = abstract_keywords[:6]  # 처음 6개
-                chunk_2 = abstract_keywords[6:12] if len(abstract_keywords) > 6 else abstract_keywords[:6]  # 다음 6개 (없으면 처음 6개 재사용)
-                chunks = [chunk_1, chunk_2]
+                # 키워드별로 분리
+                direct_keywords = keywords_result.get("direct_translation", [])
+                abstract_keywords = keywords_result.get("abstract_translation", [])
+                place_types = keywords_result.get("place_types", [])
                 
-                search_count = 0
-                for round_num, chunk in enumerate(chunks, 1):
-                    for place_type in limited_place_types:
-                        search_count += 1
-                        try:
-                            print(f"[SEARCH {search_count}/6] {place_type} + 6개 키워드 ({round_num}차): {chunk[:6]}")
-                            
-                            # Place type으로 검색
-                            type_results = self.search_by_types([place_type], self.geocode_location(location), radius)
-                            
-                            print(f"[RESULT {search_count}/6] {place_type}: {len(type_results)}개")
-                            
-                            for result in type_results:
-                                if result['place_id'] not in seen_places:
-                                    result['search_type'] = f'{place_type}_round{round_num}'
-                                    all_results.append(result)
-                                    seen_places.add(result['place_id'])
-                                    
-                        except Exception as exc:
-                            print(f"[ERROR {search_count}/6] {place_type} 검색 실패: {exc}")
+                logger.debug("Keywords result type: %s", type(keywords_result))
+                logger.debug("Direct keywords: %s (len: %s)", direct_keywords, len(direct_keywords))
+                logger.debug("Abstract keywords: %s (len: %s)", abstract_keywords, len(abstract_keywords))
+                logger.debug("Place types: %s (len: %s)", place_types, len(place_types))
                 
-                combo_time = time.time() - combo_start
-                search_timings['optimized_6x2_search'] = f"{combo_time:.3f}초"
+                # 🎯 예산/마감 기반 쿼리 플랜: 기대 수확 순으로 실행하고 충분히 모이면 중단
+                plan_start = time.time()
+                candidates = build_candidates(keywords_result, latlng, radius, rank_by_distance=progressive)
+                if speculation is not None:
+                    speculation.resolve(candidates)
+                planner = self._new_planner(plan, latlng, radius, location_source, total_search_monotonic + deadline,
+                                            max_cost_usd, target_results, on_places, progressive, on_ring)
+                all_results = planner.run(candidates)
+                plan_time = time.time() - plan_start
+                cancel.check()
                 
-                # 실제 API 호출 수 출력
-                print(f"[API CALLS] 실제 호출 수: {self.api_calls}번 (geocoding 제외)")
-                print(f"[API CALLS] 예상 최대: 18번, 실제: {self.api_calls}번")
-            
-            # Sort by distance if user location is coordinates
-            if ',' in location:
-                try:
-                    user_lat, user_lng = map(float, location.split(','))
-                    for result in all_results:
-                        lat, lng = result['lat'], result['lng']
-                        # Calculate distance
-                        import math
-                        R = 6371  # Earth's radius in km
-                        dlat = math.radians(lat - user_lat)
-                        dlon = math.radians(lng - user_lng)
-                        a = (math.sin(dlat/2) * math.sin(dlat/2) + 
-                             math.cos(math.radians(user_lat)) * math.cos(math.radians(lat)) * 
-                             math.sin(dlon/2) * math.sin(dlon/2))
-                        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-                        result['distance'] = R * c
-                    
-                    # Sort by distance
-                    all_results.sort(key=lambda x: x.get('distance', float('inf')))
-                except ValueError:
-                    pass
-            
-            # Show all results without limit
-            print(f"[TIMING] 총 {len(all_results)}개의 검색 결과 표시")
-            
-            # Calculate costs and timing
-            geocoding_calls = 1 if ',' not in location else 0  # GPS 좌표면 지오코딩 안함
-            total_cost = (self.api_calls * self.cost_per_call) + (geocoding_calls * self.geocoding_cost)
-            total_search_time = time.time() - total_search_start
+                return self._summarize_search(
+                    keywords_result, all_results, plan, planner, candidates,
+                    latlng=latlng, location_source=location_source, radius=radius, deadline=deadline, trace=trace,
+                    started_at=total_search_start, keyword_time=keyword_time, geocode_time=geocode_time, plan_time=plan_time,
+                    speculation=speculation
+                )
+            finally:
+                # 멈출 수 없는 추측 호출은 백그라운드에서 끝나게 두고 응답은 기다리지 않는다
+                pipeline.shutdown(wait=False, cancel_futures=True)
             
-            print(f"[TIMING] 전체 검색 프로세스 완료: {total_search_time:.3f}초")
-            print(f"[API SUMMARY] 검색 API: {self.api_calls}번, 지오코딩: {geocoding_calls}번, 총: {self.api_calls + geocoding_calls}번")
-            print(f"[COST] 총 비용: ${round(total_cost, 4)} (약 {round(total_cost * USD_TO_KRW, 0)}원)")
-            print(f"[COST] 세부: Places API {self.api_calls}회 × $0.032 + 지오코딩 {geocoding_calls}회 × $0.005")
+        except SearchCancelled as e:
+            cancelled = cancel.record(e.reason)
+            logger.info("검색 취소 (%s): 보내지 않은 호출 %s, %.1f초 반환", cancelled['reason'],
+                        cancelled['saved_calls'], cancelled['freed_worker_seconds'])
+            raise
+        except Exception as e:
+            logger.error("Keywords search error: %s", e)
+            return {"error": str(e)}, []
+    
+    def _search_key(self, korean_text: str, location: str, radius: int, plan_options: dict) -> tuple:
+        """Key under which concurrent identical searches are coalesced
+
+        (정규화된 입력, 소수점 3자리로 양자화한 좌표 또는 정규화된 위치 문자열, 반경, 플랜 옵션)
+        """
+        coordinates = self._parse_coordinates(location)
+        if coordinates is not None:
+            location_key = tuple(round(value, COALESCE_LOCATION_PRECISION) for value in coordinates)
+        else:
+            location_key = self._normalize_location(location)
+        return (normalize_query(korean_text), location_key, int(radius), tuple(sorted(plan_options.items())))
+    
+    def search_coalesced(self, korean_text: str, location: str = DEFAULT_LOCATION, radius: int = SEARCH_RADIUS,
+                         cancel: CancelToken = None, **plan_options):
+        """search_with_keywords, sharing one execution among concurrent identical searches
+        
+        같은 key의 검색이 진행 중이면 새로 실행하지 않고 그 결과를 기다린다 (최대 COALESCE_SEARCH_TIMEOUT초,
+        넘기면 직접 실행). 공유받은 결과는 복사본이며, 좌표 검색이면 자기 좌표 기준으로 거리/순서를 다시 계산한다.
+        leader 요청이 취소되면 기다리던 요청은 각자 다시 실행한다 (cancel은 key에 넣지 않는다).
+        """
+        key = self._search_key(korean_text, location, radius, plan_options)
+        (keywords_result, places), shared = self.search_flight.do(
+            key,
+            lambda: self.search_with_keywords(korean_text, location, radius, cancel=cancel, **plan_options),
+            timeout=COALESCE_SEARCH_TIMEOUT,
+            cancel=cancel
+        )
+        if not shared:
+            return keywords_result, places
+        return self._follower_copy(korean_text, location, keywords_result, places)
+    
+    def _follower_copy(self, korean_text: str, location: str, keywords_result: dict, places: list) -> tuple:
+        """Copy of a coalesced search result for a follower request (비용 0, 자기 좌표 기준 거리순)"""
+        keywords_result, places = copy.deepcopy((keywords_result, places))
+        keywords_result['coalesced'] = True
+        if 'error' not in keywords_result:
+            keywords_result['original_korean'] = korean_text
+            # 비용은 leader 요청이 이미 냈으므로 이 요청의 추가 비용은 없음
+            keywords_result['estimated_saved_cost_usd'] = keywords_result.get('estimated_cost_usd', 0)
+            keywords_result['api_calls'] = 0
+            keywords_result['hedged_api_calls'] = 0
+            keywords_result['geocoding_calls'] = 0
+            keywords_result['total_api_calls'] = 0
+            keywords_result['estimated_cost_usd'] = 0
+            keywords_result['estimated_cost_krw'] = 0
+        coordinates = self._parse_coordinates(location)
+        if coordinates is not None:
+            places = self._sort_by_distance(places, coordinates)
+        return keywords_result, places
+    
+    def search_batch(self, items: list, deadline: float = None, max_cost_usd: float = None, target_results: int = None,
+                     cancel: CancelToken = None):
+        """Run many searches at once, sharing LLM calls and geocoding across them
+        
+        items: [{'korean_text', 'location', 'radius'}, ...]
+        - 키워드는 ultra_search_keywords_batch로 묶어서 생성 (캐시 적중은 LLM 호출 없음)
+        - 서로 다른 위치 문자열은 한 번씩만 해석
+        - 질의마다 단건 검색과 같은 QueryPlanner를 돌린다. deadline은 배치 전체의 마감, max_cost_usd와
+          target_results는 질의별 한도
+        - 질의별 플랜은 호출 메모를 공유해서 배치 안의 같은 (endpoint, params, page) Places 호출은 한 번만 나간다
+        - 키워드 생성이나 위치 해석에 실패한 질의는 그 질의만 {'error'}로 끝나고 나머지는 그대로 검색한다
+        cancel(CancelToken)이 취소되면 남은 호출을 멈추고 SearchCancelled를 올린다.
+        Returns (results, summary) - results는 입력 순서대로 {'keywords', 'places', 'total_results'} 또는 {'error'}
+        """
+        total_start = time.time()
+        deadline, max_cost_usd, target_results = self._plan_limits(deadline, max_cost_usd, target_results)
+        deadline_at = time.monotonic() + deadline
+        if cancel is None:
+            cancel = CancelToken(deadline_at)
+        else:
+            cancel.bound(deadline_at)
+        trace = Trace()
+        
+        # 1. 키워드 생성 (배치)
+        keyword_start = time.time()
+        with metrics.span('keywords', trace):
+            keyword_results, keyword_stats = ultra_search_keywords_batch([item['korean_text'] for item in items])
+        keyword_time = time.time() - keyword_start
+        cancel.check()
+        
+        # 2. 위치 해석 - 같은 위치 문자열은 한 번만, 실패한 위치는 그 위치를 쓰는 질의만 에러
+        geocode_start = time.time()
+        resolved = {}
+        for item in items:
+            if item['location'] in resolved:
+                continue
+            try:
+                resolved[item['location']] = self.resolve_location(item['location'], trace, cancel)
+            except ValueError as e:
+                logger.warning("배치 위치 해석 실패 '%s': %s", item['location'], e)
+                resolved[item['location']] = e
+        geocode_time = time.time() - geocode_start
+        geocoding_calls = sum(1 for value in resolved.values() if isinstance(value, tuple) and value[1] == 'api')
+        
+        memo = QueryPlan()  # 배치 전체가 공유하는 Places 호출 메모
+        queries = []
+        for item, keywords_result in zip(items, keyword_results):
+            query = {
+                'keywords': keywords_result,
+                'radius': item['radius'],
+                'candidates': None,
+                'error': None,
+                'plan': QueryPlan(trace=trace, cancel=cancel, shared=memo),
+            }
+            location = resolved[item['location']]
+            if 'error' in keywords_result:
+                query['error'] = keywords_result['error']
+            elif isinstance(location, Exception):
+                query['error'] = str(location)
+            elif not keywords_result.get('has_location_intent'):
+                query['error'] = '장소 검색 의도가 감지되지 않았습니다'
+            else:
+                query['latlng'], query['location_source'] = location
+                query['candidates'] = build_candidates(keywords_result, query['latlng'], item['radius'])
+            queries.append(query)
+        distinct_sub_searches = {
+            memo.key(candidate.endpoint, candidate.params)
+            for query in queries for candidate in query['candidates'] or []
+        }
+        
+        # 3. 질의별 쿼리 플랜 실행 - 배치 전체가 같은 취소 토큰과 마감을 쓴다
+        def run_plan(query):
+            plan_start = time.time()
+            planner = self._new_planner(query['plan'], query['latlng'], query['radius'], query['location_source'],
+                                        deadline_at, max_cost_usd, target_results)
+            places = planner.run(query['candidates'])
+            return planner, places, time.time() - plan_start
+        
+        search_start = time.time()
+        planned = [query for query in queries if query['candidates'] is not None]
+        if planned:
+            workers = min(BATCH_MAX_WORKERS, len(planned))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch-plan') as executor:
+                futures = [executor.submit(run_plan, query) for query in planned]
+                for query, future in zip(planned, futures):
+                    try:
+                        query['planner'], query['places'], query['plan_time'] = future.result()
+                    except SearchCancelled:
+                        raise
+                    except Exception as exc:
+                        logger.error("배치 질의 검색 실패 '%s': %s", query['keywords'].get('original_korean'), exc)
+                        query['planner'], query['places'], query['plan_time'] = None, [], 0.0
+        search_time = time.time() - search_start
+        cancel.check()
+        
+        # 4. 질의별 결과 (정렬 규칙은 단건 검색과 동일)
+        results = []
+        for query in queries:
+            keywords_result = query['keywords']
+            if query['error'] is not None:
+                results.append({'error': query['error'], 'keywords': keywords_result, 'places': [], 'total_results': 0})
+                continue
             
-            # Add cost and timing information to keywords_result
-            keywords_result['api_calls'] = self.api_calls
-            keywords_result['geocoding_calls'] = geocoding_calls
-            keywords_result['total_api_calls'] = self.api_calls + geocoding_calls
-            keywords_result['estimated_cost_usd'] = round(total_cost, 4)
-            keywords_result['estimated_cost_krw'] = round(total_cost * USD_TO_KRW, 0)
-            keywords_result['search_strategy'] = f'{radius}m Radius with Optimized 6x2 Search'
+            places = query['places']
+            if query['location_source'] == 'coordinates':
+                with metrics.span('sort', trace):
+                    places = self._sort_by_distance(places, query['latlng'])
             
-            # Add detailed timing information
-            keywords_result['search_timing'] = {
-                'total_search_time': round(total_search_time, 3),
+            keywords_result['geocode_cache'] = {'source': query['location_source']}
+            keywords_result['search_strategy'] = f"{query['radius']}m Radius with Budget-aware Query Plan (batch)"
+            if query['planner'] is not None:
+                keywords_result['query_plan'] = {
+                    'deadline_seconds': deadline,
+                    **query['planner'].report(query['candidates'], query['plan_time'])
+                }
+            results.append({'keywords': keywords_result, 'places': places, 'total_results': len(places)})
+        
+        # 5. 배치 전체 비용/타이밍
+        plans = [query['plan'] for query in queries]
+        issued_calls = sum(plan.issued for plan in plans)
+        hedged_calls = sum(plan.hedged for plan in plans)
+        deduplicated = sum(plan.deduplicated for plan in plans)
+        coalesced = sum(plan.coalesced for plan in plans)
+        cache_hits = sum(plan.cache_hits for plan in plans)
+        index_hits = sum(plan.index_hits for plan in plans)
+        total_cost = (issued_calls * self.cost_per_call) + (geocoding_calls * self.geocoding_cost)
+        saved_cost = (deduplicated + cache_hits + coalesced) * self.cost_per_call
+        total_time = time.time() - total_start
+        
+        summary = {
+            'queries': len(items),
+            'distinct_locations': len(resolved),
+            'sub_searches': sum(len(query['candidates'] or []) for query in queries),
+            'distinct_sub_searches': len(distinct_sub_searches),
+            'api_calls': issued_calls,
+            'hedged_api_calls': hedged_calls,
+            'deduplicated_api_calls': deduplicated,
+            'coalesced_api_calls': coalesced,
+            'geocoding_calls': geocoding_calls,
+            'total_api_calls': issued_calls + geocoding_calls,
+            'estimated_cost_usd': round(total_cost, 4),
+            'estimated_cost_krw': round(total_cost * USD_TO_KRW, 0),
+            'estimated_saved_cost_usd': round(saved_cost, 4),
+            'llm': keyword_stats,
+            'place_index': {'request_hits': index_hits, **self.place_index.stats()},
+            'places_cache': {
+                'request_hits': cache_hits,
+                'request_misses': issued_calls - hedged_calls,
+                **(self.places_cache.stats() if self.places_cache is not None else {'enabled': False})
+            },
+            'search_timing': {
+                'total_search_time': round(total_time, 3),
                 'keyword_generation_time': round(keyword_time, 3),
-                'api_search_time': round(total_search_time - keyword_time, 3),
-                'detailed_timings': search_timings
+                'geocode_time': round(geocode_time, 4),
+                'api_search_time': round(search_time, 3),
+                'stages': trace.summary()
             }
-            
-            return keywords_result, all_results  # Return all results found
-            
-        except Exception as e:
-            print(f"Keywords search error: {e}")
-            return {"error": str(e)}, []
+        }
+        metrics.inc('places_calls_avoided_total', deduplicated, reason='dedup')
+        metrics.inc('places_calls_avoided_total', index_hits, reason='index')
+        logger.info("[BATCH] 질의 %s개: 플랜 %s개, Places API %s번, 지오코딩 %s번, %.3f초", len(items), len(planned), issued_calls, geocoding_calls, total_time)
+        return results, summary
     
     def get_cost_info(self):
-        """Get current API usage and cost information"""
-        total_cost = (self.api_calls * self.cost_per_call)
+        """Get process-wide API usage and cost information (프로세스 시작 이후 누적)"""
+        with self._api_calls_lock:
+            usage = dict(self.api_usage)
+        hedging = self.get_hedge_stats()
+        # hedge로 더 보낸 Places 요청도 과금된다 (LLM hedge 비용은 추정치라 따로 보여준다)
+        total_cost = ((usage['nearby'] + usage['text']) * self.cost_per_call + usage['geocode'] * self.geocoding_cost
+                      + hedging['places']['extra_cost_usd'])
         return {
-            'api_calls': self.api_calls,
+            'api_calls': sum(usage.values()) + hedging['places']['extra_calls'],
+            'api_usage': usage,
+            'hedge_extra_calls': {api: stats['extra_calls'] for api, stats in hedging.items()},
+            'hedge_extra_cost_usd': {api: stats['extra_cost_usd'] for api, stats in hedging.items()},
             'cost_usd': round(total_cost, 4),
             'cost_krw': round(total_cost * USD_TO_KRW, 0)
         }
 
 # Initialize service
 search_service = UltraSearchService()
+result_store = ResultStore(ttl_seconds=RESULT_STORE_TTL, max_entries=RESULT_STORE_MAX_ENTRIES)
+cancel_registry = CancelRegistry()  # request_id -> 진행 중인 검색의 CancelToken
+
+# 스크레이프 시점에 읽는 캐시/인덱스 상태 게이지
+metrics.gauge_callback('cache_entries', 'Entries held by each cache', lambda: {
+    (('cache', 'geocode_memory'),): len(search_service.geocode_memory_cache),
+    (('cache', 'geocode_disk'),): search_service.geocode_store.stats()['entries'],
+    (('cache', 'place_index'),): search_service.place_index.stats()['coverages'],
+    (('cache', 'search_results'),): result_store.stats()['entries'],
+    **({(('cache', 'places'),): search_service.places_cache.stats()['entries']} if search_service.places_cache is not None else {}),
+})
+metrics.gauge_callback('page_token_activation_seconds', 'Observed next_page_token activation time', lambda: {
+    (('quantile', '0.5'),): search_service.page_poller.stats()['activation_p50'],
+    (('quantile', '0.9'),): search_service.page_poller.stats()['activation_p90'],
+})
+
+# Vertex AI 클라이언트 프리웜 - 첫 사용자 요청이 초기화 비용을 내지 않도록 (VERTEX_PREWARM=0으로 끔)
+if os.getenv('VERTEX_PREWARM', '1') == '1':
+    prewarm_vertex()
 
 @app.route('/')
 def index():
     return render_template('ultra_search.html')
 
+def _plan_options(data: dict) -> dict:
+    """요청 body의 쿼리 플랜 옵션 (deadline 초 / max_cost_usd / target_results / progressive) - 없으면 서버 기본값"""
+    options = {}
+    for key, cast in (('deadline', float), ('max_cost_usd', float), ('target_results', int)):
+        if data.get(key) is not None:
+            value = cast(data[key])
+            if value <= 0:
+                raise ValueError(f'{key} must be positive')
+            options[key] = value
+    if data.get('progressive') is not None:
+        if not isinstance(data['progressive'], bool):
+            raise ValueError('progressive must be a boolean')
+        if data['progressive']:
+            options['progressive'] = True
+    return options
+
+def _page_options(values) -> tuple:
+    """요청의 page_size / fields → (page_size, fields 또는 None)"""
+    page_size = values.get('page_size')
+    page_size = SEARCH_PAGE_SIZE if page_size in (None, '') else int(page_size)
+    if not 0 < page_size <= MAX_PAGE_SIZE:
+        raise ValueError(f'page_size must be between 1 and {MAX_PAGE_SIZE}')
+    return page_size, parse_fields(values.get('fields'))
+
+def _cancel_token(data: dict) -> tuple:
+    """요청 body의 request_id → (request_id 또는 None, CancelToken)
+    
+    request_id가 있으면 POST /search/cancel로 취소할 수 있고, 같은 request_id로 다시 검색하면 이전 검색은 superseded로 취소된다.
+    """
+    request_id = data.get('request_id')
+    if request_id is None:
+        return None, CancelToken()
+    if not cancel_registry.valid_id(request_id):
+        raise ValueError(f'request_id must be a string of 1-{MAX_REQUEST_ID_LENGTH} characters')
+    return request_id, cancel_registry.register(request_id)
+
+def _release_token(request_id: str, token: CancelToken):
+    if request_id is not None:
+        cancel_registry.release(request_id, token)
+
+def cancelled_payload(error: SearchCancelled) -> tuple:
+    """(본문, status) - 클라이언트가 취소했으면 499, 대기가 검색 deadline을 넘겼으면 504"""
+    if error.reason == 'deadline':
+        return {'error': 'Search deadline exceeded', 'reason': error.reason}, 504
+    return {'error': 'Search cancelled', 'reason': error.reason}, 499
+
+def search_payload(keywords_result: dict, places: list, page_size: int, fields: tuple = None) -> dict:
+    """/search 응답 본문 - 첫 페이지와 나머지를 가리키는 next_cursor (sync/async 엔트리 포인트 공용)"""
+    first_page, next_cursor = result_store.first_page(places, page_size)
+    return {
+        'keywords': keywords_result,
+        'places': select_fields(first_page, fields),
+        'total_results': len(places),
+        'next_cursor': next_cursor
+    }
+
+def _json_response(payload: dict, status: int = 200) -> Response:
+    """Compact JSON response, brotli/gzip-compressed when the client accepts it"""
+    body, encoding = compress_body(encode_json(payload), request.headers.get('Accept-Encoding', ''))
+    response = Response(body, status=status, mimetype='application/json')
+    response.headers['Vary'] = 'Accept-Encoding'
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return response
+
 @app.route('/search', methods=['POST'])
 def search():
+    """Search and return the first page of places
+    
+    body: korean_text, location, radius, 플랜 옵션(deadline / max_cost_usd / target_results / progressive),
+    page_size(기본 SEARCH_PAGE_SIZE), fields(장소 필드 선택, "name,lat,lng" 또는 목록),
+    request_id(선택, POST /search/cancel로 취소할 때 쓰는 클라이언트 id).
+    결과가 한 페이지를 넘으면 next_cursor로 GET /search/results에서 나머지를 가져간다.
+    취소된 검색은 499로 끝난다.
+    """
     data = request.json
     korean_text = data.get('korean_text', '')
     location = data.get('location', DEFAULT_LOCATION)
     radius = data.get('radius', SEARCH_RADIUS)
     
-    print(f"[DEBUG] 받은 요청 데이터: {data}")
-    print(f"[DEBUG] Korean text: '{korean_text}'")
-    print(f"[DEBUG] Location: '{location}'")
-    print(f"[DEBUG] Radius: {radius} (type: {type(radius)})")
+    logger.debug("받은 요청 데이터: %s", data)
+    logger.debug("Korean text: '%s'", korean_text)
+    logger.debug("Location: '%s'", location)
+    logger.debug("Radius: %s (type: %s)", radius, type(radius))
     
     if not korean_text:
         return jsonify({'error': 'Korean text is required'}), 400
+    try:
+        plan_options = _plan_options(data)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid plan option: {e}'}), 400
+    try:
+        page_size, fields = _page_options(data)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid page option: {e}'}), 400
+    try:
+        request_id, token = _cancel_token(data)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid request_id: {e}'}), 400
     
     try:
-        keywords_result, places = search_service.search_with_keywords(korean_text, location, radius)
+        keywords_result, places = search_service.search_coalesced(korean_text, location, radius, cancel=token, **plan_options)
         
-        return jsonify({
-            'keywords': keywords_result,
-            'places': places,
-            'total_results': len(places)
-        })
+        with metrics.span('serialize', endpoint='search'):
+            response = _json_response(search_payload(keywords_result, places, page_size, fields))
+        metrics.inc('requests_total', endpoint='search', status='error' if keywords_result.get('error') else 'ok')
+        return response
+    except SearchCancelled as e:
+        payload, status = cancelled_payload(e)
+        metrics.inc('requests_total', endpoint='search', status='cancelled' if status == 499 else 'deadline')
+        return jsonify(payload), status
     except Exception as e:
-        print(f"[ERROR] search_with_keywords 실행 중 에러: {e}")
-        import traceback
-        traceback.print_exc()
+        metrics.inc('requests_total', endpoint='search', status='exception')
+        logger.exception("search_with_keywords 실행 중 에러: %s", e)
         return jsonify({
             'error': 'Search failed',
             'message': str(e),
@@ -492,6 +1234,211 @@ def search():
             'places': [],
             'total_results': 0
         }), 500
+    finally:
+        _release_token(request_id, token)
+
+@app.route('/search/cancel', methods=['POST'])
+def search_cancel():
+    """Cancel an in-progress search - {"request_id", "reason": "client_cancel" | "superseded"}
+    
+    페이지를 떠날 때 navigator.sendBeacon으로도 보낸다. 진행 중인 검색이 없으면(이미 끝났거나 모르는 id) cancelled=false.
+    """
+    data = request.get_json(silent=True) or {}
+    request_id = data.get('request_id')
+    reason = data.get('reason', 'client_cancel')
+    if not cancel_registry.valid_id(request_id):
+        return jsonify({'error': 'request_id is required'}), 400
+    if reason not in CANCEL_REASONS:
+        return jsonify({'error': f"reason must be one of: {', '.join(CANCEL_REASONS)}"}), 400
+    cancelled = cancel_registry.cancel(request_id, reason)
+    metrics.inc('requests_total', endpoint='search_cancel', status='ok' if cancelled else 'unknown')
+    return jsonify({'cancelled': cancelled})
+
+@app.route('/search/results')
+def search_results():
+    """Next page of a /search result set - ?cursor=...&page_size=...&fields=..."""
+    cursor = request.args.get('cursor', '')
+    if not cursor:
+        return jsonify({'error': 'cursor is required'}), 400
+    try:
+        page_size, fields = _page_options(request.args)
+        page = result_store.page(cursor, page_size)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid page option: {e}'}), 400
+    if page is None:
+        metrics.inc('requests_total', endpoint='search_results', status='expired')
+        return jsonify({'error': 'Result set expired or unknown cursor'}), 404
+    
+    places, next_cursor, total = page
+    with metrics.span('serialize', endpoint='search_results'):
+        response = _json_response({
+            'places': select_fields(places, fields),
+            'total_results': total,
+            'next_cursor': next_cursor
+        })
+    metrics.inc('requests_total', endpoint='search_results', status='ok')
+    return response
+
+@app.route('/search/stream', methods=['POST'])
+def search_stream():
+    """Streaming variant of /search (NDJSON, 한 줄에 이벤트 하나)
+    
+    이벤트 순서: keywords (LLM 완료) → places (서브 검색마다 새 장소 묶음) → summary (비용/타이밍)
+    실패 시 error 이벤트, 취소되면 cancelled 이벤트로 끝난다.
+    이벤트가 없는 동안에도 STREAM_HEARTBEAT_SECONDS마다 빈 줄을 보내고, 연결이 끊겨 쓰기가 실패하면
+    검색을 client_disconnect로 취소한다. request_id를 주면 POST /search/cancel로도 취소할 수 있다.
+    """
+    data = request.json
+    korean_text = data.get('korean_text', '')
+    location = data.get('location', DEFAULT_LOCATION)
+    radius = data.get('radius', SEARCH_RADIUS)
+    
+    if not korean_text:
+        return jsonify({'error': 'Korean text is required'}), 400
+    try:
+        plan_options = _plan_options(data)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid plan option: {e}'}), 400
+    try:
+        request_id, token = _cancel_token(data)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid request_id: {e}'}), 400
+    
+    events = queue.Queue()
+    
+    def emit(event, payload):
+        events.put((event, payload))
+    
+    def run_search():
+        try:
+            keywords_result, places = search_service.search_with_keywords(korean_text, location, radius, on_event=emit,
+                                                                          cancel=token, **plan_options)
+            metrics.inc('requests_total', endpoint='search_stream', status='error' if keywords_result.get('error') else 'ok')
+            if keywords_result.get('error'):
+                emit('error', {'error': keywords_result['error']})
+            else:
+                emit('summary', {
+                    'keywords': keywords_result,
+                    'places_order': [place['place_id'] for place in places],
+                    'total_results': len(places)
+                })
+        except SearchCancelled as e:
+            payload, status = cancelled_payload(e)
+            metrics.inc('requests_total', endpoint='search_stream', status='cancelled' if status == 499 else 'deadline')
+            emit('cancelled' if status == 499 else 'error', payload)
+        except Exception as e:
+            metrics.inc('requests_total', endpoint='search_stream', status='exception')
+            logger.error("search_stream 실행 중 에러: %s", e)
+            emit('error', {'error': 'Search failed', 'message': str(e)})
+        finally:
+            _release_token(request_id, token)
+            events.put(None)
+    
+    threading.Thread(target=run_search, name='search-stream', daemon=True).start()
+    
+    def generate():
+        finished = False
+        try:
+            while True:
+                try:
+                    item = events.get(timeout=STREAM_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    yield '\n'  # heartbeat - 끊긴 연결은 이 쓰기에서 드러난다
+                    continue
+                if item is None:
+                    finished = True
+                    break
+                event, payload = item
+                with metrics.span('serialize', endpoint='search_stream'):
+                    line = json.dumps({'event': event, **payload}, ensure_ascii=False) + '\n'
+                yield line
+        finally:
+            # 클라이언트가 스트림을 다 받기 전에 떠났다 - 남은 호출을 보내지 않는다
+            if not finished:
+                token.cancel('client_disconnect')
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def _batch_item(query) -> dict:
+    """/search/batch의 질의 하나 → {'korean_text', 'location', 'radius'} (잘못된 값이면 ValueError/TypeError)"""
+    if not isinstance(query, dict):
+        raise TypeError('each query must be an object')
+    korean_text = query.get('korean_text', '')
+    if not isinstance(korean_text, str) or not korean_text:
+        raise ValueError('korean_text is required')
+    location = query.get('location', DEFAULT_LOCATION)
+    if not isinstance(location, str) or not location.strip():
+        raise ValueError('location must be a non-empty string')
+    radius = query.get('radius', SEARCH_RADIUS)
+    try:
+        if isinstance(radius, bool):
+            raise TypeError(radius)
+        radius = int(radius)
+    except (TypeError, ValueError):
+        raise ValueError('radius must be an integer (meters)')
+    if radius <= 0:
+        raise ValueError('radius must be positive')
+    return {'korean_text': korean_text, 'location': location, 'radius': radius}
+
+@app.route('/search/batch', methods=['POST'])
+def search_batch():
+    """Batch variant of /search - {"queries": [{"korean_text", "location", "radius"}, ...]}
+    
+    응답의 results는 입력 순서를 따르며, 비용/타이밍은 배치 전체 기준으로 summary에 담긴다.
+    플랜 옵션(deadline / max_cost_usd / target_results)과 request_id는 /search와 같다 - deadline은 배치 전체,
+    max_cost_usd / target_results는 질의별 한도. progressive는 지원하지 않는다.
+    """
+    data = request.json or {}
+    queries = data.get('queries') or []
+    
+    if not isinstance(queries, list) or not queries:
+        return jsonify({'error': 'queries is required'}), 400
+    if len(queries) > MAX_BATCH_QUERIES:
+        return jsonify({'error': f'At most {MAX_BATCH_QUERIES} queries per batch'}), 400
+    
+    items = []
+    for index, query in enumerate(queries):
+        try:
+            items.append(_batch_item(query))
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': f'Invalid query at index {index}: {e}', 'index': index}), 400
+    
+    try:
+        plan_options = _plan_options(data)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid plan option: {e}'}), 400
+    if plan_options.pop('progressive', False):
+        return jsonify({'error': 'progressive is not supported for batch search'}), 400
+    try:
+        request_id, token = _cancel_token(data)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid request_id: {e}'}), 400
+    
+    try:
+        results, summary = search_service.search_batch(items, cancel=token, **plan_options)
+        with metrics.span('serialize', endpoint='search_batch'):
+            response = jsonify({'results': results, 'summary': summary})
+        metrics.inc('requests_total', endpoint='search_batch', status='ok')
+        return response
+    except SearchCancelled as e:
+        payload, status = cancelled_payload(e)
+        metrics.inc('requests_total', endpoint='search_batch', status='cancelled' if status == 499 else 'deadline')
+        return jsonify(payload), status
+    except Exception as e:
+        metrics.inc('requests_total', endpoint='search_batch', status='exception')
+        logger.exception("search_batch 실행 중 에러: %s", e)
+        return jsonify({'error': 'Batch search failed', 'message': str(e), 'results': []}), 500
+    finally:
+        _release_token(request_id, token)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus text-format metrics (단계별 지연 히스토그램, API 호출/비용 카운터, 캐시 상태)"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
 
 @app.route('/api/key')
 def get_api_key():
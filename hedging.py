@@ -0,0 +1,247 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from metrics import metrics
+from pagination import _percentile
+
+HEDGE_POOL_SIZE = 64  # 프로세스 전체가 공유하는 동기 hedged 호출 스레드 수
+HEDGE_PERCENTILE = float(os.getenv('HEDGE_PERCENTILE', 0.95))  # 관측 지연의 이 분위수를 넘기면 hedge (0이면 deadline만)
+# hedge 지연의 하한 = 관측 지연 p50의 이 배수 - 꼬리가 없는 건강한 호출은 분위수를 넘겨도 hedge하지 않는다
+HEDGE_MIN_MEDIAN_MULTIPLE = float(os.getenv('HEDGE_MIN_MEDIAN_MULTIPLE', 3.0))
+
+metrics.counter('hedge_total', 'Hedged upstream calls, by api and outcome (primary / hedge_won / primary_won / deadline / error)')
+metrics.counter('hedge_requests_total', 'Duplicate requests fired by the hedger, by api')
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _hedge_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=HEDGE_POOL_SIZE, thread_name_prefix='hedge')
+    return _pool
+
+
+class DeadlineExceeded(TimeoutError):
+    """No attempt of a hedged call answered within its per-call deadline"""
+
+    def __init__(self, name: str, deadline: float):
+        super().__init__(f'{name} call exceeded its {deadline:.1f}s deadline')
+        self.name = name
+        self.deadline = deadline
+
+
+class Hedger:
+    """Deadline-bounded upstream calls with one hedged duplicate for slow attempts
+
+    첫 시도가 관측된 지연 시간의 percentile(기본 p95)을 넘기면 같은 요청을 한 번 더 보내고
+    먼저 성공한 응답을 쓴다. 진 쪽은 취소한다 (async는 진행 중이어도 취소되고, 스레드는
+    시작 전일 때만 취소되며 이미 나간 요청은 끝나게 두고 결과만 버린다).
+    hedge 시점은 p50의 min_median_multiple배보다 앞당기지 않는다 - 지연 꼬리가 없으면 percentile을 넘는 호출도
+    p50과 별 차이가 없어서, 그대로 hedge하면 건강한 호출의 일정 비율을 매번 두 번 과금하게 된다.
+    관측치가 min_samples보다 적으면 initial_delay 뒤에 hedge한다. percentile이 0/None이면 hedge 없이 deadline만 건다.
+    어떤 시도도 deadline 안에 성공하지 못하면 DeadlineExceeded, 모든 시도가 실패하면 첫 시도의 에러를 올린다.
+    hedge는 멱등인 읽기 호출(Places 검색, LLM 키워드 생성)에만 쓴다.
+    call()에 cancel(CancelToken)을 주면 취소된 요청을 위해서는 hedge를 보내지 않는다 (보내지 않은 hedge는
+    cancelled_calls_total로 센다). 이미 나간 첫 시도는 캐시/다른 요청이 쓸 수 있으므로 끝까지 받는다.
+    호출 제한 대기는 hedger 밖에서 끝내고 fn에는 실제 호출만 넣는다 - 그래야 대기 시간이 지연 관측치와
+    deadline에 섞이지 않는다. admit()이 False면 hedge를 보내지 않고 (hedge용 토큰을 기다리지 않고 얻을 때만 보낸다),
+    on_hedge()는 hedge 시도가 실제로 시작될 때 불려 추가 과금 호출을 호출자가 셀 수 있게 한다.
+    """
+
+    def __init__(self, name: str, deadline: float, percentile: float = HEDGE_PERCENTILE, initial_delay: float = 1.0,
+                 min_delay: float = 0.05, min_samples: int = 20, history: int = 200, cost_per_call: float = 0.0,
+                 min_median_multiple: float = HEDGE_MIN_MEDIAN_MULTIPLE):
+        self.name = name
+        self.deadline = deadline
+        self.percentile = percentile
+        self.min_median_multiple = min_median_multiple
+        self.initial_delay = initial_delay
+        self.min_delay = min_delay
+        self.min_samples = min_samples
+        self.cost_per_call = cost_per_call
+
+        self._latencies = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.cancelled_hedges = 0
+        self.denied_hedges = 0
+        self.deadline_exceeded = 0
+
+    def hedge_delay(self):
+        """첫 시도 후 hedge를 보내기까지의 대기 시간 (hedge하지 않으면 None)"""
+        if not self.percentile:
+            return None
+        with self._lock:
+            samples = sorted(self._latencies)
+        if len(samples) < self.min_samples:
+            delay = self.initial_delay
+        else:
+            delay = max(_percentile(samples, self.percentile), _percentile(samples, 0.5) * self.min_median_multiple)
+        # deadline 절반 이후의 hedge는 이길 시간이 거의 없다
+        return min(max(delay, self.min_delay), self.deadline / 2)
+
+    def _observe(self, latency: float):
+        with self._lock:
+            self._latencies.append(latency)
+
+    def _begin(self):
+        with self._lock:
+            self.calls += 1
+        return time.monotonic(), self.hedge_delay()
+
+    def _fired(self):
+        with self._lock:
+            self.hedges += 1
+        metrics.inc('hedge_requests_total', api=self.name)
+
+    def _finish(self, outcome: str):
+        with self._lock:
+            if outcome == 'hedge_won':
+                self.hedge_wins += 1
+            elif outcome == 'deadline':
+                self.deadline_exceeded += 1
+        metrics.inc('hedge_total', api=self.name, outcome=outcome)
+
+    @staticmethod
+    def _won(primary: bool, hedged: bool) -> str:
+        if not hedged:
+            return 'primary'
+        return 'primary_won' if primary else 'hedge_won'
+
+    def _timed(self, fn, on_start=None):
+        if on_start is not None:
+            on_start()
+        start = time.monotonic()
+        result = fn()
+        self._observe(time.monotonic() - start)
+        return result
+
+    def _admit(self, admit) -> bool:
+        if admit is None or admit():
+            return True
+        with self._lock:
+            self.denied_hedges += 1
+        return False
+
+    def call(self, fn, cancel=None, admit=None, on_hedge=None):
+        """Run fn() on the shared hedge pool, hedging once and enforcing the deadline"""
+        start, delay = self._begin()
+        pool = _hedge_pool()
+        attempts = [pool.submit(self._timed, fn)]
+        primary = attempts[0]
+        hedge_at = None if delay is None else start + delay
+        hedged = False
+        errors = {}
+        try:
+            while attempts:
+                now = time.monotonic()
+                remaining = start + self.deadline - now
+                if remaining <= 0:
+                    self._finish('deadline')
+                    raise DeadlineExceeded(self.name, self.deadline)
+                timeout = remaining if hedge_at is None else min(remaining, max(hedge_at - now, 0))
+                done, _ = wait(attempts, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done and hedge_at is not None and time.monotonic() >= hedge_at:
+                    hedge_at = None
+                    if cancel is not None and cancel.cancelled:
+                        cancel.skip(self.name)
+                        continue
+                    if not self._admit(admit):
+                        continue
+                    hedged = True
+                    self._fired()
+                    attempts.append(pool.submit(self._timed, fn, on_hedge))
+                    continue
+                for future in done:
+                    attempts.remove(future)
+                    if future.exception() is None:
+                        self._finish(self._won(future is primary, hedged))
+                        return future.result()
+                    errors[future] = future.exception()
+            # 모든 시도가 실패 - 첫 시도가 hedge 전에 실패했으면 hedge하지 않는다 (재시도는 호출자 몫)
+            self._finish('error')
+            raise errors.get(primary) or next(iter(errors.values()))
+        finally:
+            for future in attempts:
+                if future.cancel() and future is not primary:
+                    with self._lock:
+                        self.cancelled_hedges += 1
+
+    async def call_async(self, fn, admit=None, on_hedge=None):
+        """Async variant of call - fn은 coroutine function, 진 시도는 진행 중이어도 취소된다"""
+        start, delay = self._begin()
+
+        async def timed(on_start=None):
+            if on_start is not None:
+                on_start()
+            attempt_start = time.monotonic()
+            result = await fn()
+            self._observe(time.monotonic() - attempt_start)
+            return result
+
+        primary = asyncio.ensure_future(timed())
+        attempts = [primary]
+        hedge_at = None if delay is None else start + delay
+        hedged = False
+        errors = {}
+        try:
+            while attempts:
+                now = time.monotonic()
+                remaining = start + self.deadline - now
+                if remaining <= 0:
+                    self._finish('deadline')
+                    raise DeadlineExceeded(self.name, self.deadline)
+                timeout = remaining if hedge_at is None else min(remaining, max(hedge_at - now, 0))
+                done, _ = await asyncio.wait(attempts, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done and hedge_at is not None and time.monotonic() >= hedge_at:
+                    hedge_at = None
+                    if not self._admit(admit):
+                        continue
+                    hedged = True
+                    self._fired()
+                    attempts.append(asyncio.ensure_future(timed(on_hedge)))
+                    continue
+                for task in done:
+                    attempts.remove(task)
+                    if task.exception() is None:
+                        self._finish(self._won(task is primary, hedged))
+                        return task.result()
+                    errors[task] = task.exception()
+            self._finish('error')
+            raise errors.get(primary) or next(iter(errors.values()))
+        finally:
+            for task in attempts:
+                task.cancel()
+
+    def stats(self) -> dict:
+        with self._lock:
+            samples = sorted(self._latencies)
+            calls, hedges, hedge_wins = self.calls, self.hedges, self.hedge_wins
+            billed_hedges = hedges - self.cancelled_hedges
+            denied_hedges = self.denied_hedges
+            deadline_exceeded = self.deadline_exceeded
+        delay = self.hedge_delay()
+        return {
+            'calls': calls,
+            'hedges': hedges,
+            'hedge_rate': round(hedges / calls, 3) if calls else 0.0,
+            'hedge_wins': hedge_wins,
+            'denied_hedges': denied_hedges,
+            'deadline_exceeded': deadline_exceeded,
+            'extra_calls': billed_hedges,
+            'extra_cost_usd': round(billed_hedges * self.cost_per_call, 4),
+            'latency_p50': round(_percentile(samples, 0.5), 3),
+            'latency_p95': round(_percentile(samples, 0.95), 3),
+            'next_hedge_delay': None if delay is None else round(delay, 3),
+            'deadline': self.deadline,
+        }
@@ -0,0 +1,167 @@
+import threading
+import unicodedata
+from collections import OrderedDict
+
+from metrics import metrics
+
+metrics.histogram('keyword_fuzzy_similarity', 'Best fuzzy keyword-index similarity per lookup',
+                  buckets=(0.3, 0.5, 0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95, 1.0))
+
+
+# 장소 검색 질의에서 뜻을 바꾸지 않는 토큰 - 비교 전에 뺀다 ("라멘 맛집 추천" == "라멘 맛집")
+FILLER_TOKENS = frozenset([
+    '추천', '추천해줘', '추천해주세요', '어디', '어디야', '어디있어', '근처', '주변', '여기', '곳', '데', '좀',
+    '있어', '있나', '있을까', '알려줘', '찾아줘', '가고', '갈', '갈만한', '만한', '하고', '할', '싶어', '싶다',
+])
+
+# 뜻을 뒤집는 부정 표현 - 입력과 항목의 부정 표현이 다르면 n-gram이 아무리 비슷해도 같은 질의로 보지 않는다
+# ("조용한 카페 아닌 곳" != "조용한 카페"). 토큰 안 어디에 붙어 있어도 부정으로 보는 표현과
+# 명사 일부("안경", "못자리")와 겹치므로 독립된 토큰일 때만 부정으로 보는 표현으로 나눈다.
+NEGATION_MARKERS = ('아닌', '아니', '말고', '빼고', '제외', '없는', '없이', '없고', '않')
+NEGATION_TOKENS = frozenset(['안', '못', '노', 'no', 'not', 'without'])
+
+
+def negation_markers(text: str) -> frozenset:
+    """입력에 들어 있는 부정 표현 집합 ("커피 말고 차" → {'말고'})"""
+    markers = set()
+    for token in unicodedata.normalize('NFKC', text).lower().split():
+        token = ''.join(ch for ch in token if ch.isalnum())
+        if token in NEGATION_TOKENS:
+            markers.add(token)
+        markers.update(marker for marker in NEGATION_MARKERS if marker in token)
+    return frozenset(markers)
+
+
+def core_text(text: str) -> str:
+    """NFKC 정규화, 소문자화 후 FILLER_TOKENS와 공백/구두점을 뺀 문자열 ("커피 한잔" == "커피한 잔")
+
+    모든 토큰이 filler면 filler를 빼지 않는다.
+    """
+    tokens = unicodedata.normalize('NFKC', text).lower().split()
+    core = [token for token in tokens if token not in FILLER_TOKENS] or tokens
+    return ''.join(ch for ch in ''.join(core) if ch.isalnum())
+
+
+def jamo_text(text: str) -> str:
+    # NFD는 한글 음절을 초성/중성/종성 conjoining jamo로 분해한다
+    return unicodedata.normalize('NFD', text)
+
+
+def char_ngrams(text: str, n: int) -> frozenset:
+    if len(text) <= n:
+        return frozenset([text]) if text else frozenset()
+    return frozenset(text[i:i + n] for i in range(len(text) - n + 1))
+
+
+def dice(a: frozenset, b: frozenset, overlap: int = None) -> float:
+    if not a or not b:
+        return 0.0
+    if overlap is None:
+        overlap = len(a & b)
+    return 2 * overlap / (len(a) + len(b))
+
+
+class KeywordIndex:
+    """Fuzzy lookup of earlier keyword generations by jamo / syllable n-gram similarity
+
+    입력에서 filler 토큰과 공백을 뺀 뒤 두 가지 n-gram 집합으로 저장한다.
+    - 자모 n-gram(기본 3): 조사/어미가 붙은 입력("조용한 카페에서" / "조용한 카페")을 가깝게 본다.
+    - 음절 bigram: 자모 한두 개 차이로 뜻이 바뀌는 짧은 명사("술 마실" / "물 마실")를 멀게 본다.
+    유사도는 두 Dice 계수(2|A∩B| / (|A|+|B|))의 평균이고, 새 입력과 자모 n-gram을 공유하는 항목만
+    역색인으로 모아 계산한다. 가장 비슷한 항목이 threshold 이상이면 그 키워드 결과를 돌려준다.
+    부정 표현(negation_markers)이 입력과 다른 항목은 비교하지 않는다 - "아닌"/"말고" 한 토큰 차이는
+    유사도가 threshold를 넘을 만큼 작지만 질의의 뜻은 반대가 된다.
+    max_entries를 넘으면 가장 오래 추가된 항목부터 버린다.
+    """
+
+    def __init__(self, threshold: float = 0.8, n: int = 3, max_entries: int = 5000):
+        self.threshold = threshold
+        self.n = n
+        self.max_entries = max_entries
+
+        self._entries = OrderedDict()  # core_text -> (자모 n-gram, 음절 bigram, 부정 표현, 원문, 키워드 결과)
+        self._postings = {}  # 자모 n-gram -> {core_text, ...}
+        self._lock = threading.Lock()
+
+        self.lookups = 0
+        self.hits = 0
+        self.hit_similarity_total = 0.0
+        self.evictions = 0
+
+    def _grams(self, core: str) -> tuple:
+        return char_ngrams(jamo_text(core), self.n), char_ngrams(core, 2)
+
+    def _remove(self, key: str):
+        jamo_grams = self._entries.pop(key)[0]
+        for gram in jamo_grams:
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(key)
+                if not posting:
+                    del self._postings[gram]
+
+    def add(self, text: str, value: dict):
+        """Index a keyword result under its input text (core_text가 같은 입력이면 덮어쓴다)"""
+        key = core_text(text)
+        if not key:
+            return
+        jamo_grams, syllable_grams = self._grams(key)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (jamo_grams, syllable_grams, negation_markers(text), text, value)
+            for gram in jamo_grams:
+                self._postings.setdefault(gram, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def lookup(self, text: str) -> tuple:
+        """Return (value, similarity, matched_text) for the most similar entry
+
+        value는 similarity가 threshold 미만이면 None. 비교할 항목이 없으면 (None, 0.0, None).
+        부정 표현이 다른 항목은 비교 대상에서 빠진다.
+        """
+        jamo_grams, syllable_grams = self._grams(core_text(text))
+        negations = negation_markers(text)
+        best_similarity, best_text, best_value = 0.0, None, None
+        with self._lock:
+            self.lookups += 1
+            overlaps = {}
+            for gram in jamo_grams:
+                for key in self._postings.get(gram, ()):
+                    overlaps[key] = overlaps.get(key, 0) + 1
+            for key, overlap in overlaps.items():
+                entry_jamo, entry_syllables, entry_negations, entry_text, value = self._entries[key]
+                if entry_negations != negations:
+                    continue
+                similarity = (dice(jamo_grams, entry_jamo, overlap) + dice(syllable_grams, entry_syllables)) / 2
+                if similarity > best_similarity:
+                    best_similarity, best_text, best_value = similarity, entry_text, value
+            hit = best_text is not None and best_similarity >= self.threshold
+            if hit:
+                self.hits += 1
+                self.hit_similarity_total += best_similarity
+        metrics.observe('keyword_fuzzy_similarity', best_similarity)
+        return (best_value if hit else None), round(best_similarity, 3), best_text
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._postings.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'threshold': self.threshold,
+                'ngram': self.n,
+                'entries': len(self._entries),
+                'lookups': self.lookups,
+                'hits': self.hits,
+                'hit_rate': round(self.hits / self.lookups, 3) if self.lookups else 0.0,
+                'avg_hit_similarity': round(self.hit_similarity_total / self.hits, 3) if self.hits else 0.0,
+                'evictions': self.evictions,
+            }
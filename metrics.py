@@ -0,0 +1,177 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# 초 단위 지연 시간 버킷 (캐시 적중 수 ms ~ 페이지네이션 포함 수십 초)
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels: dict) -> tuple:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(label_key: tuple, extra: tuple = ()) -> str:
+    pairs = label_key + extra
+    if not pairs:
+        return ''
+    escaped = (
+        f'{key}="' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for key, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Trace:
+    """Per-request stage timings collected by MetricsRegistry.span
+
+    요청 하나에서 단계별 (횟수, 합계, 최대) 시간을 모아 응답의 search_timing에 붙인다.
+    여러 워커 스레드가 같은 Trace에 기록할 수 있다.
+    """
+
+    def __init__(self):
+        self._stages = {}  # stage -> [count, total, max]
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float):
+        with self._lock:
+            entry = self._stages.setdefault(stage, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                stage: {'count': count, 'total': round(total, 4), 'max': round(maximum, 4)}
+                for stage, (count, total, maximum) in self._stages.items()
+            }
+
+
+class MetricsRegistry:
+    """Minimal in-process counters and histograms with Prometheus text exposition
+
+    외부 의존성 없이 counter/histogram을 라벨 단위로 모으고 render()로 /metrics 응답을 만든다.
+    span(stage)은 stage_seconds 히스토그램과 (주어지면) 요청 단위 Trace에 동시에 기록한다.
+    """
+
+    def __init__(self, namespace: str = 'ultra_search'):
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._help = {}  # name -> (type, help)
+        self._counters = {}  # name -> {label key: value}
+        self._histograms = {}  # name -> {label key: [bucket counts..., sum, count]}
+        self._buckets = {}  # name -> bucket bounds
+        self._gauge_callbacks = {}  # name -> fn() -> {labels tuple: value}
+
+        self.histogram('stage_seconds', 'Latency of each search stage in seconds')
+
+    def _name(self, name: str) -> str:
+        return f'{self.namespace}_{name}'
+
+    def counter(self, name: str, help_text: str):
+        with self._lock:
+            self._help[self._name(name)] = ('counter', help_text)
+            self._counters.setdefault(self._name(name), {})
+
+    def histogram(self, name: str, help_text: str, buckets: tuple = DEFAULT_BUCKETS):
+        with self._lock:
+            self._help[self._name(name)] = ('histogram', help_text)
+            self._histograms.setdefault(self._name(name), {})
+            self._buckets[self._name(name)] = tuple(buckets)
+
+    def gauge_callback(self, name: str, help_text: str, callback):
+        """Register a gauge whose values are read from callback() at scrape time
+
+        callback은 {라벨 dict를 정렬한 tuple: 값} 또는 숫자 하나를 돌려준다.
+        """
+        with self._lock:
+            self._help[self._name(name)] = ('gauge', help_text)
+            self._gauge_callbacks[self._name(name)] = callback
+
+    def inc(self, name: str, value: float = 1, **labels):
+        full_name = self._name(name)
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(full_name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        full_name = self._name(name)
+        key = _label_key(labels)
+        with self._lock:
+            buckets = self._buckets.setdefault(full_name, DEFAULT_BUCKETS)
+            series = self._histograms.setdefault(full_name, {})
+            state = series.get(key)
+            if state is None:
+                state = series[key] = [0] * len(buckets) + [0.0, 0]
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def span(self, stage: str, trace: Trace = None, **labels):
+        """Time a block into stage_seconds{stage=...} (and the request Trace, if given)"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe('stage_seconds', elapsed, stage=stage, **labels)
+            if trace is not None:
+                trace.record(stage, elapsed)
+
+    def counter_value(self, name: str, **labels) -> float:
+        with self._lock:
+            return self._counters.get(self._name(name), {}).get(_label_key(labels), 0)
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        lines = []
+        with self._lock:
+            help_items = sorted(self._help.items())
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {name: {key: list(state) for key, state in series.items()} for name, series in self._histograms.items()}
+            callbacks = dict(self._gauge_callbacks)
+
+        for name, (metric_type, help_text) in help_items:
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {metric_type}')
+            if metric_type == 'counter':
+                for key, value in sorted(counters.get(name, {}).items()):
+                    lines.append(f'{name}{_format_labels(key)} {_format_value(value)}')
+            elif metric_type == 'histogram':
+                bounds = self._buckets[name]
+                for key, state in sorted(histograms.get(name, {}).items()):
+                    for bound, count in zip(bounds, state):
+                        lines.append(f'{name}_bucket{_format_labels(key, (("le", _format_value(bound)),))} {count}')
+                    lines.append(f'{name}_bucket{_format_labels(key, (("le", "+Inf"),))} {state[-1]}')
+                    lines.append(f'{name}_sum{_format_labels(key)} {_format_value(state[-2])}')
+                    lines.append(f'{name}_count{_format_labels(key)} {state[-1]}')
+            else:
+                try:
+                    values = callbacks[name]()
+                except Exception:
+                    continue
+                if not isinstance(values, dict):
+                    values = {(): values}
+                for key, value in sorted(values.items()):
+                    lines.append(f'{name}{_format_labels(tuple(key))} {_format_value(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+
+metrics.counter('requests_total', 'Search requests handled, by endpoint and status')
+metrics.counter('api_calls_total', 'Billed external API calls, by api')
+metrics.counter('api_cost_usd_total', 'Estimated external API cost in USD, by api')
+metrics.counter('places_calls_avoided_total', 'Places calls answered without the API, by reason')
+metrics.counter('keyword_cache_total', 'Keyword lookups, by source')
+metrics.counter('geocode_total', 'Location resolutions, by source')
@@ -0,0 +1,131 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+
+
+def is_token_not_ready(error) -> bool:
+    """next_page_token이 아직 활성화되지 않았을 때 Places API는 INVALID_REQUEST를 돌려준다"""
+    return getattr(error, 'status', None) == 'INVALID_REQUEST'
+
+
+def _percentile(sorted_values: list, fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+class PageTokenPoller:
+    """Adaptive next_page_token activation polling shared by every pagination loop
+
+    고정 2초 대기 대신 관측된 활성화 시간에 맞춰 첫 시도를 하고, 토큰이 아직 유효하지 않으면
+    retry_delay부터 시작해 지터가 섞인 지수 간격(backoff)으로 재시도한다.
+    전체 대기 시간은 deadline으로 제한된다.
+    토큰이 실제로 유효해지기까지 걸린 시간을 기록해 다음 첫 시도 시점을 조정한다.
+    """
+
+    def __init__(self, initial_delay: float = 0.5, min_delay: float = 0.2, max_delay: float = 2.0,
+                 retry_delay: float = 0.2, backoff: float = 1.6, jitter: float = 0.2,
+                 deadline: float = 10.0, history: int = 200):
+        self.initial_delay = initial_delay
+        self.retry_delay = retry_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self.jitter = jitter
+        self.deadline = deadline
+
+        self._activation_times = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self.tokens = 0
+        self.retries = 0
+        self.failures = 0
+
+    def first_delay(self) -> float:
+        """첫 시도까지의 대기 시간
+
+        관측치가 충분하면 활성화 시간의 하위 25% 지점보다 약간 이르게 시도한다.
+        성공 시점은 실제 활성화 시간의 상한이므로 조금씩 앞당겨 보며 수렴시킨다.
+        """
+        with self._lock:
+            samples = sorted(self._activation_times)
+        if len(samples) < 10:
+            return self.initial_delay
+        return min(self.max_delay, max(self.min_delay, _percentile(samples, 0.25) * 0.9))
+
+    def _jittered(self, delay: float) -> float:
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _begin(self) -> tuple:
+        with self._lock:
+            self.tokens += 1
+        return time.monotonic(), self.first_delay()
+
+    def _next_retry_delay(self, error, start: float, delay: float, attempt: int):
+        """토큰이 아직 유효하지 않으면 다음 재시도까지의 대기 시간, 포기해야 하면 None"""
+        elapsed = time.monotonic() - start
+        next_delay = self.retry_delay if attempt == 0 else min(delay * self.backoff, self.max_delay)
+        if not is_token_not_ready(error) or elapsed + next_delay > self.deadline:
+            with self._lock:
+                self.failures += 1
+            return None
+        with self._lock:
+            self.retries += 1
+        return next_delay
+
+    def _activated(self, start: float):
+        with self._lock:
+            self._activation_times.append(time.monotonic() - start)
+
+    def fetch(self, request_fn, sleep=time.sleep):
+        """Call request_fn() once the page token is valid, retrying while it is not ready yet
+
+        deadline 안에 토큰이 활성화되지 않으면 마지막 에러를 그대로 올린다.
+        """
+        start, delay = self._begin()
+        attempt = 0
+        while True:
+            sleep(self._jittered(delay))
+            try:
+                response = request_fn()
+            except Exception as e:
+                delay = self._next_retry_delay(e, start, delay, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                continue
+            self._activated(start)
+            return response
+
+    async def fetch_async(self, request_fn, sleep=asyncio.sleep):
+        """Async variant of fetch - request_fn과 sleep은 coroutine function (대기 중 이벤트 루프를 막지 않음)"""
+        start, delay = self._begin()
+        attempt = 0
+        while True:
+            await sleep(self._jittered(delay))
+            try:
+                response = await request_fn()
+            except Exception as e:
+                delay = self._next_retry_delay(e, start, delay, attempt)
+                if delay is None:
+                    raise
+                attempt += 1
+                continue
+            self._activated(start)
+            return response
+
+    def stats(self) -> dict:
+        with self._lock:
+            samples = sorted(self._activation_times)
+            tokens, retries, failures = self.tokens, self.retries, self.failures
+        return {
+            'tokens': tokens,
+            'retries': retries,
+            'failures': failures,
+            'activation_p50': round(_percentile(samples, 0.5), 3),
+            'activation_p90': round(_percentile(samples, 0.9), 3),
+            'activation_max': round(samples[-1], 3) if samples else 0.0,
+            'next_first_delay': round(self.first_delay(), 3),
+        }
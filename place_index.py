@@ -0,0 +1,188 @@
+import threading
+import time
+from collections import OrderedDict
+
+from distance_utils import calculate_distance, geohash_encode
+
+# 페이지네이션을 끝까지 따라가도 Nearby Search는 최대 60개(3페이지)까지만 돌려준다
+NEARBY_RESULT_CAP = 60
+
+
+class PlaceIndex:
+    """In-process spatial index of place records seen by earlier searches
+
+    검색이 끝날 때마다 (place_type, 중심, 반경) 검색 범위(coverage)와 그 결과 장소들을 기록한다.
+    이후 같은 type으로 이미 검색된 원 안에 완전히 들어가는 질의는 API 없이 로컬에서 답한다.
+    - coverage는 중심 좌표의 geohash 셀 단위로 묶이고, max_cells를 넘으면 가장 오래 갱신된 셀부터 버린다.
+    - 장소 레코드는 place_id 기준으로 하나만 저장되며 types, 검색된 type, 수집 시각을 함께 가진다.
+    - ttl_seconds가 지난 coverage는 stale로 보고 API로 다시 가져온다.
+    - 결과가 상한(60개)에 걸린 coverage는 잘렸을 수 있으므로 같은 원(중심 25m 이내)에만 재사용한다.
+    """
+
+    def __init__(self, precision: int = 6, ttl_seconds: float = 1800, max_cells: int = 2000):
+        self.precision = precision
+        self.ttl_seconds = ttl_seconds
+        self.max_cells = max_cells
+
+        self._cells = OrderedDict()  # geohash -> [coverage, ...] (오래 갱신된 셀이 앞)
+        self._coverage_by_type = {}  # place_type -> [coverage, ...]
+        self._places = {}  # place_id -> place record
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evicted_cells = 0
+
+    def _covers(self, coverage: dict, lat: float, lng: float, radius: float) -> bool:
+        distance = calculate_distance(coverage['lat'], coverage['lng'], lat, lng)
+        if coverage['complete']:
+            return distance + radius <= coverage['radius'] + 1
+        return distance <= 25 and radius <= coverage['radius']
+
+    def lookup(self, place_type: str, latlng: tuple, radius: float):
+        """Return raw Places results for `place_type` within `radius` of `latlng`, or None if not covered
+
+        결과 순서는 원래 검색 결과 순서를 따른다.
+        """
+        lat, lng = latlng
+        now = time.time()
+        with self._lock:
+            coverages = self._coverage_by_type.get(place_type, [])
+            covering = None
+            stale = []
+            for coverage in reversed(coverages):  # 최신 coverage 우선
+                if not self._covers(coverage, lat, lng, radius):
+                    continue
+                if now - coverage['fetched_at'] > self.ttl_seconds:
+                    stale.append(coverage)
+                    continue
+                covering = coverage
+                break
+            found_stale = bool(stale)
+            for coverage in stale:
+                self._remove_coverage(coverage)
+
+            if covering is None:
+                self.misses += 1
+                if found_stale:
+                    self.stale += 1
+                return None
+
+            self.hits += 1
+            results = []
+            for place_id in covering['place_ids']:
+                record = self._places.get(place_id)
+                if record is None:
+                    continue
+                if calculate_distance(lat, lng, record['lat'], record['lng']) <= radius:
+                    results.append(record['result'])
+            return results
+
+    def covers(self, place_type: str, latlng: tuple, radius: float) -> bool:
+        """Whether lookup() would answer this query (통계/stale 정리 없이 확인만)"""
+        lat, lng = latlng
+        now = time.time()
+        with self._lock:
+            return any(
+                self._covers(coverage, lat, lng, radius) and now - coverage['fetched_at'] <= self.ttl_seconds
+                for coverage in self._coverage_by_type.get(place_type, [])
+            )
+
+    def add(self, place_type: str, latlng: tuple, radius: float, results: list, complete: bool = True):
+        """Record one finished type search and the places it returned"""
+        lat, lng = latlng
+        now = time.time()
+        cell = geohash_encode(lat, lng, self.precision)
+        # 상한에 걸린 결과는 잘렸을 수 있음
+        complete = complete and len(results) < NEARBY_RESULT_CAP
+
+        place_ids = []
+        with self._lock:
+            for result in results:
+                place_id = result.get('place_id')
+                location = (result.get('geometry') or {}).get('location') or {}
+                if not place_id or location.get('lat') is None or location.get('lng') is None:
+                    continue
+                record = self._places.get(place_id)
+                if record is None:
+                    record = {
+                        'place_id': place_id,
+                        'lat': location['lat'],
+                        'lng': location['lng'],
+                        'types': set(result.get('types', [])),
+                        'found_by': set(),
+                        'refs': 0,
+                    }
+                    self._places[place_id] = record
+                record['result'] = result
+                record['fetched_at'] = now
+                record['found_by'].add(place_type)
+                record['refs'] += 1
+                place_ids.append(place_id)
+
+            # 같은 원을 다시 검색한 경우 이전 coverage는 새 것으로 교체
+            for previous in list(self._coverage_by_type.get(place_type, [])):
+                if (previous['radius'] == radius and
+                        calculate_distance(previous['lat'], previous['lng'], lat, lng) <= 1):
+                    self._remove_coverage(previous)
+
+            coverage = {
+                'type': place_type,
+                'cell': cell,
+                'lat': lat,
+                'lng': lng,
+                'radius': radius,
+                'fetched_at': now,
+                'complete': complete,
+                'place_ids': place_ids,
+            }
+            self._coverage_by_type.setdefault(place_type, []).append(coverage)
+            self._cells.setdefault(cell, []).append(coverage)
+            self._cells.move_to_end(cell)
+
+            while len(self._cells) > self.max_cells:
+                self._evict_oldest_cell()
+
+    def _remove_coverage(self, coverage: dict):
+        """coverage 하나와, 더 이상 참조되지 않는 장소 레코드를 지운다 (lock 보유 상태에서 호출)"""
+        for collection, key in ((self._coverage_by_type, coverage['type']), (self._cells, coverage['cell'])):
+            coverages = collection.get(key)
+            if coverages is None:
+                continue
+            for index, candidate in enumerate(coverages):
+                if candidate is coverage:
+                    del coverages[index]
+                    break
+            if not coverages:
+                del collection[key]
+        for place_id in coverage['place_ids']:
+            record = self._places.get(place_id)
+            if record is None:
+                continue
+            record['refs'] -= 1
+            if record['refs'] <= 0:
+                del self._places[place_id]
+
+    def _evict_oldest_cell(self):
+        """가장 오래 갱신된 셀을 통째로 버린다 (lock 보유 상태에서 호출)"""
+        cell = next(iter(self._cells))
+        for coverage in list(self._cells[cell]):
+            self._remove_coverage(coverage)
+        self._cells.pop(cell, None)
+        self.evicted_cells += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'stale': self.stale,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+                'cells': len(self._cells),
+                'max_cells': self.max_cells,
+                'coverages': sum(len(coverages) for coverages in self._cells.values()),
+                'places': len(self._places),
+                'evicted_cells': self.evicted_cells,
+            }
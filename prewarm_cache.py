@@ -0,0 +1,384 @@
+"""Places 응답 캐시 사전 적재(pre-warming) 작업
+
+트래픽이 몰리는 지역(주요 역 주변 등)을 Places 캐시 셀(geohash) 단위로 나누고, 자주 쓰이는 place_type을
+UltraSearchService.search_by_types로 미리 가져와 영구 응답 캐시(places_cache.sqlite3)에 채워 둔다.
+캐시 키가 (geohash 셀, 반경, type, page)이므로 셀 중심에서 검색해 두면 그 셀 안에서 들어오는 같은 반경의
+type 검색은 모두 캐시로 응답된다.
+
+- API별 token bucket(--qps)과 작업 전체 비용 상한(--max-cost-usd)을 지킨다 (재개해도 누적 비용 기준)
+- 진행 상황은 체크포인트 파일에 원자적으로 저장되어, 중단 후 같은 명령으로 다시 실행하면 이어서 진행한다
+- 끝나면(또는 상한에 걸리면) 지역별 커버리지와 비용을 보고한다
+
+    python prewarm_cache.py                                   # prewarm_hotspots.json의 지역 전체
+    python prewarm_cache.py --areas my_areas.json --types restaurant cafe --max-cost-usd 10
+    python prewarm_cache.py --center 35.6812,139.7671 --area-radius 800 --dry-run
+"""
+import argparse
+import hashlib
+import json
+import logging
+import math
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# 키워드 생성(LLM)은 쓰지 않으므로 flask_app import 시 Vertex AI 프리웜을 끈다
+os.environ.setdefault('VERTEX_PREWARM', '0')
+
+from distance_utils import calculate_distance, geohash_encode, geohash_decode  # noqa: E402
+from query_plan import QueryPlan  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_AREAS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'prewarm_hotspots.json')
+DEFAULT_PLACE_TYPES = ['restaurant', 'cafe', 'bar', 'convenience_store', 'store', 'tourist_attraction']
+DEFAULT_AREA_RADIUS = 1000  # meters, center만 주어진 지역의 반경
+DEFAULT_QPS = 5.0  # 라이브 트래픽과 쿼터를 나눠 쓰므로 서버 기본값보다 낮게
+DEFAULT_MAX_COST_USD = 5.0
+DEFAULT_WORKERS = 4
+CHECKPOINT_EVERY = 10  # 작업 단위 몇 개마다 체크포인트를 쓸지
+CHECKPOINT_VERSION = 1
+
+
+def load_areas(path: str) -> list:
+    """{"areas": [{"name", "center": [lat, lng], "radius_m"} | {"name", "polygon": [[lat, lng], ...]}]}"""
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['areas']
+
+
+def _point_in_polygon(lat: float, lng: float, polygon: list) -> bool:
+    """ray casting - polygon은 [[lat, lng], ...] (닫힘 여부 무관)"""
+    inside = False
+    j = len(polygon) - 1
+    for i in range(len(polygon)):
+        lat_i, lng_i = polygon[i]
+        lat_j, lng_j = polygon[j]
+        if (lng_i > lng) != (lng_j > lng):
+            crossing = lat_i + (lng - lng_i) * (lat_j - lat_i) / (lng_j - lng_i)
+            if lat < crossing:
+                inside = not inside
+        j = i
+    return inside
+
+
+def _cells_in_bounds(min_lat: float, min_lng: float, max_lat: float, max_lng: float, precision: int):
+    """경계 상자와 겹치는 geohash 셀을 (geohash, 중심 lat, 중심 lng)로 나열한다"""
+    _, _, lat_error, lng_error = geohash_decode(geohash_encode(min_lat, min_lng, precision))
+    lat = min_lat
+    while lat <= max_lat + lat_error:
+        lng = min_lng
+        while lng <= max_lng + lng_error:
+            cell = geohash_encode(min(lat, max_lat), min(lng, max_lng), precision)
+            center_lat, center_lng, _, _ = geohash_decode(cell)
+            yield cell, center_lat, center_lng
+            lng += lng_error * 2
+        lat += lat_error * 2
+
+
+def _area_center(area: dict) -> tuple:
+    if area.get('center'):
+        return tuple(area['center'])
+    polygon = area['polygon']
+    return (sum(point[0] for point in polygon) / len(polygon), sum(point[1] for point in polygon) / len(polygon))
+
+
+def tile_area(area: dict, precision: int) -> list:
+    """Return [(geohash, (lat, lng)), ...] of the cache cells whose centers fall inside the area
+
+    지역 중심에 가까운 셀부터 정렬된다 (비용 상한에 걸려도 중심부가 먼저 채워지도록).
+    """
+    cells = {}
+    if area.get('polygon'):
+        polygon = area['polygon']
+        lats = [point[0] for point in polygon]
+        lngs = [point[1] for point in polygon]
+        for cell, lat, lng in _cells_in_bounds(min(lats), min(lngs), max(lats), max(lngs), precision):
+            if _point_in_polygon(lat, lng, polygon):
+                cells[cell] = (lat, lng)
+    else:
+        center_lat, center_lng = area['center']
+        radius = float(area.get('radius_m', DEFAULT_AREA_RADIUS))
+        lat_span = radius / 111_320
+        lng_span = radius / (111_320 * math.cos(math.radians(center_lat)))
+        for cell, lat, lng in _cells_in_bounds(center_lat - lat_span, center_lng - lng_span,
+                                               center_lat + lat_span, center_lng + lng_span, precision):
+            if calculate_distance(center_lat, center_lng, lat, lng) <= radius:
+                cells[cell] = (lat, lng)
+    # 지역이 셀 하나보다 작으면 중심 셀이라도 포함
+    if not cells and area.get('center'):
+        cell = geohash_encode(area['center'][0], area['center'][1], precision)
+        lat, lng, _, _ = geohash_decode(cell)
+        cells[cell] = (lat, lng)
+    center_lat, center_lng = _area_center(area)
+    return sorted(cells.items(), key=lambda item: calculate_distance(center_lat, center_lng, *item[1]))
+
+
+def interleave_cells(area_cells: list) -> list:
+    """지역별 셀 목록을 번갈아 합친다 (모든 지역의 중심부 → 바깥쪽 순서, 중복 셀은 한 번만)"""
+    ordered = {}
+    for rank in range(max((len(cells) for cells in area_cells), default=0)):
+        for cells in area_cells:
+            if rank < len(cells):
+                cell, latlng = cells[rank]
+                ordered.setdefault(cell, latlng)
+    return list(ordered.items())
+
+
+class Checkpoint:
+    """Resumable progress of one pre-warming job (JSON file, 원자적 교체로 저장)
+
+    units에는 끝난 작업 단위("geohash|place_type")만 기록되며 실패한 단위는 재개 시 다시 시도한다.
+    작업 설정(반경, type, 셀 목록)이 달라지면 이어서 진행하지 않는다.
+    """
+
+    def __init__(self, path: str, signature: str):
+        self.path = path
+        self.signature = signature
+        self.units = {}  # unit -> 'warmed' | 'cached'
+        self.spent_usd = 0.0
+        self.api_calls = 0
+        self.failed = 0
+
+    @classmethod
+    def load(cls, path: str, signature: str, restart: bool = False) -> 'Checkpoint':
+        checkpoint = cls(path, signature)
+        if restart or not path or not os.path.exists(path):
+            return checkpoint
+        with open(path, encoding='utf-8') as f:
+            state = json.load(f)
+        if state.get('version') != CHECKPOINT_VERSION or state.get('signature') != signature:
+            raise ValueError(f'{path}: 다른 설정으로 만든 체크포인트입니다 (--restart로 새로 시작)')
+        checkpoint.units = state.get('units', {})
+        checkpoint.spent_usd = state.get('spent_usd', 0.0)
+        checkpoint.api_calls = state.get('api_calls', 0)
+        return checkpoint
+
+    def save(self):
+        if not self.path:
+            return
+        state = {
+            'version': CHECKPOINT_VERSION,
+            'signature': self.signature,
+            'updated_at': time.time(),
+            'spent_usd': round(self.spent_usd, 4),
+            'api_calls': self.api_calls,
+            'units': self.units,
+        }
+        temp_path = f'{self.path}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(temp_path, self.path)
+
+
+def job_signature(radius: int, place_types: list, cells: list) -> str:
+    payload = json.dumps([radius, sorted(place_types), sorted(cell for cell, _ in cells)])
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+class PrewarmJob:
+    """Warm the Places response cache for (cell, place_type) units under a cost cap"""
+
+    def __init__(self, service, cells: list, place_types: list, radius: int, checkpoint: Checkpoint,
+                 max_cost_usd: float, workers: int, max_pages: int = 3):
+        self.service = service
+        self.cells = cells  # [(geohash, (lat, lng)), ...]
+        self.place_types = place_types
+        self.radius = radius
+        self.checkpoint = checkpoint
+        self.max_cost_usd = max_cost_usd
+        self.workers = workers
+        self.unit_worst_cost = max_pages * service.cost_per_call  # 페이지 3개 전부 호출하는 경우
+        self.stop_reason = None
+
+    def _page1_cache_key(self, latlng: tuple, place_type: str) -> str:
+        params = {'location': latlng, 'radius': self.radius, 'type': place_type}
+        return self.service._places_cache_key('nearby', params, 1)
+
+    def _is_cached(self, latlng: tuple, place_type: str) -> bool:
+        return self.service.places_cache.get(self._page1_cache_key(latlng, place_type)) is not None
+
+    def _warm(self, latlng: tuple, place_type: str) -> tuple:
+        """Returns (warmed, issued_calls) - warmed는 1페이지가 캐시에 들어갔는지 여부"""
+        plan = QueryPlan()
+        self.service.search_by_types([place_type], latlng, self.radius, plan)
+        return self._is_cached(latlng, place_type), plan.issued
+
+    def _record(self, unit: str, warmed: bool, issued: int):
+        checkpoint = self.checkpoint
+        checkpoint.api_calls += issued
+        checkpoint.spent_usd += issued * self.service.cost_per_call
+        if warmed:
+            checkpoint.units[unit] = 'warmed'
+        else:
+            checkpoint.failed += 1
+
+    def units(self):
+        for cell, latlng in self.cells:
+            for place_type in self.place_types:
+                yield f'{cell}|{place_type}', latlng, place_type
+
+    def run(self):
+        checkpoint = self.checkpoint
+        pending = [unit for unit in self.units() if unit[0] not in checkpoint.units]
+        in_flight = {}
+        completed_since_save = 0
+        executor = ThreadPoolExecutor(max_workers=max(1, self.workers), thread_name_prefix='prewarm')
+        try:
+            while pending or in_flight:
+                while pending and len(in_flight) < self.workers and self.stop_reason is None:
+                    unit, latlng, place_type = pending[0]
+                    if self._is_cached(latlng, place_type):
+                        pending.pop(0)
+                        checkpoint.units[unit] = 'cached'
+                        continue
+                    committed = checkpoint.spent_usd + (len(in_flight) + 1) * self.unit_worst_cost
+                    if committed > self.max_cost_usd + 1e-9:
+                        self.stop_reason = 'cost_cap'
+                        break
+                    pending.pop(0)
+                    in_flight[executor.submit(self._warm, latlng, place_type)] = unit
+
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    unit = in_flight.pop(future)
+                    try:
+                        warmed, issued = future.result()
+                    except Exception as e:
+                        logger.error("%s 실패: %s", unit, e)
+                        warmed, issued = False, 0
+                    self._record(unit, warmed, issued)
+                    completed_since_save += 1
+                    if completed_since_save >= CHECKPOINT_EVERY:
+                        checkpoint.save()
+                        completed_since_save = 0
+        except KeyboardInterrupt:
+            self.stop_reason = 'interrupted'
+            logger.warning("중단됨 - 진행 중인 호출을 마치고 체크포인트를 저장합니다")
+            for future, unit in in_flight.items():
+                if future.cancel():
+                    continue
+                try:
+                    self._record(unit, *future.result())
+                except Exception:
+                    continue
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            checkpoint.save()
+        self.stop_reason = self.stop_reason or 'complete'
+
+    def report(self, areas: list, area_cells: list, elapsed: float) -> dict:
+        units = self.checkpoint.units
+        per_area = []
+        for area, cells in zip(areas, area_cells):
+            total = len(cells) * len(self.place_types)
+            warm = sum(1 for cell, _ in cells for place_type in self.place_types if f'{cell}|{place_type}' in units)
+            per_area.append({
+                'name': area.get('name', ''),
+                'cells': len(cells),
+                'units': total,
+                'warm_units': warm,
+                'coverage': round(warm / total, 3) if total else 0.0,
+            })
+        total_units = len(self.cells) * len(self.place_types)
+        return {
+            'stop_reason': self.stop_reason,
+            'radius': self.radius,
+            'place_types': self.place_types,
+            'cells': len(self.cells),
+            'units': total_units,
+            'warmed_units': sum(1 for status in units.values() if status == 'warmed'),
+            'already_cached_units': sum(1 for status in units.values() if status == 'cached'),
+            'failed_units_this_run': self.checkpoint.failed,
+            'coverage': round(len(units) / total_units, 3) if total_units else 0.0,
+            'api_calls': self.checkpoint.api_calls,
+            'spent_usd': round(self.checkpoint.spent_usd, 4),
+            'max_cost_usd': self.max_cost_usd,
+            'elapsed_seconds': round(elapsed, 1),
+            'rate_limits': self.service.get_rate_limit_stats(),
+            'areas': per_area,
+        }
+
+
+def print_report(report: dict):
+    print(f"\n{'area':<24}{'cells':>7}{'units':>7}{'warm':>7}{'coverage':>10}")
+    for area in report['areas']:
+        print(f"{area['name'][:23]:<24}{area['cells']:>7}{area['units']:>7}{area['warm_units']:>7}{area['coverage']:>10.1%}")
+    print(f"\n중단 사유: {report['stop_reason']}, 전체 커버리지 {report['coverage']:.1%} "
+          f"(새로 적재 {report['warmed_units']}, 이미 캐시됨 {report['already_cached_units']}, "
+          f"이번 실행 실패 {report['failed_units_this_run']})")
+    print(f"Places API {report['api_calls']}회, ${report['spent_usd']} / 상한 ${report['max_cost_usd']}, "
+          f"{report['elapsed_seconds']}초")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Pre-warm the Places response cache for hotspot areas')
+    parser.add_argument('--areas', default=DEFAULT_AREAS_PATH, help='지역 JSON 파일 (center/radius_m 또는 polygon)')
+    parser.add_argument('--center', action='append', default=[], help='"lat,lng" 추가 지역 중심 (여러 번 지정 가능)')
+    parser.add_argument('--area-radius', type=float, default=DEFAULT_AREA_RADIUS, help='--center 지역의 반경(m)')
+    parser.add_argument('--types', nargs='+', default=DEFAULT_PLACE_TYPES, help='미리 가져올 place_type')
+    parser.add_argument('--radius', type=int, default=None, help='검색 반경(m), 기본값은 서비스의 SEARCH_RADIUS')
+    parser.add_argument('--qps', type=float, default=DEFAULT_QPS, help='Places Nearby 초당 호출 수 상한')
+    parser.add_argument('--max-cost-usd', type=float, default=DEFAULT_MAX_COST_USD, help='작업 전체(재개 포함) 비용 상한')
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    parser.add_argument('--checkpoint', default='prewarm_checkpoint.json', help='진행 상황 파일 (빈 문자열이면 저장 안 함)')
+    parser.add_argument('--restart', action='store_true', help='기존 체크포인트를 무시하고 처음부터')
+    parser.add_argument('--dry-run', action='store_true', help='타일링 결과와 최대 비용만 출력')
+    parser.add_argument('--json', help='보고서를 JSON 파일로도 저장')
+    args = parser.parse_args(argv)
+
+    areas = []
+    # --center만 주면 기본 지역 파일은 읽지 않는다
+    if args.areas and (args.areas != DEFAULT_AREAS_PATH or not args.center):
+        areas.extend(load_areas(args.areas))
+    for center in args.center:
+        lat, lng = (float(value) for value in center.split(','))
+        areas.append({'name': center, 'center': [lat, lng], 'radius_m': args.area_radius})
+    if not areas:
+        parser.error('지역이 없습니다 (--areas 또는 --center)')
+
+    import flask_app
+    from rate_limit import TokenBucket
+
+    service = flask_app.search_service
+    if service.places_cache is None:
+        print('PLACES_CACHE_TTL=0 - Places 캐시가 꺼져 있어 적재할 수 없습니다', file=sys.stderr)
+        return 2
+    radius = args.radius or flask_app.SEARCH_RADIUS
+    precision = flask_app.PLACES_CACHE_GEOHASH_PRECISION
+
+    area_cells = [tile_area(area, precision) for area in areas]
+    cells = interleave_cells(area_cells)
+    worst_cost = len(cells) * len(args.types) * 3 * service.cost_per_call
+    print(f"지역 {len(areas)}개 → 캐시 셀 {len(cells)}개 × type {len(args.types)}개 "
+          f"(반경 {radius}m, 최대 ${worst_cost:.2f}, 상한 ${args.max_cost_usd})")
+    if args.dry_run:
+        return 0
+
+    # 이 작업 프로세스만의 호출 제한 (서버 프로세스와 쿼터를 나눠 쓴다)
+    service.rate_limits['nearby'] = TokenBucket('nearby', args.qps, max(1, int(args.qps)), max_wait=60)
+
+    try:
+        checkpoint = Checkpoint.load(args.checkpoint, job_signature(radius, args.types, cells), restart=args.restart)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    if checkpoint.units:
+        print(f"체크포인트에서 재개: 완료 {len(checkpoint.units)}개, 누적 ${checkpoint.spent_usd:.3f}")
+
+    job = PrewarmJob(service, cells, args.types, radius, checkpoint, args.max_cost_usd, args.workers)
+    start = time.time()
+    job.run()
+    report = job.report(areas, area_cells, time.time() - start)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    return 0 if report['stop_reason'] == 'complete' else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,197 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+
+# 위치 반올림 자릿수 - 소수점 4자리 ≈ 11m
+LOCATION_PRECISION = 4
+
+
+def canonical_places_key(endpoint: str, params: dict, page: int = 1, precision: int = LOCATION_PRECISION) -> tuple:
+    """Canonicalize one outgoing Places call into a hashable key
+
+    (endpoint, type, keyword, query, 반올림된 위치, radius, rank_by, page) 조합으로 구성된다.
+    page_token은 요청마다 값이 달라지므로 키에 넣지 않고 페이지 번호로 대신한다.
+    """
+    location = params.get('location')
+    if location is not None:
+        lat, lng = location
+        location = (round(float(lat), precision), round(float(lng), precision))
+    radius = params.get('radius')
+    return (
+        endpoint,
+        params.get('type') or '',
+        params.get('keyword') or '',
+        params.get('query') or '',
+        location,
+        int(radius) if radius is not None else None,
+        params.get('rank_by') or '',
+        page,
+    )
+
+
+class QueryPlan:
+    """Request-scoped memo of outgoing Places calls
+
+    같은 요청 안에서 동일한 Places 호출(페이지 포함)은 한 번만 실제로 발행되고,
+    이후 반복 호출은 메모리에서 응답을 돌려준다. 동시에 같은 호출이 들어오면
+    먼저 들어온 쪽의 결과(Future)를 함께 기다린다.
+    fetch 쪽에서 실제 API 호출이면 record_issued(), 영구 캐시 응답이면 record_cache_hit()을 부른다.
+    hedge로 한 번 더 보낸 호출은 record_hedged()로 세며 issued(과금 호출)에도 포함된다.
+    trace가 주어지면 이 요청의 Places 호출/대기 span이 함께 기록된다.
+    cancel(CancelToken)이 주어지면 이 요청의 Places 호출/대기가 취소와 마감을 따른다.
+    추측(speculative) 호출로 표시된 key를 나중에 다른 호출이 재사용하면 중복 제거가 아니라 speculative 재사용으로 센다.
+    shared(QueryPlan)가 주어지면 그 플랜과 호출 메모를 함께 쓴다 - 배치의 질의별 플랜이 같은 Places 호출을
+    한 번만 발행하고, 먼저 발행한 플랜만 issued로, 나머지는 deduplicated로 센다 (카운터는 플랜마다 따로).
+    """
+
+    def __init__(self, precision: int = LOCATION_PRECISION, trace=None, cancel=None, shared: 'QueryPlan' = None):
+        self.precision = precision
+        self.trace = trace
+        self.cancel = cancel
+        if shared is not None:
+            self._calls = shared._calls  # canonical key -> Future
+            self._lock = shared._lock
+        else:
+            self._calls = {}  # canonical key -> Future
+            self._lock = threading.Lock()
+        self.issued = 0
+        self.deduplicated = 0
+        self.cache_hits = 0
+        self.index_hits = 0
+        self.coalesced = 0
+        self.hedged = 0
+        self._hedge_slots = 0  # admit_hedge로 잡은 hedge 자리 (상한 검사용)
+        self._speculative = {}  # canonical key -> 재사용 여부
+        self._billed = set()  # 실제 API로 나간 호출의 key
+
+    def key(self, endpoint: str, params: dict, page: int = 1) -> tuple:
+        return canonical_places_key(endpoint, params, page, self.precision)
+
+    def execute(self, endpoint: str, params: dict, page: int, fetch):
+        """Return the memoized response for this call, issuing `fetch()` only on first use"""
+        key = self.key(endpoint, params, page)
+        with self._lock:
+            future = self._calls.get(key)
+            if future is None:
+                future = Future()
+                self._calls[key] = future
+                leader = True
+            else:
+                self._count_follower(key)
+                leader = False
+
+        if not leader:
+            return future.result()
+
+        try:
+            result = fetch()
+        except BaseException as e:
+            # 실패한 호출은 메모하지 않음 - 이후 반복 호출은 다시 시도
+            with self._lock:
+                self._calls.pop(key, None)
+            future.set_exception(e)
+            raise
+        future.set_result(result)
+        return result
+
+    async def execute_async(self, endpoint: str, params: dict, page: int, fetch):
+        """Async variant of execute - fetch is a coroutine function, callers share one event loop"""
+        key = self.key(endpoint, params, page)
+        with self._lock:
+            future = self._calls.get(key)
+            if future is None:
+                future = asyncio.get_running_loop().create_future()
+                self._calls[key] = future
+                leader = True
+            else:
+                self._count_follower(key)
+                leader = False
+
+        if not leader:
+            return await asyncio.shield(future)
+
+        try:
+            result = await fetch()
+        except BaseException as e:
+            with self._lock:
+                self._calls.pop(key, None)
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                future.exception()  # 기다리는 쪽이 없어도 "never retrieved" 경고를 내지 않도록
+            raise
+        future.set_result(result)
+        return result
+
+    def _count_follower(self, key: tuple):
+        """lock 보유 상태에서 호출"""
+        if self._speculative.get(key) is False:
+            self._speculative[key] = True
+        else:
+            self.deduplicated += 1
+
+    def mark_speculative(self, endpoint: str, params: dict, page: int = 1) -> tuple:
+        """Mark a call issued before it is known to be needed; returns its key"""
+        key = self.key(endpoint, params, page)
+        with self._lock:
+            self._speculative.setdefault(key, False)
+        return key
+
+    def unmark_speculative(self, key: tuple):
+        """추측 호출이 시작되기 전에 취소된 경우 - 이후 같은 호출은 일반 호출로 센다"""
+        with self._lock:
+            self._speculative.pop(key, None)
+
+    def speculative_outcome(self, key: tuple) -> tuple:
+        """Return (reused, billed) for a speculative call"""
+        with self._lock:
+            return bool(self._speculative.get(key)), key in self._billed
+
+    def record_issued(self, count: int = 1, key: tuple = None):
+        """Count calls that actually went to the Places API (billed)"""
+        with self._lock:
+            self.issued += count
+            if key is not None:
+                self._billed.add(key)
+
+    def record_hedged(self, count: int = 1):
+        """Count duplicate (hedged) Places calls - billed like any other call"""
+        with self._lock:
+            self.issued += count
+            self.hedged += count
+
+    def admit_hedge(self, limit: int) -> bool:
+        """Reserve one of this request's limit hedge slots; False once they are used up"""
+        with self._lock:
+            if self._hedge_slots >= limit:
+                return False
+            self._hedge_slots += 1
+            return True
+
+    def record_cache_hit(self, count: int = 1):
+        """Count calls answered by the persistent response cache"""
+        with self._lock:
+            self.cache_hits += count
+
+    def record_index_hit(self, count: int = 1):
+        """Count sub-searches answered by the local place index without any Places call"""
+        with self._lock:
+            self.index_hits += count
+
+    def record_coalesced(self, count: int = 1):
+        """Count calls answered by another request's in-flight call (SingleFlight follower)"""
+        with self._lock:
+            self.coalesced += count
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'issued_calls': self.issued,
+                'deduplicated_calls': self.deduplicated,
+                'cache_hits': self.cache_hits,
+                'index_hits': self.index_hits,
+                'coalesced_calls': self.coalesced,
+                'hedged_calls': self.hedged,
+                'unique_queries': len(self._calls),
+            }
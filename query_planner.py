@@ -0,0 +1,651 @@
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, ALL_COMPLETED
+
+from distance_utils import calculate_distance
+
+PLACES_PAGE_SIZE = 20
+MAX_PAGES = 3  # Nearby/Text Search는 최대 3페이지(60개)
+KEYWORD_CHUNK_SIZE = 6
+MIN_PAGE_YIELD = 2.0  # 다음 페이지의 기대 신규 장소 수가 이보다 적으면 페이지네이션 중단
+
+# 첫 페이지 기대 수확(반경 안 신규 장소 수) 사전값 - 관측치가 쌓이면 YieldModel이 대체한다
+PRIOR_FIRST_PAGE_YIELD = {
+    'type': (18.0, 12.0, 8.0),
+    'keyword': (10.0, 6.0),
+    'text': (8.0,),
+}
+PRIOR_NEXT_PAGE_DECAY = 0.7  # 이전 페이지 수확 대비 다음 페이지 기대 비율
+PRIOR_CALL_LATENCY = 0.5  # seconds
+
+
+class SubQuery:
+    """One candidate Places query (type / keyword chunk / text search) and its execution state"""
+
+    def __init__(self, index: int, kind: str, rank: int, label: str, endpoint: str, params: dict, search_term: str):
+        self.index = index
+        self.kind = kind
+        self.rank = rank
+        self.label = label
+        self.endpoint = endpoint
+        self.params = params
+        self.search_term = search_term
+
+        self.expected_yield = 0.0
+        self.pages = 0
+        self.issued_pages = 0
+        self.results = []
+        self.new_places = 0
+        self.new_in_radius = 0
+        self.status = 'pending'
+
+    def report(self) -> dict:
+        return {
+            'label': self.label,
+            'kind': self.kind,
+            'endpoint': self.endpoint,
+            'term': self.search_term,
+            'expected_yield': round(self.expected_yield, 1),
+            'pages': self.pages,
+            'new_places': self.new_places,
+            'new_in_radius': self.new_in_radius,
+            'status': self.status,
+        }
+
+
+class YieldModel:
+    """Process-wide running estimate (EWMA) of new in-radius places per page and of call latency
+
+    (kind, rank, page) 단위로 실제 수확을 관측해 다음 요청의 후보 순위와 페이지네이션 판단에 쓴다.
+    """
+
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self._yields = {}
+        self._latency = {}
+        self._lock = threading.Lock()
+
+    def expected_yield(self, kind: str, rank: int, page: int, prior: float) -> float:
+        with self._lock:
+            return self._yields.get((kind, rank, page), prior)
+
+    def observe_yield(self, kind: str, rank: int, page: int, value: float):
+        with self._lock:
+            key = (kind, rank, page)
+            previous = self._yields.get(key)
+            self._yields[key] = value if previous is None else previous + self.alpha * (value - previous)
+
+    def expected_latency(self, endpoint: str) -> float:
+        with self._lock:
+            return self._latency.get(endpoint, PRIOR_CALL_LATENCY)
+
+    def observe_latency(self, endpoint: str, seconds: float):
+        with self._lock:
+            previous = self._latency.get(endpoint)
+            self._latency[endpoint] = seconds if previous is None else previous + self.alpha * (seconds - previous)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'yields': {f'{kind}:{rank}:p{page}': round(value, 1) for (kind, rank, page), value in sorted(self._yields.items())},
+                'latency': {endpoint: round(value, 3) for endpoint, value in self._latency.items()},
+            }
+
+
+def build_candidates(keywords_result: dict, latlng: tuple, radius: int, rank_by_distance: bool = False) -> list:
+    """Candidate sub-queries for one keyword result, deduplicated by their Places parameters
+
+    place_type 최대 3개(Nearby type 검색), 추상 키워드 6개 묶음 최대 2개(Nearby keyword 검색),
+    직접 번역 키워드 텍스트 검색(gmaps.places) 1개.
+    rank_by_distance면 Nearby 후보를 radius 없이 rank_by=distance(가까운 순)로 만들고,
+    거리순 정렬을 지원하지 않는 텍스트 검색은 뺀다 (RingPlanner용).
+    """
+    candidates = []
+    seen = set()
+
+    def area(**params):
+        if rank_by_distance:
+            return {'location': latlng, 'rank_by': 'distance', **params}
+        return {'location': latlng, 'radius': radius, **params}
+
+    def add(kind, rank, label, endpoint, params, search_term):
+        key = (endpoint, tuple(sorted((k, str(v)) for k, v in params.items())))
+        if key in seen:
+            return
+        seen.add(key)
+        candidates.append(SubQuery(len(candidates), kind, rank, label, endpoint, params, search_term))
+
+    for rank, place_type in enumerate(keywords_result.get('place_types', [])[:3]):
+        add('type', rank, place_type, 'nearby', area(type=place_type), place_type)
+
+    abstract_keywords = keywords_result.get('abstract_translation', [])
+    for rank in range(2):
+        chunk = abstract_keywords[rank * KEYWORD_CHUNK_SIZE:(rank + 1) * KEYWORD_CHUNK_SIZE]
+        if not chunk:
+            break
+        keyword = ' OR '.join(chunk)
+        add('keyword', rank, f'keyword_{rank + 1}', 'nearby', area(keyword=keyword), keyword)
+
+    direct_keywords = keywords_result.get('direct_translation', [])[:3]
+    if direct_keywords and not rank_by_distance:
+        query = ' OR '.join(direct_keywords)
+        add('text', 0, 'text_search', 'text', {'query': query, 'location': latlng, 'radius': radius}, query)
+
+    return candidates
+
+
+class QueryPlanner:
+    """Budget- and deadline-aware execution of the Places fan-out for one request
+
+    후보 서브 쿼리를 기대 수확(반경 안 신규 장소 수) 순으로 페이지 단위로 실행한다.
+    - 반경 안 고유 장소가 target_results개 모이면 새 호출을 멈춘다 (target_reached)
+    - 예약된 호출까지 합친 비용이 max_cost_usd를 넘게 되면 멈춘다 (budget_exhausted)
+    - 다음 호출이 deadline 안에 끝나지 않을 것 같거나 deadline이 지나면 멈춘다 (deadline)
+    - 모든 후보가 끝나면 exhausted
+    - plan.cancel(CancelToken)이 취소되면 새 호출을 멈추고 진행 중인 호출을 기다리지 않는다 (cancelled)
+    다음 페이지는 기대 수확이 MIN_PAGE_YIELD 이상일 때만 따라간다.
+    type 후보는 로컬 PlaceIndex가 범위를 덮으면 비용 없이 응답하고, 끝까지 받은 경우에만 인덱스에 기록한다.
+    """
+
+    def __init__(self, service, plan, merger, latlng: tuple, radius: int, deadline_at: float,
+                 max_cost_usd: float, target_results: int, yield_model: YieldModel,
+                 spent_usd: float = 0.0, max_workers: int = 5, on_places=None):
+        self.service = service
+        self.plan = plan
+        self.merger = merger
+        self.latlng = latlng
+        self.radius = radius
+        self.deadline_at = deadline_at  # time.monotonic() 기준
+        self.max_cost_usd = max_cost_usd
+        self.target_results = target_results
+        self.yield_model = yield_model
+        self.spent_usd = spent_usd  # 지오코딩 등 이미 쓴 비용
+        self.max_workers = max_workers
+        self.on_places = on_places
+
+        self.in_radius = set()
+        self.stop_reason = None
+        self._order = itertools.count()
+
+    def _committed_cost(self, in_flight: int) -> float:
+        """지금까지 발행된 호출 + 진행 중인 호출(전부 실제 호출이라고 가정)의 비용"""
+        return self.spent_usd + (self.plan.issued + in_flight) * self.service.cost_per_call
+
+    def _expected_duration(self, candidate: SubQuery, page: int) -> float:
+        latency = self.yield_model.expected_latency(candidate.endpoint)
+        if page > 1:
+            latency += self.service.page_poller.first_delay()
+        return latency
+
+    def _fetch_page(self, candidate: SubQuery, page: int, page_token: str):
+        start = time.monotonic()
+        response = self.service._places_request(self.plan, candidate.endpoint, candidate.params, page, page_token)
+        if page == 1:  # 다음 페이지는 토큰 대기 시간이 섞여 있음
+            self.yield_model.observe_latency(candidate.endpoint, time.monotonic() - start)
+        return response
+
+    async def _fetch_page_async(self, request_page, candidate: SubQuery, page: int, page_token: str):
+        start = time.monotonic()
+        response = await request_page(self.plan, candidate.endpoint, candidate.params, page, page_token)
+        if page == 1:
+            self.yield_model.observe_latency(candidate.endpoint, time.monotonic() - start)
+        return response
+
+    def _merge(self, candidate: SubQuery, page: int, raw_results: list) -> int:
+        """Merge one page, returning the number of new places inside the radius"""
+        places = [
+            place for place in (self.service._to_place_data(result, candidate.search_term, self.radius) for result in raw_results)
+            if place is not None
+        ]
+        new_places = self.merger.add(candidate.index, candidate.label, places, offset=(page - 1) * PLACES_PAGE_SIZE)
+        in_radius = []
+        for place in new_places:
+            if calculate_distance(self.latlng[0], self.latlng[1], place['lat'], place['lng']) <= self.radius:
+                self.in_radius.add(place['place_id'])
+                in_radius.append(place)
+        candidate.new_places += len(new_places)
+        candidate.new_in_radius += len(in_radius)
+        self._emit(new_places, in_radius)
+        return len(in_radius)
+
+    def _emit(self, new_places: list, in_radius: list):
+        if self.on_places is not None and new_places:
+            self.on_places(new_places)
+
+    def _try_index(self, candidate: SubQuery) -> bool:
+        if candidate.kind != 'type':
+            return False
+        results = self.service.place_index.lookup(candidate.params['type'], self.latlng, self.radius)
+        if results is None:
+            return False
+        self.plan.record_index_hit()
+        self._merge(candidate, 1, results)
+        candidate.pages = 0
+        candidate.status = 'index'
+        return True
+
+    def _seed(self, candidates: list) -> list:
+        """첫 페이지 작업 heap을 만든다 - heap of (-expected_yield, order, candidate, page, page_token)"""
+        pending = []
+        for candidate in candidates:
+            if self._try_index(candidate):
+                continue
+            priors = PRIOR_FIRST_PAGE_YIELD[candidate.kind]
+            prior = priors[min(candidate.rank, len(priors) - 1)]
+            candidate.expected_yield = self.yield_model.expected_yield(candidate.kind, candidate.rank, 1, prior)
+            heapq.heappush(pending, (-candidate.expected_yield, next(self._order), candidate, 1, None))
+
+        if len(self.in_radius) >= self.target_results:
+            self.stop_reason = 'target_reached'
+        return pending
+
+    def _next_unit(self, pending: list, in_flight: int):
+        """다음에 발행할 (candidate, page, page_token), 멈춰야 하면 stop_reason을 정하고 None"""
+        if not pending or self.stop_reason is not None or in_flight >= self.max_workers or self._cancelled():
+            return None
+        if self._committed_cost(in_flight) + self.service.cost_per_call > self.max_cost_usd + 1e-9:
+            self.stop_reason = 'budget_exhausted'
+            return None
+        candidate, page = pending[0][2], pending[0][3]
+        if time.monotonic() + self._expected_duration(candidate, page) > self.deadline_at:
+            self.stop_reason = 'deadline'
+            return None
+        _, _, candidate, page, page_token = heapq.heappop(pending)
+        candidate.status = 'running'
+        candidate.issued_pages += 1
+        return candidate, page, page_token
+
+    def _handle_response(self, candidate: SubQuery, page: int, response: dict, pending: list):
+        """페이지 하나를 병합하고 다음 페이지를 따라갈지 정한다"""
+        raw_results = response.get('results', [])
+        candidate.results.extend(raw_results)
+        candidate.pages = page
+        new_in_radius = self._merge(candidate, page, raw_results)
+        self.yield_model.observe_yield(candidate.kind, candidate.rank, page, new_in_radius)
+
+        if len(self.in_radius) >= self.target_results and self.stop_reason is None:
+            self.stop_reason = 'target_reached'
+
+        next_token = response.get('next_page_token')
+        if not next_token or page >= MAX_PAGES:
+            candidate.status = 'done'
+            if candidate.kind == 'type':
+                self.service.place_index.add(candidate.params['type'], self.latlng, self.radius, candidate.results, True)
+            return
+        expected = self.yield_model.expected_yield(
+            candidate.kind, candidate.rank, page + 1, new_in_radius * PRIOR_NEXT_PAGE_DECAY
+        )
+        if expected < MIN_PAGE_YIELD:
+            candidate.status = 'stopped_low_yield'
+            return
+        candidate.status = 'waiting'
+        heapq.heappush(pending, (-expected, next(self._order), candidate, page + 1, next_token))
+
+    def _abandon(self, in_flight_candidates, reason: str = 'deadline'):
+        self.stop_reason = self.stop_reason or reason
+        for candidate in in_flight_candidates:
+            candidate.status = f'abandoned_{reason}'
+
+    def _cancelled(self) -> bool:
+        return self.plan.cancel is not None and self.plan.cancel.cancelled
+
+    def _stop_cancelled(self, not_sent: int, in_flight_candidates):
+        """취소된 요청 - 아직 보내지 않은 호출 수를 세고 진행 중인 호출은 버린다 (응답은 캐시에는 남는다)"""
+        if self.plan.cancel is not None and self.stop_reason is None:
+            self.plan.cancel.skip('places', not_sent)
+        self._abandon(in_flight_candidates, 'cancelled')
+
+    def _waitable(self, futures) -> list:
+        """대기할 future 목록 - 취소 신호를 같이 넣어 취소되면 바로 깨어난다"""
+        if self.plan.cancel is None:
+            return list(futures)
+        return [*futures, self.plan.cancel.signal]
+
+    def _finish(self, pending: list) -> list:
+        for _, _, candidate, _, _ in pending:
+            if candidate.status in ('pending', 'waiting'):
+                candidate.status = f'stopped_{self.stop_reason}' if self.stop_reason else 'stopped'
+        self.stop_reason = self.stop_reason or 'exhausted'
+        return self.merger.results()
+
+    def run(self, candidates: list) -> list:
+        """Execute the plan on a worker pool; returns merged places (FanoutMerger order)"""
+        pending = self._seed(candidates)
+        executor = ThreadPoolExecutor(max_workers=max(1, self.max_workers), thread_name_prefix='planner')
+        in_flight = {}
+        try:
+            while True:
+                unit = self._next_unit(pending, len(in_flight))
+                while unit is not None:
+                    candidate, page, page_token = unit
+                    in_flight[executor.submit(self._fetch_page, candidate, page, page_token)] = (candidate, page)
+                    unit = self._next_unit(pending, len(in_flight))
+
+                if self._cancelled():
+                    self._stop_cancelled(len(pending), [candidate for candidate, _ in in_flight.values()])
+                    break
+                if not in_flight:
+                    break
+
+                remaining = self.deadline_at - time.monotonic()
+                done, _ = wait(self._waitable(in_flight), timeout=max(0.0, remaining), return_when=FIRST_COMPLETED)
+                if not done:
+                    self._abandon(candidate for candidate, _ in in_flight.values())
+                    break
+
+                for future in done:
+                    if future not in in_flight:
+                        continue  # 취소 신호 - 다음 반복에서 멈춘다
+                    candidate, page = in_flight.pop(future)
+                    try:
+                        response = future.result()
+                    except Exception:
+                        candidate.status = 'error'
+                        continue
+                    self._handle_response(candidate, page, response, pending)
+        finally:
+            # deadline/취소로 남겨둔 호출은 백그라운드에서 끝나게 두고 결과는 버린다
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        return self._finish(pending)
+
+    async def run_async(self, candidates: list, request_page) -> list:
+        """Async variant of run - pages are event-loop tasks instead of worker threads
+
+        request_page(plan, endpoint, params, page, page_token)은 Places 응답을 돌려주는 coroutine function.
+        max_workers는 동시에 진행하는 task 수이고, deadline에 걸리거나 요청 task가 취소되면 진행 중인 호출을 취소한다.
+        """
+        pending = self._seed(candidates)
+        in_flight = {}  # task -> (candidate, page)
+        try:
+            while True:
+                unit = self._next_unit(pending, len(in_flight))
+                while unit is not None:
+                    candidate, page, page_token = unit
+                    task = asyncio.ensure_future(self._fetch_page_async(request_page, candidate, page, page_token))
+                    in_flight[task] = (candidate, page)
+                    unit = self._next_unit(pending, len(in_flight))
+
+                if self._cancelled():
+                    self._stop_cancelled(len(pending), [candidate for candidate, _ in in_flight.values()])
+                    break
+                if not in_flight:
+                    break
+
+                remaining = self.deadline_at - time.monotonic()
+                done, _ = await asyncio.wait(in_flight, timeout=max(0.0, remaining), return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    self._abandon(candidate for candidate, _ in in_flight.values())
+                    break
+
+                for task in done:
+                    candidate, page = in_flight.pop(task)
+                    if task.cancelled() or task.exception() is not None:
+                        candidate.status = 'error'
+                        continue
+                    self._handle_response(candidate, page, task.result(), pending)
+        except asyncio.CancelledError:
+            # 요청 task 자체가 취소됐다 (클라이언트 연결 끊김 등)
+            self._stop_cancelled(len(pending), [candidate for candidate, _ in in_flight.values()])
+            raise
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+        return self._finish(pending)
+
+    def report(self, candidates: list, elapsed: float) -> dict:
+        return {
+            'max_cost_usd': self.max_cost_usd,
+            'target_results': self.target_results,
+            'stop_reason': self.stop_reason,
+            'unique_in_radius': len(self.in_radius),
+            'spent_usd': round(self._committed_cost(0), 4),
+            'elapsed': round(elapsed, 3),
+            'candidates': [candidate.report() for candidate in candidates],
+        }
+
+
+class RingPlanner(QueryPlanner):
+    """Progressive nearest-first search that expands outward in rings up to the request radius
+
+    Nearby Search에는 도넛 모양 필터가 없어서 반경을 키워 다시 검색하면 안쪽 장소까지 다시 받고 다시 과금된다.
+    그래서 후보를 rank_by=distance로 호출하고(build_candidates(..., rank_by_distance=True)) 거리순 페이지 하나를
+    ring 하나로 본다. 다음 ring은 next_page_token으로 이어 받으므로 안쪽 ring의 장소를 다시 가져오지 않는다.
+    ring의 반경(covered)은 아직 더 받을 장소가 남은 후보들의 가장 먼 장소 거리 중 최솟값 - 이 안의 장소는
+    모든 후보에서 빠짐없이 받았다.
+    - covered 안 고유 장소가 target_results개 이상이면 멈춘다 (target_reached)
+    - covered가 radius(최대 반경)에 닿으면 멈춘다 (max_radius)
+    - 예산/마감은 QueryPlanner와 같은 기준으로 호출마다 확인하고, ring 하나를 다 보낼 수 없으면 거기서 멈춘다
+    - 취소되면 진행 중인 ring을 기다리지 않고 멈춘다 (cancelled, 다음 ring의 호출을 보내지 않은 호출로 센다)
+    radius 밖 장소는 결과와 on_places에서 뺀다. ring마다 반경/호출 수/비용/시간이 self.rings에 남는다.
+    type 후보는 radius를 덮는 PlaceIndex coverage가 있으면 비용 없이 응답하고, 끝나면 빠짐없이 받은 원을 인덱스에 기록한다.
+    """
+
+    def __init__(self, *args, on_ring=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_ring = on_ring
+        self.rings = []
+        self.covered = 0.0
+        self._distances = {}  # place_id -> 중심에서의 거리 (m)
+        # candidate -> {'page', 'token', 'farthest', 'open'} - 아직 radius까지 다 받지 못한 후보
+        # (open=False: 에러/페이지 상한으로 멈춰 지금까지 받은 거리까지만 덮는 후보)
+        self._frontier = {}
+
+    def _emit(self, new_places: list, in_radius: list):
+        if self.on_places is not None and in_radius:
+            self.on_places(in_radius)
+
+    def _merge(self, candidate: SubQuery, page: int, raw_results: list) -> int:
+        state = self._frontier.get(candidate)
+        for result in raw_results:
+            location = (result.get('geometry') or {}).get('location') or {}
+            if not result.get('place_id') or location.get('lat') is None or location.get('lng') is None:
+                continue
+            distance = calculate_distance(self.latlng[0], self.latlng[1], location['lat'], location['lng'])
+            self._distances[result['place_id']] = distance
+            if state is not None:
+                state['farthest'] = max(state['farthest'], distance)
+        return super()._merge(candidate, page, raw_results)
+
+    def _seed_rings(self, candidates: list):
+        for candidate in candidates:
+            if not self._try_index(candidate):
+                self._frontier[candidate] = {'page': 1, 'token': None, 'farthest': 0.0, 'open': True}
+
+    def _ring_units(self) -> list:
+        """이번 ring에 보낼 (candidate, page, page_token) - 예산/마감에 걸리면 stop_reason을 정하고 빈 목록
+
+        ring 전체가 검사를 통과한 뒤에만 후보를 running으로 바꾼다 - 중간에 멈추면 아무 후보도 보낸 것으로 세지 않는다.
+        """
+        units = []
+        for candidate, state in self._frontier.items():
+            if not state['open']:
+                continue
+            if self._committed_cost(len(units)) + self.service.cost_per_call > self.max_cost_usd + 1e-9:
+                self.stop_reason = 'budget_exhausted'
+                return []
+            if time.monotonic() + self._expected_duration(candidate, state['page']) > self.deadline_at:
+                self.stop_reason = 'deadline'
+                return []
+            units.append((candidate, state['page'], state['token']))
+        for candidate, _, _ in units:
+            candidate.status = 'running'
+            candidate.issued_pages += 1
+        return units
+
+    def _close_ring(self, units: list, responses: dict, api_time: float, issued_before: int):
+        """ring 하나의 응답을 병합하고 반경/중단 여부를 정한다 - responses: candidate -> response (실패는 빠짐)"""
+        process_start = time.monotonic()
+        results_before = len(self.in_radius)
+        for candidate, page, _ in units:
+            state = self._frontier[candidate]
+            response = responses.get(candidate)
+            if response is None:
+                state['open'] = False
+                if candidate.status == 'running':
+                    candidate.status = 'error'
+                continue
+            raw_results = response.get('results', [])
+            candidate.results.extend(raw_results)
+            candidate.pages = page
+            self._merge(candidate, page, raw_results)
+
+            next_token = response.get('next_page_token')
+            if not next_token or state['farthest'] >= self.radius:
+                # 이 후보는 radius 안을 다 받았다
+                candidate.status = 'done'
+                del self._frontier[candidate]
+            elif page >= MAX_PAGES:
+                candidate.status = 'stopped_page_cap'
+                state['open'] = False
+            else:
+                candidate.status = 'waiting'
+                state['page'], state['token'] = page + 1, next_token
+
+        self.covered = min([state['farthest'] for state in self._frontier.values()] + [float(self.radius)])
+        covered_results = sum(1 for distance in self._distances.values() if distance <= self.covered)
+        ring = {
+            'ring': len(self.rings) + 1,
+            'radius': int(self.covered),
+            'calls': len(units),
+            'api_calls': self.plan.issued - issued_before,
+            'cost_usd': round((self.plan.issued - issued_before) * self.service.cost_per_call, 4),
+            'api_time': round(api_time, 3),
+            'processing_time': round(time.monotonic() - process_start, 3),
+            'new_results': len(self.in_radius) - results_before,
+            'total_results': len(self.in_radius),
+            'covered_results': covered_results,
+        }
+        self.rings.append(ring)
+        if self.on_ring is not None:
+            self.on_ring(dict(ring))
+
+        if self.stop_reason is None:
+            if self.covered >= self.radius:
+                self.stop_reason = 'max_radius'
+            elif covered_results >= self.target_results:
+                self.stop_reason = 'target_reached'
+
+    def _has_next_ring(self) -> bool:
+        return self.stop_reason is None and self._open_candidates() > 0
+
+    def _open_candidates(self) -> int:
+        return sum(1 for state in self._frontier.values() if state['open'])
+
+    def _wait_ring(self, futures) -> set:
+        """ring의 호출이 모두 끝나거나, deadline이 지나거나, 취소될 때까지 기다린다 - 끝나지 않은 future 집합"""
+        if self.plan.cancel is None:
+            return wait(futures, timeout=max(0.0, self.deadline_at - time.monotonic()), return_when=ALL_COMPLETED).not_done
+        not_done = set(futures)
+        while not_done and not self._cancelled():
+            remaining = self.deadline_at - time.monotonic()
+            if remaining <= 0:
+                break
+            wait(self._waitable(not_done), timeout=remaining, return_when=FIRST_COMPLETED)
+            not_done = {future for future in not_done if not future.done()}
+        return not_done
+
+    def _finish_rings(self, candidates: list) -> list:
+        for candidate in candidates:
+            if candidate.kind != 'type' or candidate.status == 'index' or not candidate.pages:
+                continue
+            # 끝까지 받은 후보는 radius 전체, 중간에 멈춘 후보는 가장 먼 장소 1m 안쪽까지가 빠짐없는 원이다
+            # (가장 먼 장소와 같은 거리의 장소가 다음 페이지에 더 있을 수 있다)
+            state = self._frontier.get(candidate)
+            reach = self.radius if state is None else min(state['farthest'], self.radius) - 1
+            if reach <= 0:
+                continue
+            results = [
+                result for result in candidate.results
+                if self._distances.get(result.get('place_id'), float('inf')) <= reach
+            ]
+            self.service.place_index.add(candidate.params['type'], self.latlng, reach, results, True)
+        for candidate in self._frontier:
+            if candidate.status in ('pending', 'waiting'):
+                candidate.status = f'stopped_{self.stop_reason}' if self.stop_reason else 'stopped'
+        if candidates and not self.rings and not self._frontier:
+            self.covered = float(self.radius)  # 모든 후보가 로컬 인덱스에서 응답
+        self.stop_reason = self.stop_reason or 'exhausted'
+        return [place for place in self.merger.results() if place['place_id'] in self.in_radius]
+
+    def run(self, candidates: list) -> list:
+        """Expand ring by ring on a worker pool; returns merged places inside the radius"""
+        self._seed_rings(candidates)
+        executor = ThreadPoolExecutor(max_workers=max(1, self.max_workers), thread_name_prefix='planner')
+        try:
+            while self._has_next_ring():
+                if self._cancelled():
+                    self._stop_cancelled(self._open_candidates(), [])
+                    break
+                units = self._ring_units()
+                if not units:
+                    break
+                ring_start, issued_before = time.monotonic(), self.plan.issued
+                futures = {
+                    executor.submit(self._fetch_page, candidate, page, page_token): candidate
+                    for candidate, page, page_token in units
+                }
+                not_done = self._wait_ring(futures)
+                if self._cancelled():
+                    self._stop_cancelled(self._open_candidates(), [futures[future] for future in not_done])
+                    break
+                if not_done:
+                    self._abandon(futures[future] for future in not_done)
+                api_time = time.monotonic() - ring_start
+                responses = {
+                    futures[future]: future.result() for future in futures
+                    if future not in not_done and future.exception() is None
+                }
+                self._close_ring(units, responses, api_time, issued_before)
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+        return self._finish_rings(candidates)
+
+    async def run_async(self, candidates: list, request_page) -> list:
+        """Async variant of run - a ring's pages are event-loop tasks, cancelled at the deadline or with the request"""
+        self._seed_rings(candidates)
+        while self._has_next_ring():
+            if self._cancelled():
+                self._stop_cancelled(self._open_candidates(), [])
+                break
+            units = self._ring_units()
+            if not units:
+                break
+            ring_start, issued_before = time.monotonic(), self.plan.issued
+            tasks = {
+                asyncio.ensure_future(self._fetch_page_async(request_page, candidate, page, page_token)): candidate
+                for candidate, page, page_token in units
+            }
+            try:
+                done, not_done = await asyncio.wait(tasks, timeout=max(0.0, self.deadline_at - time.monotonic()))
+            except asyncio.CancelledError:
+                self._stop_cancelled(self._open_candidates(), list(tasks.values()))
+                for task in tasks:
+                    task.cancel()
+                raise
+            if not_done:
+                self._abandon(tasks[task] for task in not_done)
+                for task in not_done:
+                    task.cancel()
+            api_time = time.monotonic() - ring_start
+            responses = {
+                tasks[task]: task.result() for task in done
+                if not task.cancelled() and task.exception() is None
+            }
+            self._close_ring(units, responses, api_time, issued_before)
+
+        return self._finish_rings(candidates)
+
+    def report(self, candidates: list, elapsed: float) -> dict:
+        return {
+            **super().report(candidates, elapsed),
+            'mode': 'progressive',
+            'max_radius': self.radius,
+            'covered_radius': int(self.covered),
+            'rings': self.rings,
+        }
@@ -0,0 +1,161 @@
+import asyncio
+import threading
+import time
+
+from metrics import metrics
+
+# OVER_QUERY_LIMIT을 받았을 때 버킷을 비우고 다시 시도하는 횟수
+OVER_QUERY_LIMIT_RETRIES = 2
+
+metrics.counter('rate_limit_total', 'Rate limiter decisions, by api and outcome (immediate / queued / rejected / denied / over_query_limit)')
+
+
+class RateLimitExceeded(Exception):
+    """The call would have to queue longer than the bucket's max_wait"""
+
+    def __init__(self, name: str, wait: float):
+        super().__init__(f'{name} rate limit: would wait {wait:.2f}s')
+        self.name = name
+        self.wait = wait
+
+
+def is_over_query_limit(error) -> bool:
+    return getattr(error, 'status', None) == 'OVER_QUERY_LIMIT'
+
+
+class TokenBucket:
+    """Token-bucket rate limiter shared by every thread and coroutine calling one API
+
+    rate(초당 토큰)로 채워지고 burst개까지 쌓인다. 토큰이 없으면 호출마다 다음 토큰을 미리 예약하고
+    (잔량이 음수 = 대기열) 예약된 시각까지 기다리므로 먼저 온 호출이 먼저 나간다.
+    대기가 max_wait를 넘게 되는 호출은 기다리지 않고 RateLimitExceeded로 바로 실패한다.
+    lock은 예약 계산 동안만 잡고 대기는 lock 밖에서 하므로 스레드(acquire)와 이벤트 루프(acquire_async)가 같은 버킷을 쓸 수 있다.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int, max_wait: float = 5.0):
+        if rate <= 0 or burst < 1:
+            raise ValueError(f'{name}: rate must be positive and burst at least 1')
+        self.name = name
+        self.rate = float(rate)
+        self.burst = int(burst)
+        self.max_wait = max_wait
+
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+        self.acquired = 0
+        self.queued = 0
+        self.rejected = 0
+        self.over_query_limit = 0
+        self.total_wait = 0.0
+        self.max_observed_wait = 0.0
+
+    def _reserve(self) -> float:
+        """토큰 하나를 예약하고 기다려야 할 시간(초)을 돌려준다"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = 0.0 if self._tokens >= 1 else (1 - self._tokens) / self.rate
+            if wait > self.max_wait:
+                self.rejected += 1
+                outcome = 'rejected'
+            else:
+                self._tokens -= 1
+                self.acquired += 1
+                outcome = 'queued' if wait > 0 else 'immediate'
+                if wait > 0:
+                    self.queued += 1
+                    self.total_wait += wait
+                    self.max_observed_wait = max(self.max_observed_wait, wait)
+        metrics.inc('rate_limit_total', api=self.name, outcome=outcome)
+        if outcome == 'rejected':
+            raise RateLimitExceeded(self.name, wait)
+        return wait
+
+    def try_acquire(self) -> bool:
+        """Take a token only if one is available right now (대기열에 서지 않는다 - 없으면 보내지 않아도 되는 hedge용)"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                outcome = 'denied'
+            else:
+                self._tokens -= 1
+                self.acquired += 1
+                outcome = 'immediate'
+        metrics.inc('rate_limit_total', api=self.name, outcome=outcome)
+        return outcome == 'immediate'
+
+    def _observe(self, wait: float, trace=None):
+        metrics.observe('stage_seconds', wait, stage='rate_limit_wait', api=self.name)
+        if trace is not None:
+            trace.record('rate_limit_wait', wait)
+
+    def acquire(self, trace=None, cancel=None) -> float:
+        """Block until a token is available; returns the seconds waited
+
+        cancel(CancelToken)이 주어지면 대기 중 취소되거나 대기가 마감을 넘길 때 SearchCancelled.
+        """
+        wait = self._reserve()
+        if wait > 0:
+            if cancel is not None:
+                cancel.sleep(wait)
+            else:
+                time.sleep(wait)
+            self._observe(wait, trace)
+        return wait
+
+    async def acquire_async(self, trace=None) -> float:
+        """Async variant of acquire (asyncio.sleep)"""
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+            self._observe(wait, trace)
+        return wait
+
+    def penalize(self, seconds: float = 1.0):
+        """API가 OVER_QUERY_LIMIT을 돌려줬을 때 - 남은 토큰을 비우고 seconds 동안 새 토큰을 내주지 않는다"""
+        with self._lock:
+            self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+            self.over_query_limit += 1
+        metrics.inc('rate_limit_total', api=self.name, outcome='over_query_limit')
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'qps': self.rate,
+                'burst': self.burst,
+                'acquired': self.acquired,
+                'queued': self.queued,
+                'rejected': self.rejected,
+                'over_query_limit': self.over_query_limit,
+                'avg_wait': round(self.total_wait / self.queued, 4) if self.queued else 0.0,
+                'max_wait': round(self.max_observed_wait, 4),
+            }
+
+
+def call_with_limit(bucket: TokenBucket, fn, trace=None, retries: int = OVER_QUERY_LIMIT_RETRIES, cancel=None):
+    """fn()을 버킷 토큰을 받은 뒤 호출하고, OVER_QUERY_LIMIT이면 버킷을 비운 뒤 다시 시도한다"""
+    for attempt in range(retries + 1):
+        bucket.acquire(trace, cancel)
+        try:
+            return fn()
+        except Exception as e:
+            if not is_over_query_limit(e) or attempt == retries:
+                raise
+            bucket.penalize()
+
+
+async def call_with_limit_async(bucket: TokenBucket, fn, trace=None, retries: int = OVER_QUERY_LIMIT_RETRIES):
+    """Async variant of call_with_limit - fn은 coroutine function"""
+    for attempt in range(retries + 1):
+        await bucket.acquire_async(trace)
+        try:
+            return await fn()
+        except Exception as e:
+            if not is_over_query_limit(e) or attempt == retries:
+                raise
+            bucket.penalize()
@@ -0,0 +1,163 @@
+"""Server-held search result sets, field selection and compact response encoding
+
+/search는 첫 페이지만 돌려주고 전체 결과는 ResultStore에 cursor로 보관한다.
+나머지 페이지는 GET /search/results?cursor=...로 필요할 때 가져간다.
+응답 본문은 orjson(설치돼 있으면)으로 인코딩하고 Accept-Encoding에 따라 brotli/gzip으로 압축한다.
+"""
+import gzip
+import json
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import orjson
+except ImportError:  # 표준 json으로 대신한다
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # gzip만 쓴다
+    brotli = None
+
+# 응답 장소 레코드에서 고를 수 있는 필드 (fields 파라미터)
+PLACE_FIELDS = (
+    'place_id', 'name', 'lat', 'lng', 'rating', 'address', 'distance', 'types', 'price_level',
+    'search_term', 'search_type', 'search_radius', 'distance_meters',
+)
+COMPRESS_MIN_BYTES = 1024  # 이보다 작은 본문은 압축하지 않는다
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5  # 0-11, 실시간 응답용으로 속도 쪽에 둔다
+
+
+class ResultStore:
+    """In-process, TTL-bounded store of search result sets addressed by cursors
+
+    put()이 결과 목록을 보관하고 result_id를 돌려주며, cursor는 "result_id.offset" 형태다.
+    max_entries를 넘으면 가장 오래 쓰이지 않은 결과부터 버리고, ttl_seconds가 지난 결과는 만료된다.
+    결과 목록은 보관 후 수정하지 않는다 (페이지는 원본 레코드를 참조).
+    """
+
+    def __init__(self, ttl_seconds: float = 600, max_entries: int = 1000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._results = OrderedDict()  # result_id -> (places, stored_at)
+        self._lock = threading.Lock()
+
+        self.stored = 0
+        self.pages_served = 0
+        self.expired = 0
+        self.evictions = 0
+
+    def put(self, places: list) -> str:
+        result_id = secrets.token_urlsafe(12)
+        with self._lock:
+            self._results[result_id] = (places, time.time())
+            self.stored += 1
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+                self.evictions += 1
+        return result_id
+
+    def page(self, cursor: str, limit: int):
+        """Return (places, next_cursor or None, total) for a cursor, or None if it is unknown or expired
+
+        잘못된 형식의 cursor는 ValueError.
+        """
+        result_id, _, offset = cursor.rpartition('.')
+        if not result_id or not offset.isdigit():
+            raise ValueError('malformed cursor')
+        offset = int(offset)
+        with self._lock:
+            entry = self._results.get(result_id)
+            if entry is None:
+                return None
+            places, stored_at = entry
+            if time.time() - stored_at > self.ttl_seconds:
+                del self._results[result_id]
+                self.expired += 1
+                return None
+            self._results.move_to_end(result_id)
+            self.pages_served += 1
+        end = offset + limit
+        next_cursor = f'{result_id}.{end}' if end < len(places) else None
+        return places[offset:end], next_cursor, len(places)
+
+    def first_page(self, places: list, limit: int) -> tuple:
+        """(첫 페이지, next_cursor 또는 None) - 한 페이지에 다 들어가면 보관하지 않는다"""
+        if len(places) <= limit:
+            return places, None
+        return places[:limit], f'{self.put(places)}.{limit}'
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'entries': len(self._results),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl_seconds,
+                'stored': self.stored,
+                'pages_served': self.pages_served,
+                'expired': self.expired,
+                'evictions': self.evictions,
+            }
+
+
+def parse_fields(value) -> tuple:
+    """fields 파라미터("name,lat,lng" 또는 목록) → 필드 튜플 (없으면 None = 전체). 모르는 필드는 ValueError"""
+    if value is None or value == '':
+        return None
+    names = value.split(',') if isinstance(value, str) else list(value)
+    fields = tuple(dict.fromkeys(str(name).strip() for name in names if str(name).strip()))
+    unknown = [name for name in fields if name not in PLACE_FIELDS]
+    if unknown:
+        raise ValueError(f"unknown field(s): {', '.join(unknown)}")
+    return fields or None
+
+
+def select_fields(places: list, fields: tuple) -> list:
+    if fields is None:
+        return places
+    return [{name: place[name] for name in fields if name in place} for place in places]
+
+
+def _default(value):
+    # numpy 스칼라 등 JSON 기본 타입이 아닌 숫자
+    if hasattr(value, 'item'):
+        return value.item()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def encode_json(payload) -> bytes:
+    """UTF-8 JSON bytes (orjson이 있으면 orjson, 없으면 공백 없는 json.dumps)"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default, option=orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':'), default=_default).encode('utf-8')
+
+
+def _accepts(accept_encoding: str, coding: str) -> bool:
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        if name.strip().lower() == coding:
+            return params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000')
+    return False
+
+
+def compress_body(body: bytes, accept_encoding: str) -> tuple:
+    """Accept-Encoding에 맞춰 압축 - (body, content-encoding 또는 None). brotli > gzip 순으로 고른다"""
+    if len(body) < COMPRESS_MIN_BYTES:
+        return body, None
+    if brotli is not None and _accepts(accept_encoding, 'br'):
+        return brotli.compress(body, quality=BROTLI_QUALITY), 'br'
+    if _accepts(accept_encoding, 'gzip'):
+        return gzip.compress(body, compresslevel=GZIP_LEVEL), 'gzip'
+    return body, None
+
+
+def wire_sizes(payload) -> dict:
+    """응답 하나의 인코딩/압축별 바이트 수 (벤치마크용)"""
+    body = encode_json(payload)
+    sizes = {'raw': len(body), 'gzip': len(gzip.compress(body, compresslevel=GZIP_LEVEL))}
+    if brotli is not None:
+        sizes['br'] = len(brotli.compress(body, quality=BROTLI_QUALITY))
+    return sizes
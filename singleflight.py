@@ -0,0 +1,137 @@
+import asyncio
+import concurrent.futures
+import threading
+from concurrent.futures import Future, FIRST_COMPLETED, wait
+
+from cancellation import SearchCancelled
+from metrics import metrics
+
+metrics.counter('singleflight_total', 'Coalesced call outcomes, by group and role (leader / follower / timeout)')
+
+
+class SingleFlight:
+    """Coalesce concurrent identical calls across requests
+
+    같은 key로 동시에 들어온 호출 중 처음 것(leader)만 fn()을 실행하고, 나머지(follower)는
+    leader의 Future를 기다려 같은 결과(또는 같은 예외)를 받는다. 결과를 저장하지는 않으므로
+    leader가 끝난 뒤 들어온 호출은 다시 실행된다 (캐시가 아니라 in-flight 합치기).
+    follower는 각자의 timeout까지만 기다리고, 넘기면 leader를 기다리지 않고 직접 실행한다.
+    leader의 요청이 취소되면(SearchCancelled / CancelledError) follower는 각자 직접 실행한다.
+    do()에 cancel(CancelToken)을 주면 follower는 기다리는 중에 자기 요청이 취소될 때 바로 SearchCancelled를 올린다.
+    follower가 받는 결과는 leader와 같은 객체이므로 수정하려면 복사해서 써야 한다.
+    do_async는 같은 이벤트 루프 안의 coroutine 호출끼리 합친다 (스레드 쪽 do와는 따로 관리).
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = {}  # key -> Future
+        self._async_calls = {}  # key -> asyncio.Future
+        self._lock = threading.Lock()
+
+        self.leaders = 0
+        self.followers = 0
+        self.timeouts = 0
+
+    def do(self, key, fn, timeout: float = None, cancel=None) -> tuple:
+        """Return (result, shared) - shared는 다른 호출의 결과를 받아 왔는지 여부"""
+        with self._lock:
+            future = self._calls.get(key)
+            if future is None:
+                future = Future()
+                self._calls[key] = future
+                self.leaders += 1
+                leader = True
+            else:
+                self.followers += 1
+                leader = False
+
+        if leader:
+            metrics.inc('singleflight_total', group=self.name, role='leader')
+            try:
+                result = fn()
+            except SearchCancelled:
+                future.cancel()
+                raise
+            except BaseException as e:
+                future.set_exception(e)
+                raise
+            else:
+                future.set_result(result)
+                return result, False
+            finally:
+                with self._lock:
+                    if self._calls.get(key) is future:
+                        del self._calls[key]
+
+        metrics.inc('singleflight_total', group=self.name, role='follower')
+        try:
+            if cancel is not None:
+                wait([future, cancel.signal], timeout=timeout, return_when=FIRST_COMPLETED)
+                cancel.check()
+                timeout = 0
+            return future.result(timeout=timeout), True
+        except concurrent.futures.TimeoutError:
+            # leader가 너무 오래 걸리면 기다리지 않고 직접 실행
+            with self._lock:
+                self.timeouts += 1
+            metrics.inc('singleflight_total', group=self.name, role='timeout')
+            return fn(), False
+        except concurrent.futures.CancelledError:
+            # leader의 요청만 취소된 경우 - 이 호출은 직접 실행
+            return fn(), False
+
+    async def do_async(self, key, fn, timeout: float = None) -> tuple:
+        """Async variant of do - fn is a coroutine function; returns (result, shared)"""
+        with self._lock:
+            future = self._async_calls.get(key)
+            if future is None:
+                future = asyncio.get_running_loop().create_future()
+                self._async_calls[key] = future
+                self.leaders += 1
+                leader = True
+            else:
+                self.followers += 1
+                leader = False
+
+        if leader:
+            metrics.inc('singleflight_total', group=self.name, role='leader')
+            try:
+                result = await fn()
+            except (asyncio.CancelledError, SearchCancelled):
+                # 이 요청만의 취소를 follower에게 넘기지 않는다 - follower는 직접 실행
+                future.cancel()
+                raise
+            except BaseException as e:
+                future.set_exception(e)
+                future.exception()  # follower가 없어도 "never retrieved" 경고를 내지 않도록
+                raise
+            else:
+                future.set_result(result)
+                return result, False
+            finally:
+                with self._lock:
+                    if self._async_calls.get(key) is future:
+                        del self._async_calls[key]
+
+        metrics.inc('singleflight_total', group=self.name, role='follower')
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), timeout), True
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            metrics.inc('singleflight_total', group=self.name, role='timeout')
+            return await fn(), False
+        except asyncio.CancelledError:
+            # 이 호출 자체가 취소된 경우는 그대로 올리고, leader만 취소된 경우는 직접 실행
+            if not future.cancelled() or asyncio.current_task().cancelling():
+                raise
+            return await fn(), False
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'leaders': self.leaders,
+                'followers': self.followers,
+                'timeouts': self.timeouts,
+                'in_flight': len(self._calls) + len(self._async_calls),
+            }
@@ -0,0 +1,101 @@
+import asyncio
+
+from metrics import metrics
+
+metrics.counter('speculative_calls_total', 'Speculative first-page Places calls, by outcome (used / wasted / free / cancelled)')
+
+
+class SpeculativeWave:
+    """First-page Places type searches issued while the LLM is still generating keywords
+
+    LLM이 어떤 place_type을 고를지 알기 전에 자주 나오는 type의 1페이지를 요청 QueryPlan으로 미리 호출한다.
+    같은 플랜을 쓰므로 LLM 이후 쿼리 플래너가 같은 호출을 하면 메모된 응답(또는 진행 중인 호출)을 그대로 받는다.
+    resolve(candidates)는 LLM 결과로 만든 후보와 맞지 않는 호출을 취소하고 (스레드 경로는 아직 시작 전인 것만,
+    async 경로는 진행 중인 것도), report()는 플랜 실행이 끝난 뒤 재사용/낭비 호출과 낭비 비용을 센다.
+    """
+
+    ENDPOINT = 'nearby'
+
+    def __init__(self, plan, place_types: list, latlng: tuple, radius: int, place_index=None):
+        self.plan = plan
+        self.place_types = [
+            place_type for place_type in place_types
+            # 로컬 인덱스가 이미 덮는 type은 플래너가 API 없이 응답하므로 추측할 필요가 없다
+            if place_index is None or not place_index.covers(place_type, latlng, radius)
+        ]
+        self.latlng = latlng
+        self.radius = radius
+        self.calls = {}  # place_type -> {'key', 'future', 'status'}
+
+    def _params(self, place_type: str) -> dict:
+        # build_candidates의 type 후보와 같은 파라미터여야 같은 호출로 합쳐진다
+        return {'location': self.latlng, 'radius': self.radius, 'type': place_type}
+
+    def start(self, executor, request_page):
+        """Submit the wave to a thread pool; request_page(plan, endpoint, params, page)"""
+        for place_type in self.place_types:
+            params = self._params(place_type)
+            key = self.plan.mark_speculative(self.ENDPOINT, params, 1)
+            future = executor.submit(request_page, self.plan, self.ENDPOINT, params, 1)
+            self.calls[place_type] = {'key': key, 'future': future, 'status': 'running'}
+
+    def start_async(self, request_page):
+        """Start the wave as event-loop tasks; request_page is a coroutine function"""
+        for place_type in self.place_types:
+            params = self._params(place_type)
+            key = self.plan.mark_speculative(self.ENDPOINT, params, 1)
+            task = asyncio.ensure_future(request_page(self.plan, self.ENDPOINT, params, 1))
+            task.add_done_callback(_consume_exception)
+            self.calls[place_type] = {'key': key, 'future': task, 'status': 'running'}
+
+    def resolve(self, candidates: list):
+        """Keep the calls the plan will need and cancel the rest (LLM 결과가 나온 직후 호출)"""
+        needed = {self.plan.key(candidate.endpoint, candidate.params, 1) for candidate in candidates}
+        for call in self.calls.values():
+            future = call['future']
+            if call['key'] in needed and not future.cancelled():
+                if not isinstance(future, asyncio.Future) and future.cancel():
+                    # 스레드 풀에서 아직 시작도 못 했으면 플래너가 직접 호출하게 둔다
+                    call['status'] = 'cancelled'
+                    self.plan.unmark_speculative(call['key'])
+                else:
+                    call['status'] = 'kept'
+                continue
+            if future.done():
+                call['status'] = 'discarded'
+            elif future.cancel():
+                call['status'] = 'cancelled'
+                self.plan.unmark_speculative(call['key'])
+            else:
+                # 이미 진행 중인 스레드 호출은 멈출 수 없으므로 끝나게 두고 결과만 버린다
+                call['status'] = 'discarded'
+
+    def report(self, cost_per_call: float) -> dict:
+        """플랜 실행이 끝난 뒤 - 재사용된 호출과 버려진 유료 호출을 센다"""
+        outcomes = {'used': 0, 'wasted': 0, 'free': 0, 'cancelled': 0}
+        for call in self.calls.values():
+            if call['status'] == 'cancelled':
+                outcome = 'cancelled'
+            elif not call['future'].done():
+                # 버렸지만 멈출 수 없어 아직 진행 중인 호출 - 과금된다고 본다
+                outcome = 'wasted'
+            else:
+                reused, billed = self.plan.speculative_outcome(call['key'])
+                # 재사용되지 않았지만 캐시/다른 요청에서 받아 과금되지 않은 호출은 free
+                outcome = 'used' if reused else ('wasted' if billed else 'free')
+            call['outcome'] = outcome
+            outcomes[outcome] += 1
+            metrics.inc('speculative_calls_total', outcome=outcome)
+        return {
+            'place_types': list(self.calls),
+            'started': len(self.calls),
+            **outcomes,
+            'wasted_cost_usd': round(outcomes['wasted'] * cost_per_call, 4),
+            'calls': {place_type: call['outcome'] for place_type, call in self.calls.items()},
+        }
+
+
+def _consume_exception(future):
+    # 추측 호출의 실패는 플래너가 같은 호출을 할 때 다시 드러나므로 여기서는 "never retrieved" 경고만 막는다
+    if not future.cancelled():
+        future.exception()
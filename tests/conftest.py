@@ -0,0 +1,72 @@
+"""Offline test setup - fake Maps / Vertex backends from benchmarks/fakes.py, caches in a temp directory"""
+import json
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+# flask_app / ultra_search import 전에 - 프리웜을 끄고 캐시를 임시 디렉터리로 격리
+os.environ.setdefault('GOOGLE_CLOUD_PROJECT', 'AIzaOfflineTests')  # googlemaps.Client 키 형식 검사용
+os.environ['VERTEX_PREWARM'] = '0'
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+os.environ['ULTRA_CACHE_DIR'] = tempfile.mkdtemp(prefix='ultra-tests-')
+os.environ['PLACES_CACHE_TTL'] = '0'
+
+CORPUS = os.path.join(ROOT, 'benchmarks', 'fixtures', 'queries.json')
+
+
+@pytest.fixture(scope='session')
+def corpus():
+    with open(CORPUS, encoding='utf-8') as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def keyword_caches():
+    """키워드 메모리/디스크 캐시와 퍼지 인덱스를 비운 채로 테스트를 시작한다"""
+    import ultra_search
+
+    def clear():
+        ultra_search._keyword_memory_cache.clear()
+        ultra_search._get_keyword_disk_cache().clear()
+        ultra_search._get_keyword_index().clear()
+
+    clear()
+    yield ultra_search
+    clear()
+
+
+@pytest.fixture
+def llm(corpus, keyword_caches):
+    """코퍼스 응답을 지연 없이 돌려주는 FakeGenerativeModel을 설치한다"""
+    from fakes import FakeGenerativeModel
+
+    responses = {query['korean_text']: query['keywords'] for query in corpus['queries'] if query.get('keywords')}
+    model = FakeGenerativeModel(responses, latency=0.0)
+    keyword_caches.vertex_client.use(model)
+    return model
+
+
+@pytest.fixture
+def gmaps(corpus):
+    from fakes import FakeGmapsClient
+
+    geocodes = {location: tuple(latlng) for location, latlng in corpus.get('geocode', {}).items()}
+    return FakeGmapsClient(latency=0.001, geocode_latency=0.0, token_delay=0.01, geocodes=geocodes)
+
+
+@pytest.fixture
+def service(gmaps, llm):
+    """빠른 가짜 백엔드에 물린 UltraSearchService (페이지 토큰 폴링 간격도 줄인다)"""
+    import flask_app
+
+    service = flask_app.UltraSearchService(gmaps_client=gmaps)
+    poller = service.page_poller
+    poller.initial_delay = poller.retry_delay = poller.min_delay = 0.005
+    poller.max_delay = 0.05
+    return service
@@ -0,0 +1,75 @@
+import pytest
+
+COFFEE = '커피 한 잔 하고 싶어'
+RAMEN = '라멘 맛집'
+TOKYO = '35.6812,139.7671'
+
+
+def test_failed_geocode_only_fails_its_own_query(service, gmaps):
+    geocode = gmaps._geocode
+    gmaps._geocode = lambda address: [] if address == 'Atlantis' else geocode(address)
+
+    results, summary = service.search_batch([
+        {'korean_text': COFFEE, 'location': TOKYO, 'radius': 500},
+        {'korean_text': RAMEN, 'location': 'Atlantis', 'radius': 500},
+    ])
+
+    assert 'error' not in results[0]
+    assert results[0]['total_results'] > 0
+    assert '지오코딩' in results[1]['error']
+    assert results[1]['places'] == []
+    assert summary['queries'] == 2
+
+
+def test_failed_keyword_fallback_only_fails_its_own_query(service, keyword_caches, monkeypatch):
+    generate = keyword_caches._generate_keywords
+
+    def generate_or_fail(text, *args, **kwargs):
+        if text == RAMEN:
+            raise RuntimeError('vertex unavailable')
+        return generate(text, *args, **kwargs)
+
+    # 배치 LLM 요청이 아무 결과도 못 받아 입력마다 단건 보완으로 넘어가는 상황
+    monkeypatch.setattr(keyword_caches, '_generate_keywords_batch', lambda chunk: {})
+    monkeypatch.setattr(keyword_caches, '_generate_keywords', generate_or_fail)
+
+    results, summary = service.search_batch([
+        {'korean_text': COFFEE, 'location': TOKYO, 'radius': 500},
+        {'korean_text': RAMEN, 'location': TOKYO, 'radius': 500},
+    ])
+
+    assert results[0]['total_results'] > 0
+    assert results[1]['error'].startswith('키워드 생성 실패')
+    assert summary['llm']['fallback_requests'] == 2
+    # 실패한 결과는 캐시되지 않는다
+    assert keyword_caches._lookup_cached_keywords(RAMEN, 0.0) is None
+
+
+def test_identical_places_calls_are_issued_once_per_batch(service, gmaps):
+    item = {'korean_text': COFFEE, 'location': TOKYO, 'radius': 500}
+
+    results, summary = service.search_batch([dict(item), dict(item)])
+
+    assert summary['distinct_sub_searches'] * 2 == summary['sub_searches']
+    assert summary['deduplicated_api_calls'] + summary['place_index']['request_hits'] > 0
+    assert summary['api_calls'] == gmaps.calls['nearby'] + gmaps.calls['text']
+    assert results[0]['total_results'] > 0 and results[1]['total_results'] > 0
+
+
+@pytest.mark.parametrize('query', [
+    'not an object',
+    42,
+    None,
+    {'location': TOKYO},
+    {'korean_text': COFFEE, 'radius': 'far'},
+    {'korean_text': COFFEE, 'radius': 0},
+    {'korean_text': COFFEE, 'location': {'lat': 35.68, 'lng': 139.76}},
+])
+def test_route_rejects_invalid_query_with_its_index(query):
+    import flask_app
+
+    client = flask_app.app.test_client()
+    response = client.post('/search/batch', json={'queries': [{'korean_text': COFFEE}, query]})
+
+    assert response.status_code == 400
+    assert response.json['index'] == 1
@@ -0,0 +1,140 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from cancellation import CancelRegistry, CancelToken, SearchCancelled
+from singleflight import SingleFlight
+
+
+def test_cancel_takes_effect_once():
+    token = CancelToken()
+    reasons = []
+    token.add_callback(reasons.append)
+
+    assert token.cancel('client_cancel')
+    assert not token.cancel('superseded')
+    assert reasons == ['client_cancel']
+    with pytest.raises(SearchCancelled) as error:
+        token.check('places')
+    assert error.value.reason == 'client_cancel'
+    assert token.saved_calls == {'places': 1}
+
+
+def test_sleep_wakes_on_cancel():
+    token = CancelToken()
+    threading.Timer(0.05, token.cancel).start()
+
+    start = time.monotonic()
+    with pytest.raises(SearchCancelled):
+        token.sleep(2)
+    assert time.monotonic() - start < 1
+
+
+def test_sleep_past_the_deadline_is_skipped():
+    token = CancelToken(time.monotonic() + 0.05)
+
+    start = time.monotonic()
+    with pytest.raises(SearchCancelled) as error:
+        token.sleep(1)
+    assert error.value.reason == 'deadline'
+    assert time.monotonic() - start < 0.05
+
+
+def test_wait_returns_the_result_or_stops_at_the_deadline():
+    token = CancelToken(time.monotonic() + 0.05)
+    done = Future()
+    done.set_result('keywords')
+
+    assert token.wait(done) == 'keywords'
+    with pytest.raises(SearchCancelled) as error:
+        token.wait(Future())
+    assert error.value.reason == 'deadline'
+
+
+def test_bound_only_moves_the_deadline_earlier():
+    token = CancelToken(100.0)
+    token.bound(200.0)
+    assert token.deadline_at == 100.0
+    token.bound(50.0)
+    assert token.deadline_at == 50.0
+
+
+def test_registry_supersedes_and_releases():
+    registry = CancelRegistry()
+    first = registry.register('tab-1')
+    second = registry.register('tab-1')
+
+    assert first.reason == 'superseded'
+    registry.release('tab-1', first)  # 이미 교체된 토큰은 새 토큰을 지우지 않는다
+    assert registry.cancel('tab-1')
+    assert second.reason == 'client_cancel'
+    registry.release('tab-1', second)
+    assert len(registry) == 0
+    assert not registry.cancel('tab-1')
+
+
+def test_cancelled_follower_stops_waiting_for_the_leader():
+    flight = SingleFlight('test')
+    release = threading.Event()
+    leader = threading.Thread(target=lambda: flight.do('k', lambda: release.wait(2)))
+    leader.start()
+    while not flight.stats()['in_flight']:
+        time.sleep(0.001)
+    token = CancelToken()
+    threading.Timer(0.05, token.cancel).start()
+
+    start = time.monotonic()
+    with pytest.raises(SearchCancelled):
+        flight.do('k', lambda: 'own', cancel=token)
+    assert time.monotonic() - start < 1
+    release.set()
+    leader.join()
+
+
+def test_cancelled_leader_does_not_cancel_its_follower():
+    flight = SingleFlight('test')
+    started = threading.Event()
+    follower = {}
+
+    def cancelled_leader():
+        started.set()
+        time.sleep(0.05)
+        raise SearchCancelled('client_cancel')
+
+    def follow():
+        started.wait(1)
+        follower['value'] = flight.do('k', lambda: 'own')
+
+    thread = threading.Thread(target=follow)
+    thread.start()
+    with pytest.raises(SearchCancelled):
+        flight.do('k', cancelled_leader)
+    thread.join()
+
+    assert follower['value'] == ('own', False)
+    assert flight.stats()['followers'] == 1
+
+
+def test_cancelled_async_leader_does_not_cancel_its_follower():
+    flight = SingleFlight('test')
+
+    async def cancelled_leader():
+        await asyncio.sleep(0.05)
+        raise SearchCancelled('client_disconnect')
+
+    async def own():
+        return 'own'
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do_async('k', cancelled_leader))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do_async('k', own))
+        with pytest.raises(SearchCancelled):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == ('own', False)
+    assert flight.stats()['followers'] == 1
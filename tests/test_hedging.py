@@ -0,0 +1,88 @@
+import time
+
+import pytest
+
+from cancellation import CancelToken
+from hedging import DeadlineExceeded, Hedger
+from query_plan import QueryPlan
+
+
+def slow_then_fast(first: float, rest: float = 0.0):
+    """첫 호출만 first초 걸리는 fn - hedge가 이기는 상황"""
+    calls = []
+
+    def fn():
+        calls.append(time.monotonic())
+        time.sleep(first if len(calls) == 1 else rest)
+        return len(calls)
+
+    return fn, calls
+
+
+def test_deadline_raises_when_no_attempt_answers():
+    hedger = Hedger('test', deadline=0.1, percentile=None)
+
+    start = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        hedger.call(lambda: time.sleep(0.5))
+
+    assert time.monotonic() - start < 0.4
+    assert hedger.stats()['deadline_exceeded'] == 1
+
+
+def test_slow_attempt_is_hedged_and_counted():
+    hedger = Hedger('test', deadline=2.0, initial_delay=0.05, min_delay=0.01)
+    fn, calls = slow_then_fast(0.5)
+    hedge_starts = []
+
+    assert hedger.call(fn, on_hedge=lambda: hedge_starts.append(1)) == 2
+
+    assert len(calls) == 2
+    assert hedge_starts == [1]
+    assert hedger.stats()['hedges'] == 1
+    assert hedger.stats()['hedge_wins'] == 1
+
+
+def test_cancelled_request_sends_no_hedge():
+    hedger = Hedger('test', deadline=2.0, initial_delay=0.05, min_delay=0.01)
+    fn, calls = slow_then_fast(0.2)
+    token = CancelToken()
+    token.cancel()
+
+    # 이미 나간 첫 시도는 끝까지 받는다
+    assert hedger.call(fn, cancel=token) == 1
+
+    assert len(calls) == 1
+    assert hedger.stats()['hedges'] == 0
+    assert token.saved_calls == {'test': 1}
+
+
+def test_hedge_not_admitted_is_not_sent():
+    hedger = Hedger('test', deadline=2.0, initial_delay=0.05, min_delay=0.01)
+    fn, calls = slow_then_fast(0.2)
+
+    assert hedger.call(fn, admit=lambda: False) == 1
+
+    assert len(calls) == 1
+    assert hedger.stats()['denied_hedges'] == 1
+
+
+def test_no_hedge_without_a_latency_tail():
+    hedger = Hedger('test', deadline=2.0, min_delay=0.001, min_samples=20, min_median_multiple=3.0)
+    for _ in range(20):
+        hedger._observe(0.01)
+    fn, calls = slow_then_fast(0.02)
+
+    # p95(0.01s)는 넘지만 p50의 3배(0.03s) 안이면 hedge하지 않는다
+    assert hedger.hedge_delay() == pytest.approx(0.03)
+    hedger.call(fn)
+
+    assert len(calls) == 1
+    assert hedger.stats()['hedges'] == 0
+
+
+def test_plan_hedge_slots_are_capped():
+    plan = QueryPlan()
+
+    assert [plan.admit_hedge(2) for _ in range(3)] == [True, True, False]
+    assert not QueryPlan().admit_hedge(0)
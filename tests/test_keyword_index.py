@@ -0,0 +1,39 @@
+import pytest
+
+from keyword_index import KeywordIndex, negation_markers
+
+QUIET_CAFE = {'place_types': ['cafe'], 'abstract_translation': ['静かなカフェ']}
+
+
+@pytest.fixture
+def index():
+    index = KeywordIndex(threshold=0.8)
+    index.add('조용한 카페', QUIET_CAFE)
+    return index
+
+
+@pytest.mark.parametrize('text', ['조용한 카페 추천', '조용한 카페에서', '조용한카페'])
+def test_near_duplicate_reuses_keywords(index, text):
+    value, similarity, matched = index.lookup(text)
+
+    assert value is QUIET_CAFE
+    assert similarity >= 0.8
+    assert matched == '조용한 카페'
+
+
+@pytest.mark.parametrize('text', ['조용한 카페 아닌 곳', '조용한 카페 말고', '안 조용한 카페', '조용하지 않은 카페'])
+def test_negated_query_does_not_reuse_keywords(index, text):
+    assert index.lookup(text)[0] is None
+
+
+def test_negated_entry_is_not_reused_for_plain_query():
+    index = KeywordIndex(threshold=0.8)
+    index.add('조용한 카페 아닌 곳', {'place_types': ['bar']})
+
+    assert index.lookup('조용한 카페')[0] is None
+    assert index.lookup('조용한 카페 아닌 데')[0] is not None
+
+
+def test_negation_tokens_inside_nouns_are_ignored():
+    assert negation_markers('안경점 근처') == frozenset()
+    assert negation_markers('커피 말고 차') == {'말고'}
@@ -0,0 +1,67 @@
+import pytest
+
+from pagination import PageTokenPoller
+
+
+class ApiError(Exception):
+    def __init__(self, status):
+        super().__init__(status)
+        self.status = status
+
+
+def not_ready_then(response, failures: int):
+    attempts = []
+
+    def request():
+        attempts.append(1)
+        if len(attempts) <= failures:
+            raise ApiError('INVALID_REQUEST')
+        return response
+
+    return request, attempts
+
+
+def test_retries_until_the_token_is_ready():
+    poller = PageTokenPoller(initial_delay=0.5, retry_delay=0.2, backoff=2.0, max_delay=1.0, jitter=0.0)
+    sleeps = []
+    request, attempts = not_ready_then('page 2', failures=3)
+
+    assert poller.fetch(request, sleep=sleeps.append) == 'page 2'
+
+    assert len(attempts) == 4
+    assert sleeps == pytest.approx([0.5, 0.2, 0.4, 0.8])
+    assert poller.stats()['retries'] == 3
+
+
+def test_other_errors_are_not_retried():
+    poller = PageTokenPoller(jitter=0.0)
+    attempts = []
+
+    def denied():
+        attempts.append(1)
+        raise ApiError('REQUEST_DENIED')
+
+    with pytest.raises(ApiError):
+        poller.fetch(denied, sleep=lambda seconds: None)
+
+    assert len(attempts) == 1
+    assert poller.stats()['failures'] == 1
+
+
+def test_gives_up_at_the_deadline():
+    poller = PageTokenPoller(initial_delay=0.01, retry_delay=0.02, max_delay=0.02, jitter=0.0, deadline=0.05)
+    request, attempts = not_ready_then('never', failures=1000)
+
+    with pytest.raises(ApiError):
+        poller.fetch(request)
+
+    assert len(attempts) < 10
+    assert poller.stats()['failures'] == 1
+
+
+def test_first_delay_follows_observed_activation_times():
+    poller = PageTokenPoller(initial_delay=2.0, min_delay=0.1, max_delay=3.0)
+    for _ in range(10):
+        poller._activation_times.append(1.0)
+
+    assert poller.first_delay() == pytest.approx(0.9)
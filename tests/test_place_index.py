@@ -0,0 +1,53 @@
+import place_index
+from place_index import NEARBY_RESULT_CAP, PlaceIndex
+
+TOKYO = (35.6812, 139.7671)
+
+
+def result(place_id: str, lat: float, lng: float) -> dict:
+    return {'place_id': place_id, 'name': place_id, 'geometry': {'location': {'lat': lat, 'lng': lng}}, 'types': ['cafe']}
+
+
+NEAR = result('near', 35.6815, 139.7671)  # 중심에서 약 33m
+FAR = result('far', 35.6850, 139.7671)  # 중심에서 약 420m
+
+
+def test_covered_query_is_answered_within_its_own_radius():
+    index = PlaceIndex()
+    index.add('cafe', TOKYO, 500, [NEAR, FAR])
+
+    assert index.lookup('cafe', TOKYO, 500) == [NEAR, FAR]
+    assert index.lookup('cafe', TOKYO, 100) == [NEAR]
+    assert index.lookup('restaurant', TOKYO, 100) is None
+    assert index.lookup('cafe', TOKYO, 600) is None  # 기록된 원 밖으로 나간다
+
+
+def test_truncated_results_are_only_reused_for_the_same_circle():
+    index = PlaceIndex()
+    results = [result(f'p{i}', TOKYO[0] + i * 1e-5, TOKYO[1]) for i in range(NEARBY_RESULT_CAP)]
+    index.add('cafe', TOKYO, 500, results)
+
+    assert index.lookup('cafe', TOKYO, 500) is not None
+    assert index.lookup('cafe', (TOKYO[0] + 0.001, TOKYO[1]), 100) is None
+
+
+def test_stale_coverage_is_dropped(monkeypatch):
+    index = PlaceIndex(ttl_seconds=60)
+    now = [1000.0]
+    monkeypatch.setattr(place_index.time, 'time', lambda: now[0])
+    index.add('cafe', TOKYO, 500, [NEAR])
+
+    now[0] += 61
+    assert index.lookup('cafe', TOKYO, 100) is None
+    assert index.stats()['stale'] == 1
+    assert index.stats()['places'] == 0
+
+
+def test_oldest_cell_is_evicted_with_its_places():
+    index = PlaceIndex(precision=6, max_cells=1)
+    index.add('cafe', TOKYO, 500, [NEAR])
+    index.add('cafe', (34.7025, 135.4959), 500, [result('osaka', 34.7026, 135.4959)])
+
+    assert index.lookup('cafe', TOKYO, 100) is None
+    assert index.stats()['evicted_cells'] == 1
+    assert index.stats()['places'] == 1
@@ -0,0 +1,93 @@
+import threading
+import time
+
+import pytest
+
+from query_plan import QueryPlan, canonical_places_key
+
+TOKYO = (35.68123, 139.76712)
+
+
+def test_key_ignores_page_token_and_rounds_location():
+    near = (35.681234, 139.767119)
+
+    assert canonical_places_key('nearby', {'location': TOKYO, 'radius': 500, 'type': 'cafe'}) == \
+        canonical_places_key('nearby', {'location': near, 'radius': '500', 'type': 'cafe', 'page_token': 'x'})
+    assert canonical_places_key('nearby', {'location': TOKYO, 'type': 'cafe'}, page=1) != \
+        canonical_places_key('nearby', {'location': TOKYO, 'type': 'cafe'}, page=2)
+    assert canonical_places_key('nearby', {'location': TOKYO, 'type': 'cafe'}) != \
+        canonical_places_key('text', {'location': TOKYO, 'query': 'cafe'})
+
+
+def test_identical_calls_are_issued_once():
+    plan = QueryPlan()
+    calls = []
+    params = {'location': TOKYO, 'radius': 500, 'type': 'cafe'}
+
+    def fetch():
+        calls.append(1)
+        plan.record_issued()
+        return {'results': [1]}
+
+    first = plan.execute('nearby', params, 1, fetch)
+    second = plan.execute('nearby', dict(params), 1, fetch)
+
+    assert first is second
+    assert calls == [1]
+    assert plan.stats()['issued_calls'] == 1
+    assert plan.stats()['deduplicated_calls'] == 1
+
+
+def test_concurrent_follower_waits_for_the_leader():
+    plan = QueryPlan()
+    release = threading.Event()
+    params = {'location': TOKYO, 'type': 'cafe'}
+    results = []
+
+    def slow_fetch():
+        release.wait(2)
+        return 'page'
+
+    leader = threading.Thread(target=lambda: results.append(plan.execute('nearby', params, 1, slow_fetch)))
+    leader.start()
+    while not plan.stats()['unique_queries']:
+        time.sleep(0.001)
+    follower = threading.Thread(target=lambda: results.append(plan.execute('nearby', params, 1, lambda: 'again')))
+    follower.start()
+    release.set()
+    leader.join()
+    follower.join()
+
+    assert results == ['page', 'page']
+    assert plan.deduplicated == 1
+
+
+def test_failed_call_is_not_memoized():
+    plan = QueryPlan()
+    params = {'location': TOKYO, 'type': 'cafe'}
+
+    def fail():
+        raise RuntimeError('boom')
+
+    with pytest.raises(RuntimeError):
+        plan.execute('nearby', params, 1, fail)
+
+    assert plan.execute('nearby', params, 1, lambda: 'retried') == 'retried'
+
+
+def test_shared_plans_issue_once_and_count_separately():
+    memo = QueryPlan()
+    first, second = QueryPlan(shared=memo), QueryPlan(shared=memo)
+    params = {'location': TOKYO, 'type': 'cafe'}
+
+    def fetch_for(plan):
+        def fetch():
+            plan.record_issued()
+            return 'page'
+        return fetch
+
+    first.execute('nearby', params, 1, fetch_for(first))
+    second.execute('nearby', params, 1, fetch_for(second))
+
+    assert (first.issued, first.deduplicated) == (1, 0)
+    assert (second.issued, second.deduplicated) == (0, 1)
@@ -0,0 +1,42 @@
+import time
+
+from query_plan import QueryPlan
+from query_planner import build_candidates
+
+TOKYO = (35.6812, 139.7671)
+
+
+def ring_candidates(corpus):
+    keywords = next(query['keywords'] for query in corpus['queries'] if query.get('keywords'))
+    return build_candidates(keywords, TOKYO, 1000, rank_by_distance=True)
+
+
+def test_ring_stopped_by_budget_reports_no_calls(service, gmaps, corpus):
+    candidates = ring_candidates(corpus)
+    assert len(candidates) >= 3
+    plan = QueryPlan()
+    # 첫 ring의 두 후보까지만 예산 안 - 세 번째 후보에서 ring 전체가 멈춘다
+    budget = service.cost_per_call * 2.5
+    planner = service._new_planner(plan, TOKYO, 1000, 'coordinates', time.monotonic() + 30, budget, 50, progressive=True)
+
+    places = planner.run(candidates)
+
+    assert places == []
+    assert planner.stop_reason == 'budget_exhausted'
+    assert plan.issued == 0
+    assert gmaps.calls['nearby'] == 0
+    assert all(candidate.issued_pages == 0 for candidate in candidates)
+    assert {candidate['status'] for candidate in planner.report(candidates, 0.0)['candidates']} == {'stopped_budget_exhausted'}
+
+
+def test_ring_stopped_by_deadline_reports_no_calls(service, gmaps, corpus):
+    candidates = ring_candidates(corpus)
+    plan = QueryPlan()
+    planner = service._new_planner(plan, TOKYO, 1000, 'coordinates', time.monotonic(), 10.0, 50, progressive=True)
+
+    planner.run(candidates)
+
+    assert planner.stop_reason == 'deadline'
+    assert plan.issued == 0
+    assert all(candidate.issued_pages == 0 for candidate in candidates)
+    assert all(candidate.status == 'stopped_deadline' for candidate in candidates)
@@ -0,0 +1,66 @@
+import time
+
+import pytest
+
+from rate_limit import RateLimitExceeded, TokenBucket, call_with_limit
+
+
+class ApiError(Exception):
+    def __init__(self, status):
+        super().__init__(status)
+        self.status = status
+
+
+def test_burst_is_immediate_then_calls_queue_in_order():
+    bucket = TokenBucket('test', rate=100, burst=2)
+
+    assert [bucket.acquire() for _ in range(2)] == [0.0, 0.0]
+    assert bucket.acquire() == pytest.approx(0.01, abs=0.005)
+    assert bucket.stats()['queued'] == 1
+
+
+def test_call_that_would_wait_past_max_wait_is_rejected():
+    bucket = TokenBucket('test', rate=1, burst=1, max_wait=0.1)
+    bucket.acquire()
+
+    with pytest.raises(RateLimitExceeded):
+        bucket.acquire()
+    assert bucket.stats()['rejected'] == 1
+
+
+def test_try_acquire_never_waits():
+    bucket = TokenBucket('test', rate=1, burst=1)
+
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
+    assert bucket.stats()['rejected'] == 0
+
+
+def test_over_query_limit_drains_the_bucket_and_retries():
+    bucket = TokenBucket('test', rate=100, burst=5)
+    attempts = []
+
+    def flaky():
+        attempts.append(time.monotonic())
+        if len(attempts) == 1:
+            raise ApiError('OVER_QUERY_LIMIT')
+        return 'ok'
+
+    assert call_with_limit(bucket, flaky) == 'ok'
+
+    # penalize()는 1초 동안 새 토큰을 내주지 않는다
+    assert attempts[1] - attempts[0] >= 0.9
+    assert bucket.stats()['over_query_limit'] == 1
+
+
+def test_other_errors_are_not_retried():
+    bucket = TokenBucket('test', rate=100, burst=5)
+    attempts = []
+
+    def denied():
+        attempts.append(1)
+        raise ApiError('REQUEST_DENIED')
+
+    with pytest.raises(ApiError):
+        call_with_limit(bucket, denied)
+    assert attempts == [1]
@@ -0,0 +1,70 @@
+import gzip
+import json
+
+import pytest
+
+import result_store
+from result_store import ResultStore, compress_body, parse_fields, select_fields
+
+PLACES = [{'place_id': f'p{i}', 'name': f'place {i}', 'lat': 35.0, 'lng': 139.0} for i in range(5)]
+
+
+def test_cursor_walks_every_page_once():
+    store = ResultStore()
+    first, cursor = store.first_page(PLACES, 2)
+
+    pages = [first]
+    while cursor is not None:
+        page, cursor, total = store.page(cursor, 2)
+        pages.append(page)
+        assert total == len(PLACES)
+
+    assert [place['place_id'] for page in pages for place in page] == [place['place_id'] for place in PLACES]
+    assert [len(page) for page in pages] == [2, 2, 1]
+
+
+def test_single_page_is_not_stored():
+    store = ResultStore()
+
+    assert store.first_page(PLACES, 5) == (PLACES, None)
+    assert store.stats()['stored'] == 0
+
+
+@pytest.mark.parametrize('cursor', ['', 'abc', 'abc.', 'abc.-1', 'abc.x'])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        ResultStore().page(cursor, 2)
+
+
+def test_expired_and_evicted_results_are_gone(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_store.time, 'time', lambda: now[0])
+    store = ResultStore(ttl_seconds=60, max_entries=1)
+    _, expired = store.first_page(PLACES, 2)
+    now[0] += 61
+
+    assert store.page(expired, 2) is None
+    assert store.stats()['expired'] == 1
+
+    _, evicted = store.first_page(PLACES, 2)
+    _, kept = store.first_page(PLACES, 2)
+    assert store.page(evicted, 2) is None
+    assert store.page(kept, 2) is not None
+    assert store.stats()['evictions'] == 1
+
+
+def test_fields_select_only_known_place_fields():
+    assert parse_fields('name, lat,lng,name') == ('name', 'lat', 'lng')
+    assert select_fields(PLACES[:1], ('name',)) == [{'name': 'place 0'}]
+    with pytest.raises(ValueError):
+        parse_fields('name,secret')
+
+
+def test_body_is_compressed_only_when_accepted_and_large():
+    body = json.dumps(PLACES * 50).encode('utf-8')
+
+    assert compress_body(b'{}', 'gzip') == (b'{}', None)
+    assert compress_body(body, 'identity') == (body, None)
+    assert compress_body(body, 'gzip;q=0') == (body, None)
+    compressed, encoding = compress_body(body, 'gzip')
+    assert encoding == 'gzip' and gzip.decompress(compressed) == body
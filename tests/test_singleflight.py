@@ -0,0 +1,109 @@
+import threading
+import time
+
+from singleflight import SingleFlight
+
+
+def blocking_call(result='shared'):
+    """release()할 때까지 끝나지 않는 fn과 그 호출 횟수"""
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(2)
+        return result
+
+    return fn, calls, release
+
+
+def start_leader(flight, key, fn) -> tuple:
+    outcome = {}
+
+    def run():
+        try:
+            outcome['value'] = flight.do(key, fn)
+        except BaseException as e:
+            outcome['error'] = e
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    while not flight.stats()['in_flight']:
+        time.sleep(0.001)
+    return thread, outcome
+
+
+def test_follower_shares_the_leaders_result():
+    flight = SingleFlight('test')
+    fn, calls, release = blocking_call()
+    thread, leader = start_leader(flight, 'k', fn)
+
+    follower = {}
+    follower_thread = threading.Thread(target=lambda: follower.update(value=flight.do('k', lambda: 'own')))
+    follower_thread.start()
+    while not flight.stats()['followers']:
+        time.sleep(0.001)
+    release.set()
+    thread.join()
+    follower_thread.join()
+
+    assert leader['value'] == ('shared', False)
+    assert follower['value'] == ('shared', True)
+    assert calls == [1]
+    assert flight.stats()['in_flight'] == 0
+
+
+def test_follower_receives_the_leaders_error():
+    flight = SingleFlight('test')
+    release = threading.Event()
+
+    def fail():
+        release.wait(2)
+        raise RuntimeError('upstream down')
+
+    thread, _ = start_leader(flight, 'k', fail)
+    errors = []
+
+    def follow():
+        try:
+            flight.do('k', lambda: 'own')
+        except RuntimeError as e:
+            errors.append(e)
+
+    follower_thread = threading.Thread(target=follow)
+    follower_thread.start()
+    while not flight.stats()['followers']:
+        time.sleep(0.001)
+    release.set()
+    thread.join()
+    follower_thread.join()
+
+    assert [str(e) for e in errors] == ['upstream down']
+
+
+def test_follower_runs_itself_after_its_timeout():
+    flight = SingleFlight('test')
+    fn, _, release = blocking_call()
+    thread, _ = start_leader(flight, 'k', fn)
+
+    assert flight.do('k', lambda: 'own', timeout=0.05) == ('own', False)
+    assert flight.stats()['timeouts'] == 1
+    release.set()
+    thread.join()
+
+
+def test_calls_after_the_leader_finishes_run_again():
+    flight = SingleFlight('test')
+
+    assert flight.do('k', lambda: 1) == (1, False)
+    assert flight.do('k', lambda: 2) == (2, False)
+
+
+def test_different_keys_do_not_coalesce():
+    flight = SingleFlight('test')
+    fn, _, release = blocking_call()
+    thread, _ = start_leader(flight, 'k', fn)
+
+    assert flight.do('other', lambda: 'own') == ('own', False)
+    release.set()
+    thread.join()
@@ -1,58 +1,59 @@
 import vertexai
 from vertexai.generative_models import GenerativeModel, FunctionDeclaration, Tool
+from cache_utils import LRUCache, SQLiteCache, default_cache_dir
+from hedging import Hedger
+from keyword_index import KeywordIndex
+from metrics import metrics
+from singleflight import SingleFlight
+import asyncio
+import copy
+import hashlib
 import os
 import json
+import logging
+import threading
 import time
+import unicodedata
 
-os.environ['GOOGLE_APPLICATION_CREDENTIALS'] = '/Users/ydk/eastbase/google_test/hotba-456006-a2cf612b8582.json'
+logger = logging.getLogger(__name__)
 
-def ultra_search_keywords(korean_text):
-    try:
-        start_time = time.time()
-        init_start = time.time()
-        
-        vertexai.init(project="hotba-456006", location="us-central1")
-        model = GenerativeModel('gemini-2.5-flash')
-        
-        init_time = time.time() - init_start
-        print(f"[TIMING] Vertex AI 초기화: {init_time:.3f}초")
-        
-        # Function declaration
-        generate_keywords_func = FunctionDeclaration(
-            name="generate_keywords",
-            description="Generate Japanese keywords for Google Maps search",
-            parameters={
-                "type": "object",
-                "properties": {
-                    "direct_translation": {
-                        "type": "array",
-                        "items": {"type": "string"},
-                        "description": "직접적인 번역 키워드들 (5개)"
-                    },
-                    "abstract_translation": {
-                        "type": "array", 
-                        "items": {"type": "string"},
-                        "description": "추상적/간접적 장소 유형 키워드들 (15개) - 관련성 높은 순서대로 정렬, 실제 목적 달성 가능성이 있는 곳들만"
-                    },
-
-                    "specific_names": {
-                        "type": "array",
-                        "items": {"type": "string"},
-                        "description": "사용자 입력에서 추출한 구체적인 장소명 (있다면 1-3개) - 예: CO-SIDE CAFE, 스타벅스, 맥도날드"
-                    },
-                    "place_types": {
-                        "type": "array",
-                        "items": {"type": "string"},
-                        "description": "Google Maps API type 파라미터용 영어 키워드 (3-5개) - 예: restaurant, cafe, food, bakery, meal_takeaway"
-                    }
-                },
-                "required": ["direct_translation", "abstract_translation", "specific_names", "place_types"]
-            }
-        )
-        
-        tool = Tool(function_declarations=[generate_keywords_func])
-        
-        prompt = f"""
+# Vertex AI 설정 - 환경변수가 있으면 우선 사용
+DEFAULT_CREDENTIALS_PATH = '/Users/ydk/eastbase/google_test/hotba-456006-a2cf612b8582.json'
+VERTEX_PROJECT = os.getenv('VERTEX_PROJECT', 'hotba-456006')
+VERTEX_LOCATION = os.getenv('VERTEX_LOCATION', 'us-central1')
+
+MODEL_NAME = 'gemini-2.5-flash'
+
+# generate_keywords 함수 스키마
+GENERATE_KEYWORDS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "direct_translation": {
+            "type": "array",
+            "items": {"type": "string"},
+            "description": "직접적인 번역 키워드들 (5개)"
+        },
+        "abstract_translation": {
+            "type": "array", 
+            "items": {"type": "string"},
+            "description": "추상적/간접적 장소 유형 키워드들 (15개) - 관련성 높은 순서대로 정렬, 실제 목적 달성 가능성이 있는 곳들만"
+        },
+
+        "specific_names": {
+            "type": "array",
+            "items": {"type": "string"},
+            "description": "사용자 입력에서 추출한 구체적인 장소명 (있다면 1-3개) - 예: CO-SIDE CAFE, 스타벅스, 맥도날드"
+        },
+        "place_types": {
+            "type": "array",
+            "items": {"type": "string"},
+            "description": "Google Maps API type 파라미터용 영어 키워드 (3-5개) - 예: restaurant, cafe, food, bakery, meal_takeaway"
+        }
+    },
+    "required": ["direct_translation", "abstract_translation", "specific_names", "place_types"]
+}
+
+PROMPT_TEMPLATE = """
 당신은 20년의 경력을 가진 일본 현지 생활 전문가이자 Google Maps 검색 최적화 전문가입니다.
 한국인이 일본 현지에서 원하는 목적을 달성할 수 있도록 일본어 키워드를 생성해주세요.
 
@@ -81,85 +82,602 @@ def ultra_search_keywords(korean_text):
 🎯 **핵심**: 일본 현지에서 실제로 목적을 달성할 수 있는 장소들만 선별!
 generate_keywords 함수로 일본어 키워드만 반환하세요.
 """
+
+# 여러 입력을 한 번의 function calling 요청으로 처리하는 배치용 스키마/프롬프트
+GENERATE_KEYWORDS_BATCH_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "results": {
+            "type": "array",
+            "description": "입력 번호(index)별 키워드 생성 결과 - 모든 입력에 대해 하나씩",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "index": {"type": "integer", "description": "입력 번호 (0부터 시작)"},
+                    **GENERATE_KEYWORDS_SCHEMA["properties"]
+                },
+                "required": ["index"] + GENERATE_KEYWORDS_SCHEMA["required"]
+            }
+        }
+    },
+    "required": ["results"]
+}
+
+BATCH_PROMPT_TEMPLATE = """
+아래의 번호가 매겨진 사용자 입력 각각에 대해, 다음 지침에 따라 일본어 키워드를 생성하세요.
+각 입력은 서로 독립적입니다. 모든 입력 번호(index)에 대해 결과를 하나씩 만들어
+generate_keywords_batch 함수로 한 번에 반환하세요.
+
+사용자 입력 목록:
+{numbered_inputs}
+
+[지침 - 각 입력의 "사용자 입력" 자리에 해당 입력이 들어갑니다]
+{instructions}
+"""
+
+# 프롬프트/스키마/모델이 바뀌면 버전 해시가 바뀌어 기존 캐시는 자동으로 무효화된다
+PROMPT_VERSION = hashlib.sha256(
+    (MODEL_NAME + PROMPT_TEMPLATE + BATCH_PROMPT_TEMPLATE +
+     json.dumps([GENERATE_KEYWORDS_SCHEMA, GENERATE_KEYWORDS_BATCH_SCHEMA], sort_keys=True, ensure_ascii=False)).encode('utf-8')
+).hexdigest()[:12]
+
+KEYWORD_BATCH_SIZE = 10  # 한 번의 LLM 요청에 넣을 입력 수
+
+# 키워드 결과 캐시 설정
+KEYWORD_MEMORY_CACHE_SIZE = 512
+KEYWORD_CACHE_TTL = int(os.getenv('KEYWORD_CACHE_TTL', 7 * 24 * 3600))  # seconds
+KEYWORD_CACHE_MAX_ENTRIES = 20000
+
+# 정확히 같은 입력이 캐시에 없을 때 비슷한 과거 입력의 결과를 재사용 (자모/음절 n-gram 유사도, 0이면 끔)
+KEYWORD_FUZZY_THRESHOLD = float(os.getenv('KEYWORD_FUZZY_THRESHOLD', 0.8))
+KEYWORD_FUZZY_MAX_ENTRIES = 5000
+
+# LLM 호출 하나의 마감과 hedge (관측 지연이 쌓이기 전에는 LLM_HEDGE_INITIAL_DELAY 뒤에 hedge)
+LLM_CALL_DEADLINE = float(os.getenv('LLM_CALL_DEADLINE', 10))  # seconds
+LLM_BATCH_DEADLINE = 30  # seconds, 배치 요청은 hedge 없이 마감만
+LLM_HEDGE_INITIAL_DELAY = 3  # seconds
+LLM_CALL_COST = 0.0012  # 단건 키워드 생성 추정 비용 (입력 ~1.5k + 출력 ~300 토큰, gemini-2.5-flash)
+
+# 캐시에 없는 같은 입력이 동시에 들어오면 LLM 호출은 하나만 (follower 대기 상한)
+KEYWORD_COALESCE_TIMEOUT = 20  # seconds
+
+_keyword_memory_cache = LRUCache(KEYWORD_MEMORY_CACHE_SIZE)
+_keyword_flight = SingleFlight('llm')
+_llm_hedger = Hedger('llm', deadline=LLM_CALL_DEADLINE, initial_delay=LLM_HEDGE_INITIAL_DELAY, cost_per_call=LLM_CALL_COST)
+_llm_batch_hedger = Hedger('llm_batch', deadline=LLM_BATCH_DEADLINE, percentile=None)
+_keyword_disk_cache = None
+_keyword_disk_cache_lock = threading.Lock()
+_keyword_index = None
+_keyword_index_lock = threading.Lock()
+
+
+def _get_keyword_disk_cache():
+    """Open the on-disk keyword cache lazily (환경변수가 로드된 뒤에 경로를 결정)"""
+    global _keyword_disk_cache
+    if _keyword_disk_cache is None:
+        with _keyword_disk_cache_lock:
+            if _keyword_disk_cache is None:
+                _keyword_disk_cache = SQLiteCache(
+                    os.path.join(default_cache_dir(), 'keyword_cache.sqlite3'),
+                    ttl_seconds=KEYWORD_CACHE_TTL,
+                    max_entries=KEYWORD_CACHE_MAX_ENTRIES
+                )
+    return _keyword_disk_cache
+
+
+def _get_keyword_index():
+    """Build the fuzzy keyword index lazily, seeded from the disk cache of the current prompt version"""
+    global _keyword_index
+    if _keyword_index is None:
+        with _keyword_index_lock:
+            if _keyword_index is None:
+                index = KeywordIndex(threshold=KEYWORD_FUZZY_THRESHOLD, max_entries=KEYWORD_FUZZY_MAX_ENTRIES)
+                prefix = f"{PROMPT_VERSION}|"
+                for cache_key, value in _get_keyword_disk_cache().items():
+                    if cache_key.startswith(prefix):
+                        index.add(cache_key[len(prefix):], value)
+                _keyword_index = index
+    return _keyword_index
+
+
+def normalize_query(korean_text):
+    """캐시 키용 입력 정규화 (NFKC, 앞뒤 공백 제거, 연속 공백 축약)"""
+    return ' '.join(unicodedata.normalize('NFKC', korean_text).split())
+
+
+def keyword_cache_key(korean_text):
+    return f"{PROMPT_VERSION}|{normalize_query(korean_text)}"
+
+
+def get_llm_hedge_stats():
+    """LLM 호출 hedge/마감 통계 (단건, 배치)"""
+    return {'llm': _llm_hedger.stats(), 'llm_batch': _llm_batch_hedger.stats()}
+
+
+def get_keyword_cache_stats():
+    """키워드 캐시 통계 (메모리 LRU + 디스크)"""
+    return {
+        'prompt_version': PROMPT_VERSION,
+        'memory': _keyword_memory_cache.stats(),
+        'disk': _get_keyword_disk_cache().stats(),
+        'fuzzy': _get_keyword_index().stats() if KEYWORD_FUZZY_THRESHOLD > 0 else {'enabled': False},
+        'singleflight': _keyword_flight.stats()
+    }
+
+
+def _lookup_cached_keywords(korean_text, start_time):
+    """캐시에서 키워드 결과를 찾아 LLM 응답과 같은 형태로 돌려준다 (없으면 None)"""
+    cache_key = keyword_cache_key(korean_text)
+    
+    source = 'memory_cache'
+    cached = _keyword_memory_cache.get(cache_key)
+    if cached is None:
+        source = 'disk_cache'
+        cached = _get_keyword_disk_cache().get(cache_key)
+        if cached is not None:
+            _keyword_memory_cache.set(cache_key, cached)
+    
+    if cached is None:
+        return None
+    metrics.inc('keyword_cache_total', source=source)
+    
+    # 호출자가 결과 dict에 비용/타이밍을 덧붙이므로 항상 복사본을 돌려준다
+    result = copy.deepcopy(cached)
+    result['original_korean'] = korean_text
+    total_time = time.time() - start_time
+    result['timing'] = {
+        'source': source,
+        'vertex_init_time': 0,
+        'llm_generation_time': 0,
+        'total_time': round(total_time, 3),
+        'prompt_version': PROMPT_VERSION
+    }
+    logger.debug("[TIMING] 키워드 캐시 적중 (%s): %.4f초", source, total_time)
+    return result
+
+
+def _lookup_fuzzy_keywords(korean_text, start_time):
+    """정확한 캐시 미스 후 비슷한 과거 입력의 결과를 찾는다 - (result 또는 None, timing에 붙일 fuzzy 정보 또는 None)"""
+    if KEYWORD_FUZZY_THRESHOLD <= 0:
+        return None, None
+    index = _get_keyword_index()
+    lookup_start = time.perf_counter()
+    value, similarity, matched = index.lookup(korean_text)
+    # 비교 대상 입력(다른 사용자의 질의일 수 있음)은 응답에 싣지 않고 로그에만 남긴다
+    fuzzy = {
+        'similarity': similarity,
+        'threshold': index.threshold,
+        'lookup_time_ms': round((time.perf_counter() - lookup_start) * 1000, 3),
+        'hit_rate': index.stats()['hit_rate']
+    }
+    if value is None:
+        return None, fuzzy
+    metrics.inc('keyword_cache_total', source='fuzzy_index')
+    
+    result = copy.deepcopy(value)
+    result['original_korean'] = korean_text
+    total_time = time.time() - start_time
+    result['timing'] = {
+        'source': 'fuzzy_index',
+        'vertex_init_time': 0,
+        'llm_generation_time': 0,
+        'total_time': round(total_time, 3),
+        'prompt_version': PROMPT_VERSION,
+        'fuzzy_index': fuzzy
+    }
+    logger.debug("[TIMING] 키워드 퍼지 적중 (%s ≈ %s, %.3f): %.4f초", korean_text, matched, similarity, total_time)
+    return result, fuzzy
+
+
+def _store_cached_keywords(korean_text, result):
+    # 장소 검색 의도가 없다는 응답은 일시적인 실패일 수 있어 캐시하지 않음
+    if not result.get('has_location_intent'):
+        return
+    cache_key = keyword_cache_key(korean_text)
+    cacheable = {key: value for key, value in result.items() if key != 'timing'}
+    _keyword_memory_cache.set(cache_key, copy.deepcopy(cacheable))
+    _get_keyword_disk_cache().set(cache_key, cacheable)
+    if KEYWORD_FUZZY_THRESHOLD > 0:
+        _get_keyword_index().add(normalize_query(korean_text), copy.deepcopy(cacheable))
+
+
+def ultra_search_keywords(korean_text, cancel=None):
+    """Generate Japanese search keywords, served from the keyword cache when possible
+
+    캐시 적중 시에도 LLM 응답과 같은 형태의 dict를 돌려주며, timing.source로
+    'memory_cache' / 'disk_cache' / 'fuzzy_index'(비슷한 과거 입력의 결과) / 'llm' /
+    'coalesced'(동시에 진행 중이던 같은 입력의 LLM 결과 공유) 중 어디서 왔는지 표시한다.
+    퍼지 인덱스를 조회했으면 timing.fuzzy_index에 유사도, 임계값, 조회 시간, 적중률이 담긴다
+    (가장 비슷한 입력 문자열은 다른 사용자의 입력일 수 있어 응답에 싣지 않고 로그에만 남긴다).
+    cancel(CancelToken)이 이미 취소됐으면 LLM을 호출하지 않고 SearchCancelled, 호출 중 취소되면 hedge를 보내지 않는다.
+    """
+    start_time = time.time()
+    cached = _lookup_cached_keywords(korean_text, start_time)
+    if cached is not None:
+        return cached
+    cached, fuzzy = _lookup_fuzzy_keywords(korean_text, start_time)
+    if cached is not None:
+        return cached
+    if cancel is not None:
+        cancel.check('llm')
+    
+    def generate():
+        return _stored_llm_result(korean_text, _generate_keywords(korean_text, cancel))
+    
+    result, shared = _keyword_flight.do(keyword_cache_key(korean_text), generate, timeout=KEYWORD_COALESCE_TIMEOUT,
+                                        cancel=cancel)
+    return _request_copy(korean_text, result, shared, start_time, fuzzy)
+
+
+async def ultra_search_keywords_async(korean_text):
+    """Async variant of ultra_search_keywords (Vertex generate_content_async)
+
+    캐시/합치기 규칙은 같고, LLM 호출 동안 이벤트 루프를 막지 않는다.
+    디스크 캐시와 퍼지 인덱스 조회/저장은 워커 스레드(asyncio.to_thread)에서 실행한다.
+    같은 입력의 동시 요청은 같은 이벤트 루프 안에서 한 번의 LLM 호출을 공유한다.
+    """
+    start_time = time.time()
+    cached = await asyncio.to_thread(_lookup_cached_keywords, korean_text, start_time)
+    if cached is not None:
+        return cached
+    cached, fuzzy = await asyncio.to_thread(_lookup_fuzzy_keywords, korean_text, start_time)
+    if cached is not None:
+        return cached
+    
+    async def generate():
+        result = await _generate_keywords_async(korean_text)
+        return await asyncio.to_thread(_stored_llm_result, korean_text, result)
+    
+    result, shared = await _keyword_flight.do_async(keyword_cache_key(korean_text), generate, timeout=KEYWORD_COALESCE_TIMEOUT)
+    return _request_copy(korean_text, result, shared, start_time, fuzzy)
+
+
+def _stored_llm_result(korean_text, result):
+    result['timing']['source'] = 'llm'
+    result['timing']['prompt_version'] = PROMPT_VERSION
+    metrics.inc('keyword_cache_total', source='llm')
+    _store_cached_keywords(korean_text, result)
+    return result
+
+
+def _request_copy(korean_text, result, shared, start_time, fuzzy=None):
+    # 공유된 원본은 그대로 두고 요청마다 복사본을 쓴다 (호출자가 결과 dict를 수정함)
+    result = copy.deepcopy(result)
+    if fuzzy is not None:
+        result['timing']['fuzzy_index'] = fuzzy
+    if shared:
+        result['original_korean'] = korean_text
+        result['timing']['source'] = 'coalesced'
+        result['timing']['total_time'] = round(time.time() - start_time, 3)
+        metrics.inc('keyword_cache_total', source='coalesced')
+    return result
+
+
+def ultra_search_keywords_batch(korean_texts):
+    """Generate keywords for many inputs, sharing LLM requests across them
+
+    캐시에 없는 입력만 정규화 기준으로 중복을 제거한 뒤 KEYWORD_BATCH_SIZE개씩
+    하나의 function calling 요청으로 처리한다. 배치 응답에서 빠진 입력은 단건 요청으로 보완하고,
+    보완 요청도 실패한 입력은 {'error': '키워드 생성 실패: ...'}로 남긴다 (캐시하지 않음).
+    Returns (results, stats) - results는 입력 순서와 같은 ultra_search_keywords 형태의 dict 목록
+    """
+    start_time = time.time()
+    results = [None] * len(korean_texts)
+    pending = {}  # 정규화된 입력 → 입력 위치 목록
+    
+    for position, korean_text in enumerate(korean_texts):
+        cached = _lookup_cached_keywords(korean_text, start_time)
+        if cached is None:
+            cached, _ = _lookup_fuzzy_keywords(korean_text, start_time)
+        if cached is not None:
+            results[position] = cached
+        else:
+            pending.setdefault(normalize_query(korean_text), []).append(position)
+    
+    cache_hits = len(korean_texts) - sum(len(positions) for positions in pending.values())
+    # 정규화 결과가 같은 입력들은 처음 나온 원문 하나로 대표해서 요청한다
+    unique_texts = [korean_texts[positions[0]] for positions in pending.values()]
+    llm_requests = 0
+    fallback_requests = 0
+    
+    for chunk_start in range(0, len(unique_texts), KEYWORD_BATCH_SIZE):
+        chunk = unique_texts[chunk_start:chunk_start + KEYWORD_BATCH_SIZE]
+        generated = _generate_keywords_batch(chunk)
+        llm_requests += 1
         
-        llm_start = time.time()
-        response = model.generate_content(prompt, tools=[tool])
-        llm_time = time.time() - llm_start
-        print(f"[TIMING] LLM 키워드 생성: {llm_time:.3f}초")
-        print(response)
-        if (response.candidates and 
-            len(response.candidates) > 0 and 
-            response.candidates[0].content.parts and 
-            len(response.candidates[0].content.parts) > 0 and 
-            response.candidates[0].content.parts[0].function_call):
-            
-            function_call = response.candidates[0].content.parts[0].function_call
-            args = function_call.args
+        for index, text in enumerate(chunk):
+            result = generated.get(index)
+            if result is None:
+                # 배치 응답에서 빠진 입력은 단건으로 다시 요청 - 실패하면 그 입력만 에러로 남긴다
+                fallback_requests += 1
+                try:
+                    result = _generate_keywords(text)
+                except Exception as e:
+                    logger.exception("배치 키워드 단건 보완 실패 '%s': %s", text, e)
+                    for position in pending[normalize_query(text)]:
+                        results[position] = {'error': f'키워드 생성 실패: {str(e)}', 'original_korean': korean_texts[position]}
+                    continue
+            result['timing']['source'] = 'llm_batch' if index in generated else 'llm'
+            result['timing']['prompt_version'] = PROMPT_VERSION
+            metrics.inc('keyword_cache_total', source=result['timing']['source'])
+            _store_cached_keywords(text, result)
             
-            print(f"[DEBUG] LLM 응답 args: {args}")
-            
-            direct_translation = args.get('direct_translation', [])
-            abstract_translation = args.get('abstract_translation', [])
-            specific_names = args.get('specific_names', [])
-            place_types = args.get('place_types', [])
-            
-            print(f"[DEBUG] direct_translation: {direct_translation}")
-            print(f"[DEBUG] abstract_translation: {abstract_translation}")
-            print(f"[DEBUG] specific_names: {specific_names}")
-            print(f"[DEBUG] place_types: {place_types}")
-            
-            all_search_keywords = direct_translation + abstract_translation + specific_names
-            
-            if all_search_keywords:
-                total_time = time.time() - start_time
-                print(f"[TIMING] 전체 키워드 생성 완료: {total_time:.3f}초")
-                
-                return {
-                    "has_location_intent": True,
-                    "direct_translation": direct_translation,
-                    "abstract_translation": abstract_translation,
-                    "place_types": place_types,
-                    "keywords": all_search_keywords,  # 기존 호환성
-                    "original_korean": korean_text,  # 원본 한국어 텍스트 저장
-                    "timing": {
-                        "vertex_init_time": round(init_time, 3),
-                        "llm_generation_time": round(llm_time, 3),
-                        "total_time": round(total_time, 3)
-                    }
-                }
-            else:
-                total_time = time.time() - start_time
-                return {
-                    "has_location_intent": False, 
-                    "direct_translation": [], 
-                    "abstract_translation": [], 
-                    "keywords": [],
-                    "original_korean": korean_text,
-                    "timing": {
-                        "vertex_init_time": round(init_time, 3),
-                        "llm_generation_time": round(llm_time, 3),
-                        "total_time": round(total_time, 3)
-                    }
-                }
-        else:
-            total_time = time.time() - start_time
-            return {
-                "has_location_intent": False, 
-                "direct_translation": [], 
-                "abstract_translation": [], 
-                "keywords": [],
-                "original_korean": korean_text,
-                "timing": {
-                    "vertex_init_time": 0,
-                    "llm_generation_time": 0,
-                    "total_time": round(total_time, 3)
-                }
-            }
+            for position in pending[normalize_query(text)]:
+                copied = copy.deepcopy(result)
+                copied['original_korean'] = korean_texts[position]
+                results[position] = copied
+    
+    stats = {
+        'inputs': len(korean_texts),
+        'cache_hits': cache_hits,
+        'unique_llm_inputs': len(unique_texts),
+        'llm_requests': llm_requests + fallback_requests,
+        'fallback_requests': fallback_requests,
+        'total_time': round(time.time() - start_time, 3)
+    }
+    logger.debug("[TIMING] 배치 키워드 생성: 입력 %s개, LLM 요청 %s번, %s초", len(korean_texts), stats['llm_requests'], stats['total_time'])
+    return results, stats
+
+class VertexClient:
+    """Process-wide, lazily initialized Vertex AI model and tool holder
+
+    vertexai.init, GenerativeModel 생성, FunctionDeclaration/Tool 스키마 구성을
+    프로세스당 한 번만 수행한다. 여러 요청 스레드가 동시에 처음 접근해도 초기화는 한 번만 일어난다.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._model = None
+        self._tool = None
+        self._batch_tool = None
+        self.init_time = None  # 실제 초기화에 걸린 시간 (초)
+        self.initialized_at = None
+        self.prewarmed_at = None
+
+    def _initialize(self):
+        with metrics.span('vertex_init'):
+            self._initialize_vertex()
+
+    def _initialize_vertex(self):
+        init_start = time.time()
+        # 자격 증명 경로는 환경변수(.env 포함)를 우선하고 없을 때만 기본값 사용
+        os.environ.setdefault('GOOGLE_APPLICATION_CREDENTIALS', DEFAULT_CREDENTIALS_PATH)
+        vertexai.init(project=VERTEX_PROJECT, location=VERTEX_LOCATION)
+        model = GenerativeModel(MODEL_NAME)
+        
+        # Function declaration
+        generate_keywords_func = FunctionDeclaration(
+            name="generate_keywords",
+            description="Generate Japanese keywords for Google Maps search",
+            parameters=GENERATE_KEYWORDS_SCHEMA
+        )
+        tool = Tool(function_declarations=[generate_keywords_func])
+        
+        generate_keywords_batch_func = FunctionDeclaration(
+            name="generate_keywords_batch",
+            description="Generate Japanese keywords for several Google Maps searches at once",
+            parameters=GENERATE_KEYWORDS_BATCH_SCHEMA
+        )
+        batch_tool = Tool(function_declarations=[generate_keywords_batch_func])
         
+        self._model, self._tool, self._batch_tool = model, tool, batch_tool
+        self.init_time = time.time() - init_start
+        self.initialized_at = time.time()
+        logger.debug("[TIMING] Vertex AI 초기화: %.3f초", self.init_time)
+
+    def get(self, batch=False):
+        """Return (model, tool, seconds this call spent waiting for initialization)
+
+        batch=True면 generate_keywords_batch 도구를 돌려준다.
+        """
+        wait_start = time.time()
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    self._initialize()
+        tool = self._batch_tool if batch else self._tool
+        return self._model, tool, time.time() - wait_start
+
+    async def get_async(self, batch=False):
+        """Async variant of get - 첫 초기화만 워커 스레드에서 수행해 이벤트 루프를 막지 않는다"""
+        if self._model is None:
+            return await asyncio.to_thread(self.get, batch)
+        return self.get(batch)
+
+    def use(self, model, tool=None, batch_tool=None):
+        """Install an already built model/tool instead of initializing Vertex AI (오프라인 벤치마크용)"""
+        with self._lock:
+            self._model, self._tool, self._batch_tool = model, tool, batch_tool
+            self.init_time = 0.0
+            self.initialized_at = time.time()
+
+    def prewarm(self):
+        """Initialize eagerly (서버 시작 시 호출)"""
+        try:
+            self.get()
+            self.prewarmed_at = time.time()
+            logger.debug("[TIMING] Vertex AI 프리웜 완료: %.3f초", self.init_time)
+        except Exception as e:
+            # 프리웜 실패는 치명적이지 않음 - 첫 요청에서 다시 초기화를 시도
+            logger.error("Vertex AI 프리웜 실패: %s", e)
+
+    def status(self) -> dict:
+        return {
+            'initialized': self._model is not None,
+            'init_time': round(self.init_time, 3) if self.init_time is not None else None,
+            'initialized_at': self.initialized_at,
+            'prewarmed_at': self.prewarmed_at,
+        }
+
+
+vertex_client = VertexClient()
+
+
+def prewarm_vertex(background=True):
+    """Startup hook: initialize the Vertex AI client, by default on a daemon thread"""
+    if not background:
+        vertex_client.prewarm()
+        return None
+    thread = threading.Thread(target=vertex_client.prewarm, name='vertex-prewarm', daemon=True)
+    thread.start()
+    return thread
+
+
+def _keywords_from_args(korean_text, args):
+    """generate_keywords 함수 인자 → ultra_search_keywords 결과 dict (timing 제외)"""
+    direct_translation = list(args.get('direct_translation', []))
+    abstract_translation = list(args.get('abstract_translation', []))
+    specific_names = list(args.get('specific_names', []))
+    place_types = list(args.get('place_types', []))
+    
+    logger.debug("direct_translation: %s", direct_translation)
+    logger.debug("abstract_translation: %s", abstract_translation)
+    logger.debug("specific_names: %s", specific_names)
+    logger.debug("place_types: %s", place_types)
+    
+    all_search_keywords = direct_translation + abstract_translation + specific_names
+    
+    if all_search_keywords:
+        return {
+            "has_location_intent": True,
+            "direct_translation": direct_translation,
+            "abstract_translation": abstract_translation,
+            "place_types": place_types,
+            "keywords": all_search_keywords,  # 기존 호환성
+            "original_korean": korean_text,  # 원본 한국어 텍스트 저장
+        }
+    return {
+        "has_location_intent": False, 
+        "direct_translation": [], 
+        "abstract_translation": [], 
+        "keywords": [],
+        "original_korean": korean_text,
+    }
+
+
+def _first_function_call(response):
+    """응답의 첫 function_call (없으면 None)"""
+    if (response.candidates and 
+        len(response.candidates) > 0 and 
+        response.candidates[0].content.parts and 
+        len(response.candidates[0].content.parts) > 0 and 
+        response.candidates[0].content.parts[0].function_call):
+        return response.candidates[0].content.parts[0].function_call
+    return None
+
+
+def _generate_keywords_batch(korean_texts):
+    """Run one batched function-calling request, returning {input index: result}"""
+    start_time = time.time()
+    model, tool, init_time = vertex_client.get(batch=True)
+    
+    numbered_inputs = '\n'.join(f"[{index}] {text}" for index, text in enumerate(korean_texts))
+    prompt = BATCH_PROMPT_TEMPLATE.format(
+        numbered_inputs=numbered_inputs,
+        instructions=PROMPT_TEMPLATE.format(korean_text='(각 입력)')
+    )
+    
+    llm_start = time.time()
+    try:
+        with metrics.span('llm_generation', mode='batch'):
+            response = _llm_batch_hedger.call(lambda: model.generate_content(prompt, tools=[tool]))
+        metrics.inc('api_calls_total', api='llm')
     except Exception as e:
-        raise e
+        # 배치 요청 실패 시 호출자가 입력별 단건 요청으로 보완한다
+        logger.error("배치 키워드 생성 실패: %s", e)
+        return {}
+    llm_time = time.time() - llm_start
+    logger.debug("[TIMING] LLM 배치 키워드 생성 (%s개): %.3f초", len(korean_texts), llm_time)
+    
+    function_call = _first_function_call(response)
+    if function_call is None:
+        return {}
+    
+    generated = {}
+    for item in function_call.args.get('results', []):
+        try:
+            index = int(item.get('index'))
+        except (TypeError, ValueError):
+            continue
+        if not 0 <= index < len(korean_texts) or index in generated:
+            continue
+        result = _keywords_from_args(korean_texts[index], item)
+        result['timing'] = {
+            "vertex_init_time": round(init_time, 3),
+            "vertex_prewarmed_at": vertex_client.prewarmed_at,
+            "llm_generation_time": round(llm_time, 3),
+            "total_time": round(time.time() - start_time, 3),
+            "batch_size": len(korean_texts)
+        }
+        generated[index] = result
+    return generated
+
+
+def _keywords_from_response(korean_text, response, start_time, init_time, llm_time):
+    """단건 generate_keywords 응답 → ultra_search_keywords 형태의 dict (function call이 없으면 장소 의도 없음)"""
+    logger.debug("[TIMING] LLM 키워드 생성: %.3f초", llm_time)
+    logger.debug("%s", response)
+    function_call = _first_function_call(response)
+    if function_call is not None:
+        args = function_call.args
+        
+        logger.debug("LLM 응답 args: %s", args)
+        
+        result = _keywords_from_args(korean_text, args)
+        total_time = time.time() - start_time
+        if result['has_location_intent']:
+            logger.debug("[TIMING] 전체 키워드 생성 완료: %.3f초", total_time)
+        result['timing'] = {
+            "vertex_init_time": round(init_time, 3),
+            "vertex_prewarmed_at": vertex_client.prewarmed_at,
+            "llm_generation_time": round(llm_time, 3),
+            "total_time": round(total_time, 3)
+        }
+        return result
+    else:
+        total_time = time.time() - start_time
+        return {
+            "has_location_intent": False, 
+            "direct_translation": [], 
+            "abstract_translation": [], 
+            "keywords": [],
+            "original_korean": korean_text,
+            "timing": {
+                "vertex_init_time": round(init_time, 3),
+                "vertex_prewarmed_at": vertex_client.prewarmed_at,
+                "llm_generation_time": 0,
+                "total_time": round(total_time, 3)
+            }
+        }
+
+def _generate_keywords(korean_text, cancel=None):
+    start_time = time.time()
+    
+    model, tool, init_time = vertex_client.get()
+    
+    prompt = PROMPT_TEMPLATE.format(korean_text=korean_text)
+    
+    llm_start = time.time()
+    with metrics.span('llm_generation', mode='single'):
+        response = _llm_hedger.call(lambda: model.generate_content(prompt, tools=[tool]), cancel=cancel)
+    metrics.inc('api_calls_total', api='llm')
+    return _keywords_from_response(korean_text, response, start_time, init_time, time.time() - llm_start)
+
+async def _generate_keywords_async(korean_text):
+    start_time = time.time()
+    
+    model, tool, init_time = await vertex_client.get_async()
+    
+    prompt = PROMPT_TEMPLATE.format(korean_text=korean_text)
+    
+    llm_start = time.time()
+    with metrics.span('llm_generation', mode='async'):
+        response = await _llm_hedger.call_async(lambda: model.generate_content_async(prompt, tools=[tool]))
+    metrics.inc('api_calls_total', api='llm')
+    return _keywords_from_response(korean_text, response, start_time, init_time, time.time() - llm_start)
 
 def main():
+    logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO').upper())
     print("🚀 Ultra Search - 절대 놓치지 않는 검색기")
     print("종료하려면 'quit' 입력")
     print("-" * 50)